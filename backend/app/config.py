@@ -5,4 +5,77 @@ load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
\ No newline at end of file
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
+
+# Mantenimiento nocturno del horizonte de slots
+SLOT_SCHEDULER_ENABLED = os.getenv("SLOT_SCHEDULER_ENABLED", "true").lower() == "true"
+SLOT_SCHEDULER_HOUR = int(os.getenv("SLOT_SCHEDULER_HOUR", "3"))  # hora UTC
+SLOT_SCHEDULER_BATCH_SIZE = int(os.getenv("SLOT_SCHEDULER_BATCH_SIZE", "100"))
+
+
+# Cache de disponibilidad pública (bytes de respuestas JSON en memoria)
+AVAILABILITY_CACHE_MAX_BYTES = int(os.getenv("AVAILABILITY_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# Versión de cada calendario (ETag e invalidación del cache): "memory" (un proceso) o "sql"
+# (compartida entre workers en calendars.availability_version); por defecto sigue a SLOT_HOLD_BACKEND
+AVAILABILITY_VERSIONS_BACKEND = os.getenv("AVAILABILITY_VERSIONS_BACKEND", os.getenv("SLOT_HOLD_BACKEND", "memory"))
+
+
+# Apartado temporal de slots mientras el paciente completa la reserva
+SLOT_HOLD_TTL_SECONDS = int(os.getenv("SLOT_HOLD_TTL_SECONDS", "300"))
+SLOT_HOLD_BACKEND = os.getenv("SLOT_HOLD_BACKEND", "memory")  # "memory" (un nodo) o "sql" (varios workers)
+
+
+# Respuestas guardadas por Idempotency-Key (reintentos de clientes móviles)
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 3600)))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+
+
+# Cache del usuario autenticado en get_current_user
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+# Incluir el id del usuario (claim "uid") en los tokens: un fallo del cache se resuelve por llave primaria
+TOKEN_EMBED_USER_ID = os.getenv("TOKEN_EMBED_USER_ID", "false").lower() == "true"
+
+
+# Hash de contraseñas: costo de bcrypt y pool dedicado (fuera del threadpool de los endpoints)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "256"))
+
+
+# Verificación local de ID tokens de Google (JWKS en cache)
+GOOGLE_CLIENT_IDS = [client_id.strip() for client_id in os.getenv("GOOGLE_CLIENT_ID", "").split(",") if client_id.strip()]
+GOOGLE_JWKS_URL = os.getenv("GOOGLE_JWKS_URL", "https://www.googleapis.com/oauth2/v3/certs")
+GOOGLE_JWKS_FILE = os.getenv("GOOGLE_JWKS_FILE")  # JWKS local (pruebas / sin red); desactiva la descarga
+GOOGLE_JWKS_DEFAULT_MAX_AGE = int(os.getenv("GOOGLE_JWKS_DEFAULT_MAX_AGE", "3600"))
+
+
+# Cola de correos salientes (outbox) y su envío en segundo plano
+EMAIL_OUTBOX_ENABLED = os.getenv("EMAIL_OUTBOX_ENABLED", "true").lower() == "true"
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "100"))
+EMAIL_OUTBOX_POLL_SECONDS = float(os.getenv("EMAIL_OUTBOX_POLL_SECONDS", "5"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "8"))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_RETRY_BASE_SECONDS", "30"))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv("EMAIL_OUTBOX_LEASE_SECONDS", "300"))
+SMTP_IDLE_TIMEOUT_SECONDS = int(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "60"))  # cerrar la sesión SMTP inactiva
+
+
+# Idioma de los correos cuando Accept-Language no coincide con ninguna plantilla
+DEFAULT_EMAIL_LOCALE = os.getenv("DEFAULT_EMAIL_LOCALE", "es")
+
+
+# Tokens de refresco: rotación en cada uso y revocaciones recientes en memoria
+REFRESH_REVOCATION_MAX_ENTRIES = int(os.getenv("REFRESH_REVOCATION_MAX_ENTRIES", "100000"))
+
+
+# Límite de intentos de login y verificación (token buckets por IP y por email)
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # "memory" (un proceso) o "sqlite" (varios workers)
+RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "rate_limits.db")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+RATE_LIMIT_IP_BURST = int(os.getenv("RATE_LIMIT_IP_BURST", "20"))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "20"))
+RATE_LIMIT_EMAIL_BURST = int(os.getenv("RATE_LIMIT_EMAIL_BURST", "5"))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", "2"))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() == "true"  # detrás de un proxy
+RATE_LIMIT_TRUSTED_PROXY_HOPS = int(os.getenv("RATE_LIMIT_TRUSTED_PROXY_HOPS", "1"))  # proxies propios que agregan a X-Forwarded-For
@@ -1,8 +1,10 @@
 from app.database import engine, Base
+from app.migrations import run_migrations
 from app.models.models import User, Calendar, AvailabilitySlot, Appointment, AvailabilityBlock, WeekDay
 
 # Crear las tablas en la base de datos
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 print("¡Tablas creadas exitosamente!")
 
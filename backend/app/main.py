@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import sys
 import os
@@ -7,12 +8,37 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app.database import engine, Base
-from app.routers import users, calendars, appointments, availability_slots, availability, auth, doctor_profile
+from app.migrations import run_migrations
+from app.config import SLOT_SCHEDULER_ENABLED, GOOGLE_CLIENT_IDS, EMAIL_OUTBOX_ENABLED
+from app.utils.scheduler import slot_scheduler
+from app.utils.password_utils import password_hasher
+from app.utils.google_tokens import google_jwks
+from app.utils.email_outbox import email_sender
+from app.routers import users, calendars, appointments, availability_slots, availability, auth, doctor_profile, public_calendar, metrics
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mantenimiento nocturno del horizonte de slots
+    if SLOT_SCHEDULER_ENABLED:
+        slot_scheduler.start()
+    # Llaves de Google para verificar ID tokens sin llamar a tokeninfo
+    if GOOGLE_CLIENT_IDS:
+        google_jwks.start()
+    # Envío de la cola de correos por una sesión SMTP reutilizada
+    if EMAIL_OUTBOX_ENABLED:
+        email_sender.start()
+    yield
+    await slot_scheduler.stop()
+    await google_jwks.stop()
+    await email_sender.stop()
+    password_hasher.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://localhost:5174"],  # frontend
@@ -31,3 +57,5 @@ app.include_router(appointments.router)
 app.include_router(availability_slots.router)
 app.include_router(availability.router)
 app.include_router(doctor_profile.router)
+app.include_router(public_calendar.router)
+app.include_router(metrics.router)
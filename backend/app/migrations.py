@@ -0,0 +1,114 @@
+"""
+Migraciones versionadas del esquema.
+
+create_all solo crea tablas nuevas; los cambios sobre tablas existentes
+(índices, columnas) se aplican aquí, una sola vez cada uno, registrando la
+versión en la tabla schema_version.
+"""
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, insert, inspect, text
+
+_metadata = MetaData()
+
+schema_version = Table(
+    "schema_version",
+    _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _execute(conn, *statements):
+    """
+    Ejecuta DDL escrito a mano.
+
+    Cada migración fija su propio DDL en lugar de leerlo del modelo: si el
+    modelo cambia después, la migración publicada debe seguir creando lo
+    mismo. IF NOT EXISTS cubre las bases nuevas, donde create_all ya creó
+    los índices. Funciona igual en SQLite y en Postgres.
+    """
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def _false(conn) -> str:
+    # Así compila SQLAlchemy `is_booked == False`: el predicado del índice parcial
+    # debe coincidir textualmente con el de las consultas para que SQLite lo use
+    return "false" if conn.dialect.name == "postgresql" else "0"
+
+
+def _migration_1(conn):
+    _execute(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_availability_slots_calendar_start ON availability_slots (calendar_id, start_time)",
+        # Parcial: solo slots libres, que es lo que consultan las búsquedas
+        f"CREATE INDEX IF NOT EXISTS ix_availability_slots_free ON availability_slots (calendar_id, start_time) WHERE is_booked = {_false(conn)}",
+        "CREATE INDEX IF NOT EXISTS ix_availability_blocks_calendar ON availability_blocks (calendar_id, day_of_week)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_calendar_start ON appointments (calendar_id, start_time)",
+        "CREATE INDEX IF NOT EXISTS ix_appointments_user_start ON appointments (user_id, start_time)",
+    )
+
+
+def _migration_2(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("appointments")}
+    if "updated_at" not in columns:
+        _execute(conn, "ALTER TABLE appointments ADD COLUMN updated_at TIMESTAMP")
+    conn.execute(text("UPDATE appointments SET updated_at = :now WHERE updated_at IS NULL"), {"now": datetime.utcnow()})
+    _execute(conn, "CREATE INDEX IF NOT EXISTS ix_appointments_calendar_updated ON appointments (calendar_id, updated_at)")
+
+
+def _migration_3(conn):
+    columns = {column["name"] for column in inspect(conn).get_columns("calendars")}
+    if "availability_version" not in columns:
+        _execute(conn, "ALTER TABLE calendars ADD COLUMN availability_version INTEGER NOT NULL DEFAULT 0")
+
+
+def _migration_4(conn):
+    # Algunas bases aplicaron la migración 1 con "WHERE NOT is_booked", que las
+    # consultas (is_booked = 0) no usan: se recrea con el predicado del modelo
+    _execute(
+        conn,
+        "DROP INDEX IF EXISTS ix_availability_slots_free",
+        f"CREATE INDEX ix_availability_slots_free ON availability_slots (calendar_id, start_time) WHERE is_booked = {_false(conn)}",
+    )
+
+
+# (versión, descripción, función) en orden; nunca reescribir una ya publicada
+MIGRATIONS = [
+    (1, "Índices compuestos y parcial de slots, bloques y citas", _migration_1),
+    (2, "Columna appointments.updated_at e índice para el feed .ics", _migration_2),
+    (3, "Columna calendars.availability_version (versión compartida entre workers)", _migration_3),
+    (4, "Índice parcial de slots libres con el predicado de las consultas", _migration_4),
+]
+
+
+def current_version(conn) -> int:
+    versions = conn.execute(select(schema_version.c.version)).scalars().all()
+    return max(versions, default=0)
+
+
+def run_migrations(engine) -> int:
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción.
+
+    Returns:
+        int: Versión del esquema tras aplicar las migraciones
+    """
+    schema_version.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        version = current_version(conn)
+
+    for number, description, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(insert(schema_version).values(
+                version=number,
+                description=description,
+                applied_at=datetime.utcnow()
+            ))
+        print(f"Migración {number} aplicada: {description}")
+        version = number
+    return version
@@ -1,5 +1,5 @@
 from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Time, Date, Text
-from sqlalchemy import Column, Enum as SQLEnum, Table
+from sqlalchemy import Column, Enum as SQLEnum, Table, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from ..database import Base
 from enum import Enum
@@ -35,6 +35,8 @@ class Calendar(Base):
     buffer_after = Column(Integer)
     max_per_day = Column(Integer)
     max_per_slot = Column(Integer)
+    # Versión de la disponibilidad, compartida entre workers (AVAILABILITY_VERSIONS_BACKEND=sql)
+    availability_version = Column(Integer, nullable=False, default=0, server_default="0")
 
 
 
@@ -56,6 +58,17 @@ class AvailabilitySlot(Base):
 
     calendar = relationship("Calendar", back_populates="availability_slots")
 
+    __table_args__ = (
+        Index("ix_availability_slots_calendar_start", "calendar_id", "start_time"),
+        # Índice parcial: solo slots libres, que es lo que consultan las búsquedas
+        Index(
+            "ix_availability_slots_free",
+            "calendar_id", "start_time",
+            sqlite_where=is_booked == False,
+            postgresql_where=is_booked == False
+        ),
+    )
+
 
 class WeekDay(str, Enum):
     monday = "mon"
@@ -77,6 +90,10 @@ class AvailabilityBlock(Base):
 
     calendar = relationship("Calendar", back_populates="availability_blocks")
 
+    __table_args__ = (
+        Index("ix_availability_blocks_calendar", "calendar_id", "day_of_week"),
+    )
+
 class Appointment(Base):
     __tablename__ = "appointments"
 
@@ -86,9 +103,87 @@ class Appointment(Base):
     start_time = Column(DateTime)
     end_time = Column(DateTime)
     description = Column(String)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     calendar = relationship("Calendar", back_populates="appointments")
 
+    __table_args__ = (
+        Index("ix_appointments_calendar_start", "calendar_id", "start_time"),
+        Index("ix_appointments_user_start", "user_id", "start_time"),
+        # max(updated_at) por calendario para el ETag del feed .ics
+        Index("ix_appointments_calendar_updated", "calendar_id", "updated_at"),
+    )
+
+
+class BookingCounter(Base):
+    __tablename__ = "booking_counters"
+
+    id = Column(Integer, primary_key=True, index=True)
+    calendar_id = Column(Integer, ForeignKey("calendars.id"), nullable=False)
+    scope = Column(String, nullable=False)  # "day" o "slot"
+    period_start = Column(DateTime, nullable=False)  # medianoche del día o inicio del slot
+    count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("calendar_id", "scope", "period_start", name="uq_booking_counters_period"),
+    )
+
+
+class SlotHold(Base):
+    __tablename__ = "slot_holds"
+
+    id = Column(Integer, primary_key=True, index=True)
+    token = Column(String, unique=True, nullable=False)
+    calendar_id = Column(Integer, ForeignKey("calendars.id"), nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Un solo apartado vigente por horario; el vencido se borra al volver a apartarlo
+        UniqueConstraint("calendar_id", "start_time", name="uq_slot_holds_slot"),
+        Index("ix_slot_holds_expires", "expires_at"),
+    )
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    to_email = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    html_body = Column(Text, nullable=False)
+    text_body = Column(Text)
+    status = Column(String, nullable=False, default="pending")  # "pending", "sent" o "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    lease_token = Column(String)  # envío que tomó la fila
+    last_error = Column(String)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime)
+
+    __table_args__ = (
+        # Pendientes que ya tocan, en orden de reintento
+        Index("ix_email_outbox_due", "status", "next_attempt_at"),
+    )
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    token_hash = Column(String, nullable=False)  # sha256 del token; el token nunca se guarda
+    family_id = Column(String, nullable=False)  # cadena de rotaciones desde un mismo login
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    revoked_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_hash", "token_hash", unique=True),
+        Index("ix_refresh_tokens_family", "family_id"),
+    )
+
 
 # Tabla de asociación para la relación many-to-many entre DoctorProfile y Service
 doctor_services = Table(
@@ -0,0 +1,13 @@
+from app.database import SessionLocal
+from app.utils.capacity import reconcile_counters
+
+# Reconstruye los contadores de capacidad (max_per_day / max_per_slot) desde las citas
+db = SessionLocal()
+try:
+    stats = reconcile_counters(db)
+    print(f"Contadores reconstruidos: {stats}")
+finally:
+    db.close()
+
+# cd backend
+# .venv/bin/python -m app.reconcile_counters
@@ -1,13 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, File, Header, Query, Request, UploadFile
 from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
 from ..database import get_db
 from ..models.models import Appointment, User, Calendar
-from ..schemas.schemas import AppointmentCreate, AppointmentRead
+from ..schemas.schemas import AppointmentCreate, AppointmentRead, AppointmentPage
+from ..utils.availability_bitmap import appointment_created
+from ..utils.availability_cache import invalidate_calendar
+from ..utils.capacity import release_capacity
+from ..utils.booking import book_appointment, release_slot
+from ..utils.idempotency import request_owner, run_idempotent
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
+from ..utils.appointment_import import import_appointments, iter_csv_rows, iter_ics_rows
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
 @router.post("/", response_model=AppointmentRead)
-def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get_db)):
+def create_appointment(
+    request: Request,
+    appointment: AppointmentCreate,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    # Un reintento con la misma Idempotency-Key devuelve la cita ya creada
+    return run_idempotent(
+        idempotency_key, "POST /appointments/", request_owner(request), appointment, AppointmentRead,
+        lambda: _create_appointment(appointment, db)
+    )
+
+def _create_appointment(appointment: AppointmentCreate, db: Session):
     # Validar que calendario exista
     calendar = db.query(Calendar).filter(Calendar.id == appointment.calendar_id).first()
     if not calendar:
@@ -18,21 +39,89 @@ def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    new_appointment = Appointment(
+    # Toma el slot, verifica capacidad y traslapes, y crea la cita de forma atómica
+    new_appointment = book_appointment(
+        db,
+        calendar,
+        user_id=appointment.user_id,
         start_time=appointment.start_time,
         end_time=appointment.end_time,
-        calendar_id=appointment.calendar_id,
-        user_id=appointment.user_id,
-        description=appointment.description
+        description=appointment.description,
+        hold_token=appointment.hold_token
     )
-    db.add(new_appointment)
-    db.commit()
-    db.refresh(new_appointment)
+    appointment_created(calendar, new_appointment.start_time, new_appointment.end_time)
     return new_appointment
 
+@router.get("/", response_model=AppointmentPage)
+def list_appointments(
+    calendar_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    start: Optional[datetime] = Query(None, description="Citas que empiezan desde esta fecha"),
+    end: Optional[datetime] = Query(None, description="Citas que empiezan antes de esta fecha"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    """Citas de un calendario o de un paciente, por fecha, paginadas con cursor"""
+    if calendar_id is None and user_id is None:
+        raise HTTPException(status_code=400, detail="Indica calendar_id o user_id")
+
+    query = db.query(Appointment)
+    if calendar_id is not None:
+        query = query.filter(Appointment.calendar_id == calendar_id)
+    if user_id is not None:
+        query = query.filter(Appointment.user_id == user_id)
+    if start is not None:
+        query = query.filter(Appointment.start_time >= start)
+    if end is not None:
+        query = query.filter(Appointment.start_time < end)
+
+    appointments, next_cursor = keyset_page(query, (Appointment.start_time, Appointment.id), cursor, limit)
+    return {"appointments": appointments, "next_cursor": next_cursor}
+
+#   GET http://localhost:8000/appointments/?calendar_id=1&start=2025-07-01T00:00:00&limit=50
+#   Siguiente página: mismo query + &cursor=<next_cursor>
+
 @router.get("/{appointment_id}", response_model=AppointmentRead)
 def get_appointment(appointment_id: int, db: Session = Depends(get_db)):
     appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
     return appointment
+
+
+@router.delete("/{appointment_id}")
+def cancel_appointment(appointment_id: int, db: Session = Depends(get_db)):
+    appointment = db.query(Appointment).filter(Appointment.id == appointment_id).first()
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+
+    calendar = db.query(Calendar).filter(Calendar.id == appointment.calendar_id).first()
+    if calendar:
+        release_capacity(db, calendar, appointment.start_time)
+    release_slot(db, appointment.calendar_id, appointment.start_time, appointment.end_time)
+    db.delete(appointment)
+    db.commit()
+    invalidate_calendar(appointment.calendar_id)
+    return {"detail": "Cita cancelada"}
+
+
+@router.post("/import")
+def import_appointments_file(
+    file: UploadFile = File(...),
+    calendar_id: Optional[int] = Query(None, description="Calendario por defecto para filas sin calendar_id"),
+    user_id: Optional[int] = Query(None, description="Paciente por defecto para filas sin user_id"),
+    db: Session = Depends(get_db)
+):
+    """Importa citas existentes desde un CSV o un .ics, en lotes y sin cargar el archivo completo"""
+    is_ics = (file.filename or "").lower().endswith(".ics") or (file.content_type or "").startswith("text/calendar")
+    rows = iter_ics_rows(file.file) if is_ics else iter_csv_rows(file.file)
+    try:
+        return import_appointments(db, rows, defaults={"calendar_id": calendar_id, "user_id": user_id})
+    except (UnicodeDecodeError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Archivo inválido: {e}")
+
+#   POST http://localhost:8000/appointments/import   (multipart, campo "file")
+#   CSV: calendar_id,user_id,start_time,end_time,description
+#        1,5,2025-07-01T09:00:00,2025-07-01T09:30:00,Consulta
+#   ICS: VEVENT con DTSTART/DTEND; usar ?calendar_id=1&user_id=5 o X-VITALIS-CALENDAR-ID / X-VITALIS-USER-ID
@@ -1,19 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Header, Request
 from fastapi.security import OAuth2PasswordRequestForm
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from datetime import timedelta
 from pydantic import BaseModel
 from typing import Optional
 import random
 import string
-import requests
 import json
 from ..database import get_db
 from ..models.models import User
 from ..schemas.schemas import UserRegister, UserRead
-from ..utils.token_utils import authenticate_user, create_access_token
-from ..utils.password_utils import hash_password
-from ..utils.email_utils import send_verification_email, send_welcome_email
+from ..utils.token_utils import authenticate_user_async, create_access_token, token_claims
+from ..utils.password_utils import password_hasher
+from ..utils.idempotency import request_owner, run_idempotent_async
+from ..utils.rate_limit import login_limiter, client_ip
+from ..utils.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_refresh_token
+from ..utils.google_tokens import verify_google_id_token
+from ..utils.email_utils import smtp_configured
+from ..utils.email_templates import verification_email_content, welcome_email_content, negotiate_locale
+from ..utils.email_outbox import enqueue_email, email_sender
 from ..config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -27,49 +33,67 @@ def generate_verification_code():
     return ''.join(random.choices(string.digits, k=6))
 
 @router.post("/register", response_model=UserRead)
-def register(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register(
+    request: Request,
+    user_data: UserRegister,
+    idempotency_key: Optional[str] = Header(None),
+    accept_language: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    # Un reintento con la misma Idempotency-Key no vuelve a hashear la contraseña
+    return await run_idempotent_async(
+        idempotency_key, "POST /auth/register", request_owner(request), user_data, UserRead,
+        lambda: _register(user_data, db, negotiate_locale(accept_language))
+    )
+
+def _save_user(db: Session, user: User):
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+
+async def _register(user_data: UserRegister, db: Session, locale: str):
     # Verificar si el usuario ya existe
-    db_user = db.query(User).filter(User.email == user_data.email).first()
+    db_user = await run_in_threadpool(lambda: db.query(User).filter(User.email == user_data.email).first())
     if db_user:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
     # Generar código de verificación
     verification_code = generate_verification_code()
     
-    # Crear nuevo usuario
+    # Crear nuevo usuario; bcrypt corre en su propio pool
     new_user = User(
         first_name=user_data.first_name,
         last_name=user_data.last_name,
         email=user_data.email,
-        hashed_password=hash_password(user_data.password),
+        hashed_password=await password_hasher.hash(user_data.password),
         is_verified=False,
         verification_code=verification_code
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    # El correo se encola en la misma transacción; lo envía email_sender
+    enqueue_email(db, user_data.email, *verification_email_content(verification_code, user_data.first_name, locale))
+    await run_in_threadpool(_save_user, db, new_user)
+    email_sender.notify()
     
-    # Email temporalmente deshabilitado - mostrar código en consola
-    print(f"Código de verificación para {user_data.email}: {verification_code}")
-    print(f"Email: {user_data.email} - Usuario: {user_data.first_name} {user_data.last_name}")
+    if not smtp_configured():
+        # Sin SMTP (desarrollo) - mostrar código en consola
+        print(f"Código de verificación para {user_data.email}: {verification_code}")
     
     return new_user
 
 @router.post("/login")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login(request: Request, form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    # Límite de intentos antes de consultar la base o correr bcrypt
+    await login_limiter.check_async("login", client_ip(request), form_data.username)
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Correo o contraseña incorrectos")
 
     # Token estándar
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
     
-    # Crear token de refresco con duración más larga
-    refresh_token = create_access_token(
-        data={"sub": user.email, "refresh": True},
-        expires_delta=timedelta(days=30)  # 30 días para el refresh token
-    )
+    # Crear token de refresco con duración más larga (30 días); se guarda su hash
+    refresh_token = await run_in_threadpool(issue_refresh_token, db, user, timedelta(days=30))
     
     return {
         "access_token": access_token, 
@@ -85,20 +109,19 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     }
 
 @router.post("/login/json")
-def login_json(login_data: LoginRequest, db: Session = Depends(get_db)):
-    user = authenticate_user(db, login_data.email, login_data.password)
+async def login_json(request: Request, login_data: LoginRequest, db: Session = Depends(get_db)):
+    # Mismos buckets que /login: cambiar de endpoint no da más intentos
+    await login_limiter.check_async("login", client_ip(request), login_data.email)
+    user = await authenticate_user_async(db, login_data.email, login_data.password)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Correo o contraseña incorrectos")
 
     # Token de acceso estándar
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data=token_claims(user))
     
     # Si remember_me está activado, crear un refresh token de larga duración
     refresh_expires = timedelta(days=30) if login_data.remember_me else timedelta(hours=24)
-    refresh_token = create_access_token(
-        data={"sub": user.email, "refresh": True},
-        expires_delta=refresh_expires
-    )
+    refresh_token = await run_in_threadpool(issue_refresh_token, db, user, refresh_expires)
     
     return {
         "access_token": access_token, 
@@ -115,20 +138,24 @@ def login_json(login_data: LoginRequest, db: Session = Depends(get_db)):
 
 @router.post("/refresh")
 def refresh_token(refresh_token: str = Body(..., embed=True), db: Session = Depends(get_db)):
-    # Aquí iría la lógica para validar el refresh token y generar un nuevo access token
-    # Por simplicidad, no implementamos la validación completa
-    
-    # Generar nuevo access token
-    new_access_token = create_access_token(data={"sub": "user@example.com"})
+    # Cada uso rota el token: el anterior deja de servir y se devuelve uno nuevo
+    new_access_token, new_refresh_token = rotate_refresh_token(db, refresh_token)
     
-    return {"access_token": new_access_token, "token_type": "bearer"}
+    return {"access_token": new_access_token, "token_type": "bearer", "refresh_token": new_refresh_token}
+
+@router.post("/logout")
+def logout(refresh_token: str = Body(..., embed=True), db: Session = Depends(get_db)):
+    revoke_refresh_token(db, refresh_token)
+    return {"message": "Sesión cerrada"}
 
 class VerifyEmailRequest(BaseModel):
     email: str
     code: str
 
 @router.post("/verify-email")
-def verify_email(verify_data: VerifyEmailRequest, db: Session = Depends(get_db)):
+def verify_email(request: Request, verify_data: VerifyEmailRequest, accept_language: Optional[str] = Header(None), db: Session = Depends(get_db)):
+    # El código tiene 6 dígitos: sin límite por email se adivina por fuerza bruta
+    login_limiter.check("verify-email", client_ip(request), verify_data.email)
     user = db.query(User).filter(User.email == verify_data.email).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -139,9 +166,10 @@ def verify_email(verify_data: VerifyEmailRequest, db: Session = Depends(get_db))
     # Marcar como verificado
     user.is_verified = True
     user.verification_code = None
+    enqueue_email(db, user.email, *welcome_email_content(user.first_name, negotiate_locale(accept_language)))
     db.commit()
+    email_sender.notify()
     
-    # Email de bienvenida temporalmente deshabilitado
     print(f"Usuario verificado exitosamente: {user.email}")
     
     return {"message": "Email verificado exitosamente"}
@@ -153,7 +181,7 @@ class GoogleLoginRequest(BaseModel):
     id_token: str
 
 @router.post("/resend-verification")
-def resend_verification_code(resend_data: ResendCodeRequest, db: Session = Depends(get_db)):
+def resend_verification_code(resend_data: ResendCodeRequest, accept_language: Optional[str] = Header(None), db: Session = Depends(get_db)):
     user = db.query(User).filter(User.email == resend_data.email).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
@@ -164,27 +192,22 @@ def resend_verification_code(resend_data: ResendCodeRequest, db: Session = Depen
     # Generar nuevo código
     new_code = generate_verification_code()
     user.verification_code = new_code
+    enqueue_email(db, user.email, *verification_email_content(new_code, user.first_name, negotiate_locale(accept_language)))
     db.commit()
+    email_sender.notify()
     
-    # Email temporalmente deshabilitado - mostrar código en consola
-    print(f"Nuevo código de verificación para {resend_data.email}: {new_code}")
-    print(f"Usuario: {user.first_name} {user.last_name}")
+    if not smtp_configured():
+        # Sin SMTP (desarrollo) - mostrar código en consola
+        print(f"Nuevo código de verificación para {resend_data.email}: {new_code}")
     
     return {"message": "Código de verificación reenviado"}
 
 @router.post("/google")
 def google_login(google_data: GoogleLoginRequest, db: Session = Depends(get_db)):
     try:
-        # Verificar el token de Google
-        response = requests.get(
-            f"https://oauth2.googleapis.com/tokeninfo?id_token={google_data.id_token}"
-        )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Token de Google inválido")
-        
-        google_user_info = response.json()
-        email = google_user_info.get("email")
+        # Verificar el token de Google localmente (firma con las llaves en cache, audiencia y emisor)
+        google_user_info = verify_google_id_token(google_data.id_token)
+        email = google_user_info.get("email") if google_user_info.get("email_verified") else None
         first_name = google_user_info.get("given_name", "")
         last_name = google_user_info.get("family_name", "")
         
@@ -215,11 +238,8 @@ def google_login(google_data: GoogleLoginRequest, db: Session = Depends(get_db))
                 db.commit()
         
         # Crear tokens
-        access_token = create_access_token(data={"sub": user.email})
-        refresh_token = create_access_token(
-            data={"sub": user.email, "refresh": True},
-            expires_delta=timedelta(days=30)
-        )
+        access_token = create_access_token(data=token_claims(user))
+        refresh_token = issue_refresh_token(db, user, timedelta(days=30))
         
         return {
             "access_token": access_token,
@@ -234,8 +254,8 @@ def google_login(google_data: GoogleLoginRequest, db: Session = Depends(get_db))
             }
         }
         
-    except requests.RequestException:
-        raise HTTPException(status_code=400, detail="Error al verificar token de Google")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error en Google login: {e}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
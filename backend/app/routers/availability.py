@@ -2,12 +2,17 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from ..database import get_db
 from ..schemas.schemas import AvailabilityBlockCreate, AvailabilityBlockOut
 from .. import models
-from ..models.models import Calendar, AvailabilitySlot
+from ..models.models import Calendar, User, DoctorProfile, doctor_insurances
 from ..utils.slot_generator import generate_slots_for_calendar
+from ..utils.availability_cache import invalidate_calendar
+from ..utils.availability_bitmap import availability_bitmaps
+from ..utils.earliest_search import find_earliest_slots
+from ..utils.slot_engine import get_free_intervals, get_bookable_slots, get_bookable_slots_bulk
+from ..utils.slot_holds import slot_holds
 
 
 router = APIRouter(prefix="/availability", tags=["Availability"])
@@ -27,6 +32,7 @@ def create_availability_blocks(
         db.add(availability)
         saved_blocks.append(availability)
     db.commit()
+    invalidate_calendar(calendar_id)
     return saved_blocks
 
 #Modelo de Json esperado
@@ -50,8 +56,9 @@ def generate_slots(calendar_id: int, db: Session = Depends(get_db)):
     if not calendar:
         raise HTTPException(status_code=404, detail="Calendario no encontrado")
     
-    generate_slots_for_calendar(calendar, db)
-    return {"detail": "Slots generados correctamente"}
+    stats = generate_slots_for_calendar(calendar, db)
+    invalidate_calendar(calendar_id)
+    return {"detail": "Slots generados correctamente", **stats}
 
 #   POST http://localhost:8000/availability/generate-slots?calendar_id=1
 #   Headers: Content-Type: application/json
@@ -72,27 +79,193 @@ class FreeSlotsResponse(BaseModel):
 
 @router.post("/free-slots", response_model=FreeSlotsResponse)
 def get_free_slots(req: FreeSlotRequest, db: Session = Depends(get_db)):
-    calendar_id = req.calendar_id
-    start_date = req.start_date
-    end_date = req.end_date
-    meeting_duration = timedelta(minutes=req.meeting_duration)
-
-    # Consulta slots del calendario dentro del rango
-    slots = db.query(AvailabilitySlot).filter(
-        AvailabilitySlot.calendar_id == calendar_id,
-        AvailabilitySlot.start_time >= datetime.combine(start_date, datetime.min.time()),
-        AvailabilitySlot.end_time <= datetime.combine(end_date, datetime.max.time()),
-        AvailabilitySlot.is_booked == False
-    ).all()
-
-    free_slots = []
-
-    for slot in slots:
-        slot_duration = slot.end_time - slot.start_time
-        if slot_duration >= meeting_duration:
-            free_slots.append({
-                "start": slot.start_time,
-                "end": slot.end_time
-            })
-
-    return {"free_slots": free_slots}
\ No newline at end of file
+    calendar = db.query(Calendar).filter_by(id=req.calendar_id).first()
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendario no encontrado")
+
+    # Intervalos libres exactos: ventanas fusionadas menos citas con sus buffers
+    free_intervals = get_free_intervals(
+        db,
+        calendar,
+        datetime.combine(req.start_date, datetime.min.time()),
+        datetime.combine(req.end_date, datetime.max.time()),
+        duration=req.meeting_duration
+    )
+
+    return {"free_slots": [{"start": start, "end": end} for start, end in free_intervals]}
+
+
+class NextFreeResponse(BaseModel):
+    calendar_id: int
+    duration: int
+    starts: List[datetime]
+
+@router.get("/calendars/{calendar_id}/next-free", response_model=NextFreeResponse)
+def get_next_free(
+    calendar_id: int,
+    duration: Optional[int] = Query(None, gt=0, description="Minutos; por defecto la duración del calendario"),
+    n: int = Query(5, ge=1, le=100),
+    after: Optional[datetime] = None,
+    db: Session = Depends(get_db)
+):
+    calendar = db.query(Calendar).filter_by(id=calendar_id).first()
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendario no encontrado")
+
+    duration = duration or calendar.meeting_duration or 60
+    slot_holds.expire([calendar_id])
+    bitmap = availability_bitmaps.get(db, calendar)
+    starts = bitmap.next_free(after or datetime.utcnow(), duration, n)
+    return {"calendar_id": calendar_id, "duration": duration, "starts": starts}
+
+#   GET http://localhost:8000/availability/calendars/1/next-free?duration=30&n=5
+
+
+# Máximo de calendarios por consulta en lote
+MAX_BATCH_CALENDARS = 500
+
+class BatchAvailabilityRequest(BaseModel):
+    calendar_ids: Optional[List[int]] = None
+    specialty_id: Optional[int] = None
+    clinic_id: Optional[int] = None
+    start: datetime
+    end: datetime
+    meeting_duration: Optional[int] = None  # minutos, por defecto la del calendario
+
+class CalendarAvailability(BaseModel):
+    calendar_id: int
+    free_slots: List[FreeSlotItem]
+
+class BatchAvailabilityResponse(BaseModel):
+    results: List[CalendarAvailability]
+
+@router.post("/batch", response_model=BatchAvailabilityResponse)
+def get_batch_availability(req: BatchAvailabilityRequest, db: Session = Depends(get_db)):
+    if req.end <= req.start:
+        raise HTTPException(status_code=400, detail="El rango de fechas es inválido")
+    if req.calendar_ids is None and req.specialty_id is None and req.clinic_id is None:
+        raise HTTPException(status_code=400, detail="Indica calendar_ids, specialty_id o clinic_id")
+
+    query = db.query(Calendar)
+    if req.calendar_ids is not None:
+        query = query.filter(Calendar.id.in_(req.calendar_ids))
+    if req.specialty_id is not None or req.clinic_id is not None:
+        query = query.join(User, Calendar.owner_id == User.id).join(DoctorProfile, DoctorProfile.user_id == User.id)
+        if req.specialty_id is not None:
+            query = query.filter(DoctorProfile.specialty_id == req.specialty_id)
+        if req.clinic_id is not None:
+            query = query.filter(DoctorProfile.clinic_id == req.clinic_id)
+
+    calendars = query.order_by(Calendar.id).limit(MAX_BATCH_CALENDARS + 1).all()
+    if len(calendars) > MAX_BATCH_CALENDARS:
+        raise HTTPException(status_code=400, detail=f"Máximo {MAX_BATCH_CALENDARS} calendarios por consulta")
+
+    slots_by_calendar = get_bookable_slots_bulk(db, calendars, req.start, req.end, req.meeting_duration)
+
+    return {
+        "results": [
+            {
+                "calendar_id": calendar_id,
+                "free_slots": [{"start": start, "end": end} for start, end in slots]
+            }
+            for calendar_id, slots in slots_by_calendar.items()
+        ]
+    }
+
+#   POST http://localhost:8000/availability/batch
+#   {
+#     "specialty_id": 2,
+#     "start": "2025-07-01T08:00:00",
+#     "end": "2025-07-01T12:00:00"
+#   }
+
+
+class EarliestSlotItem(BaseModel):
+    calendar_id: int
+    owner_id: int
+    start: datetime
+    end: datetime
+
+class EarliestSlotsResponse(BaseModel):
+    slots: List[EarliestSlotItem]
+
+@router.get("/earliest", response_model=EarliestSlotsResponse)
+def get_earliest_slots(
+    specialty_id: Optional[int] = None,
+    insurance_id: Optional[int] = None,
+    after: Optional[datetime] = None,
+    k: int = Query(10, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """Primeros slots libres entre todos los doctores que cumplen los filtros"""
+    query = db.query(Calendar).join(User, Calendar.owner_id == User.id).join(
+        DoctorProfile, DoctorProfile.user_id == User.id
+    )
+    if specialty_id is not None:
+        query = query.filter(DoctorProfile.specialty_id == specialty_id)
+    if insurance_id is not None:
+        query = query.join(
+            doctor_insurances, doctor_insurances.c.doctor_profile_id == DoctorProfile.id
+        ).filter(doctor_insurances.c.insurance_id == insurance_id)
+
+    calendars = query.all()
+    owners = {calendar.id: calendar.owner_id for calendar in calendars}
+    slots = find_earliest_slots(db, calendars, after or datetime.utcnow(), k)
+
+    return {
+        "slots": [
+            {"calendar_id": calendar_id, "owner_id": owners[calendar_id], "start": start, "end": end}
+            for start, calendar_id, end in slots
+        ]
+    }
+
+#   GET http://localhost:8000/availability/earliest?specialty_id=2&insurance_id=1&k=5
+
+
+class HoldRequest(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class HoldResponse(BaseModel):
+    token: str
+    calendar_id: int
+    start_time: datetime
+    end_time: datetime
+    expires_at: datetime
+
+@router.post("/calendars/{calendar_id}/holds", response_model=HoldResponse, status_code=201)
+def create_hold(calendar_id: int, req: HoldRequest, db: Session = Depends(get_db)):
+    """Aparta un slot por unos minutos mientras el paciente completa la reserva"""
+    calendar = db.query(Calendar).filter_by(id=calendar_id).first()
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendario no encontrado")
+    if req.end_time <= req.start_time:
+        raise HTTPException(status_code=400, detail="El rango de fechas es inválido")
+
+    # Solo se aparta un slot libre; la consulta ya excluye los apartados vigentes
+    duration = int((req.end_time - req.start_time).total_seconds() // 60)
+    free = get_bookable_slots(db, calendar, req.start_time, req.end_time, duration=duration)
+    if (req.start_time, req.end_time) not in free:
+        raise HTTPException(status_code=409, detail="El horario ya no está disponible")
+
+    hold = slot_holds.hold(calendar_id, req.start_time, req.end_time)
+    if hold is None:
+        raise HTTPException(status_code=409, detail="El horario ya no está disponible")
+    return hold._asdict()
+
+#   POST http://localhost:8000/availability/calendars/1/holds
+#   {
+#     "start_time": "2025-07-01T09:00:00",
+#     "end_time": "2025-07-01T09:30:00"
+#   }
+#   El token devuelto se envía como hold_token en POST /appointments/
+
+
+@router.delete("/holds/{token}")
+def release_hold(token: str):
+    """Libera un apartado antes de que venza (el paciente abandonó la reserva)"""
+    if slot_holds.release(token) is None:
+        raise HTTPException(status_code=404, detail="Apartado no encontrado o vencido")
+    return {"detail": "Apartado liberado"}
+
+#   DELETE http://localhost:8000/availability/holds/<token>
@@ -1,8 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
+from datetime import datetime
+from typing import List, Optional
+import json
+from ..database import get_db, engine
 from ..models.models import AvailabilitySlot, Calendar
+from ..utils.availability_cache import invalidate_calendar
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_page
 from ..schemas.schemas import AvailabilitySlotCreate, AvailabilitySlotRead, AvailabilitySlotOut
 
 router = APIRouter(prefix="/availability_slots", tags=["availability_slots"])
@@ -21,14 +27,66 @@ def create_availability_slot(slot: AvailabilitySlotCreate, db: Session = Depends
     db.add(new_slot)
     db.commit()
     db.refresh(new_slot)
+    invalidate_calendar(slot.calendar_id)
     return new_slot
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Filas que se traen del cursor por cada lote
+STREAM_YIELD_PER = 1000
+
+def _stream_slots(calendar_id: int, start: datetime = None, end: datetime = None):
+    """Emite los slots como NDJSON a medida que llegan del cursor del servidor."""
+    columns = AvailabilitySlot.__table__.c
+    statement = select(
+        columns.id, columns.calendar_id, columns.start_time, columns.end_time, columns.is_booked
+    ).where(columns.calendar_id == calendar_id).order_by(columns.start_time, columns.id)
+    if start is not None:
+        statement = statement.where(columns.start_time >= start)
+    if end is not None:
+        statement = statement.where(columns.start_time < end)
+
+    # Conexión propia: la sesión de get_db se cierra antes de que termine el streaming
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=STREAM_YIELD_PER).execute(statement)
+        for rows in result.partitions():
+            yield "".join(
+                json.dumps({
+                    "id": slot_id,
+                    "calendar_id": slot_calendar_id,
+                    "start_time": start_time.isoformat(),
+                    "end_time": end_time.isoformat(),
+                    "is_booked": bool(is_booked),
+                }) + "\n"
+                for slot_id, slot_calendar_id, start_time, end_time, is_booked in rows
+            )
+
 @router.get("/", response_model=List[AvailabilitySlotOut])
 def get_availability_slots(
+    request: Request,
+    response: Response,
     calendar_id: int = Query(..., description="ID del calendario"),
+    start: Optional[datetime] = Query(None, description="Slots que empiezan desde esta fecha"),
+    end: Optional[datetime] = Query(None, description="Slots que empiezan antes de esta fecha"),
+    cursor: Optional[str] = Query(None, description="Valor de X-Next-Cursor de la página anterior"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
-    slots = db.query(AvailabilitySlot).filter(AvailabilitySlot.calendar_id == calendar_id).all()
+    # Modo streaming: memoria constante sin importar el tamaño del calendario
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_stream_slots(calendar_id, start, end), media_type=NDJSON_MEDIA_TYPE)
+
+    query = db.query(AvailabilitySlot).filter(AvailabilitySlot.calendar_id == calendar_id)
+    if start is not None:
+        query = query.filter(AvailabilitySlot.start_time >= start)
+    if end is not None:
+        query = query.filter(AvailabilitySlot.start_time < end)
+
+    # Paginación por (start_time, id); el cuerpo sigue siendo una lista
+    slots, next_cursor = keyset_page(query, (AvailabilitySlot.start_time, AvailabilitySlot.id), cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return slots
 
-# GET http://localhost:8000/availability_slots/?calendar_id=1
\ No newline at end of file
+# GET http://localhost:8000/availability_slots/?calendar_id=1&start=2025-07-01T00:00:00&limit=100
+# Siguiente página: mismo query + &cursor=<X-Next-Cursor>
+# Headers: Accept: application/x-ndjson  (opcional, respuesta en streaming)
\ No newline at end of file
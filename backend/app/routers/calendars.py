@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from ..database import get_db
 from ..models.models import Calendar, User
 from ..schemas.schemas import CalendarCreate, CalendarRead
-from ..utils.slot_generator import generate_slots_for_calendar
+from ..utils.availability_cache import etag_matches
+from ..utils.ics_feed import ICS_MEDIA_TYPE, feed_state, feed_etag, http_date, not_modified_since, iter_feed
 
 router = APIRouter(prefix="/calendars", tags=["calendars"])
 
@@ -23,9 +25,8 @@ def create_calendar(calendar: CalendarCreate, db: Session = Depends(get_db)):
     db.add(new_calendar)
     db.commit()
     db.refresh(new_calendar)
-    
-    generate_slots_for_calendar(new_calendar, db)
-    
+
+    # Los slots ya no se materializan: se calculan bajo demanda desde los bloques
     return new_calendar
 
 # POST http://localhost:8000/calendars
@@ -35,4 +36,29 @@ def create_calendar(calendar: CalendarCreate, db: Session = Depends(get_db)):
 #  "name": "Calendario principal",
 #  "meeting_duration": 30,
 #  "slot_interval": 15
-#}
\ No newline at end of file
+#}
+
+
+@router.get("/{calendar_id}/feed.ics")
+def get_calendar_feed(calendar_id: int, request: Request, db: Session = Depends(get_db)):
+    """Feed iCalendar de las citas, para suscribirse desde Google/Apple Calendar"""
+    calendar = db.query(Calendar.id, Calendar.name).filter(Calendar.id == calendar_id).first()
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Calendario no encontrado")
+
+    last_modified, count = feed_state(db, calendar_id)
+    etag = feed_etag(calendar_id, last_modified, count)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = http_date(last_modified)
+
+    # If-None-Match tiene prioridad; If-Modified-Since solo si el cliente no manda ETag
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        not if_none_match and not_modified_since(request.headers.get("if-modified-since"), last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    return StreamingResponse(iter_feed(calendar_id, calendar.name), media_type=ICS_MEDIA_TYPE, headers=headers)
+
+# GET http://localhost:8000/calendars/1/feed.ics
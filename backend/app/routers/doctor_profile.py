@@ -16,6 +16,7 @@ from ..schemas.schemas import (
     ProfileVerificationUpdate
 )
 from ..utils.token_utils import get_current_user
+from ..utils.pagination import keyset_page
 from sqlalchemy import or_
 
 router = APIRouter(prefix="/doctor-profile", tags=["doctor-profile"])
@@ -146,6 +147,7 @@ def update_my_profile(
 def get_specialties(
     search: Optional[str] = None,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Obtener lista de especialidades con búsqueda opcional"""
@@ -159,8 +161,8 @@ def get_specialties(
             )
         )
     
-    specialties = query.limit(limit).all()
-    return {"specialties": specialties}
+    specialties, next_cursor = keyset_page(query, (Specialty.id,), cursor, limit)
+    return {"specialties": specialties, "next_cursor": next_cursor}
 
 
 @router.post("/specialties", response_model=SpecialtyRead)
@@ -195,6 +197,7 @@ def get_sub_specialties(
     specialty_id: Optional[int] = None,
     search: Optional[str] = None,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Obtener lista de sub-especialidades con filtros opcionales"""
@@ -211,8 +214,8 @@ def get_sub_specialties(
             )
         )
     
-    sub_specialties = query.limit(limit).all()
-    return {"sub_specialties": sub_specialties}
+    sub_specialties, next_cursor = keyset_page(query, (SubSpecialty.id,), cursor, limit)
+    return {"sub_specialties": sub_specialties, "next_cursor": next_cursor}
 
 
 @router.post("/sub-specialties", response_model=SubSpecialtyRead)
@@ -235,6 +238,7 @@ def create_sub_specialty(
 def get_insurances(
     search: Optional[str] = None,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Obtener lista de seguros con búsqueda opcional"""
@@ -248,8 +252,8 @@ def get_insurances(
             )
         )
     
-    insurances = query.limit(limit).all()
-    return {"insurances": insurances}
+    insurances, next_cursor = keyset_page(query, (Insurance.id,), cursor, limit)
+    return {"insurances": insurances, "next_cursor": next_cursor}
 
 
 @router.post("/insurances", response_model=InsuranceRead)
@@ -283,6 +287,7 @@ def create_insurance(
 def get_clinics(
     search: Optional[str] = None,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Obtener lista de clínicas con búsqueda opcional"""
@@ -296,8 +301,8 @@ def get_clinics(
             )
         )
     
-    clinics = query.limit(limit).all()
-    return {"clinics": clinics}
+    clinics, next_cursor = keyset_page(query, (Clinic.id,), cursor, limit)
+    return {"clinics": clinics, "next_cursor": next_cursor}
 
 
 @router.post("/clinics", response_model=ClinicRead)
@@ -320,6 +325,7 @@ def create_clinic(
 def get_services(
     search: Optional[str] = None,
     limit: int = 20,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Obtener lista de servicios con búsqueda opcional"""
@@ -333,8 +339,8 @@ def get_services(
             )
         )
     
-    services = query.limit(limit).all()
-    return {"services": services}
+    services, next_cursor = keyset_page(query, (Service.id,), cursor, limit)
+    return {"services": services, "next_cursor": next_cursor}
 
 
 @router.post("/services", response_model=ServiceRead)
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from ..utils.metrics import collect_metrics, render_prometheus
+
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return render_prometheus(collect_metrics())
+
+@router.get("/metrics/json")
+def get_metrics_json():
+    return collect_metrics()
+
+# GET http://localhost:8000/metrics
@@ -1,29 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.models.models import AvailabilitySlot, Calendar
-from app.schemas.schemas import AvailabilitySlotOut
+import json
+from app.models.models import Calendar
+from app.schemas.schemas import BookableSlotOut
 from app.database import get_db
+from app.utils.slot_engine import get_bookable_slots
+from app.utils.availability_cache import availability_cache, calendar_versions, etag_matches
+from app.utils.slot_holds import slot_holds
 
 router = APIRouter(tags=["Availability Slots"])
 
-@router.get("/calendars/{calendar_id}/available-slots", response_model=list[AvailabilitySlotOut])
+@router.get("/calendars/{calendar_id}/available-slots", response_model=list[BookableSlotOut])
 def get_available_slots(
+    request: Request,
     calendar_id: int,
     start_date: datetime = Query(...),
     end_date: datetime = Query(...),
     db: Session = Depends(get_db)
 ):
-    calendar = db.query(Calendar).filter_by(id=calendar_id).first()
-    if not calendar:
+    # Los apartados vencidos invalidan la versión antes de calcular el ETag
+    slot_holds.expire([calendar_id])
+    params = (start_date.isoformat(), end_date.isoformat())
+    version = calendar_versions.get(calendar_id)
+    if version is None:
+        # Con versiones en la base, None significa que el calendario no existe
         raise HTTPException(status_code=404, detail="Calendario no encontrado")
+    etag = availability_cache.etag(calendar_id, version, params)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
 
-    slots = db.query(AvailabilitySlot).filter(
-        AvailabilitySlot.calendar_id == calendar_id,
-        AvailabilitySlot.start_time >= start_date,
-        AvailabilitySlot.end_time <= end_date,
-        AvailabilitySlot.is_booked == False
-    ).order_by(AvailabilitySlot.start_time).all()
+    # El navegador ya tiene esta versión: no hace falta tocar la base de datos
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        availability_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
 
-    return slots
+    body = availability_cache.get(calendar_id, version, params)
+    if body is None:
+        calendar = db.query(Calendar).filter_by(id=calendar_id).first()
+        if not calendar:
+            raise HTTPException(status_code=404, detail="Calendario no encontrado")
+
+        # Los slots se calculan a partir de las reglas; solo las citas se persisten
+        slots = get_bookable_slots(db, calendar, start_date, end_date)
+        body = json.dumps(jsonable_encoder([
+            {"calendar_id": calendar_id, "start_time": start, "end_time": end}
+            for start, end in slots
+        ])).encode()
+        availability_cache.put(calendar_id, params, version, etag, body)
+
+    return Response(content=body, media_type="application/json", headers=headers)
 
@@ -62,7 +62,7 @@ class AppointmentBase(BaseModel):
     description: Optional[str] = None
 
 class AppointmentCreate(AppointmentBase):
-    pass
+    hold_token: Optional[str] = None  # apartado obtenido al elegir el horario
 
 class AppointmentRead(AppointmentBase):
     id: int
@@ -70,6 +70,10 @@ class AppointmentRead(AppointmentBase):
     class Config:
         from_attributes = True
 
+class AppointmentPage(BaseModel):
+    appointments: List[AppointmentRead]
+    next_cursor: Optional[str] = None
+
 class WeeklyAvailabilityCreate(BaseModel):
     day_of_week: str  # Ej: "monday"
     start_time: time
@@ -85,6 +89,11 @@ class AvailabilitySlotOut(BaseModel):
     class Config:
         from_attributes = True
 
+class BookableSlotOut(BaseModel):
+    calendar_id: int
+    start_time: datetime
+    end_time: datetime
+
 class WeekDay(str, Enum):
     mon = "mon"
     tue = "tue"
@@ -268,15 +277,20 @@ class ProfileVerificationUpdate(BaseModel):
 # Esquemas para respuestas de sugerencias
 class SpecialtySuggestion(BaseModel):
     specialties: List[SpecialtyRead]
+    next_cursor: Optional[str] = None
 
 class SubSpecialtySuggestion(BaseModel):
     sub_specialties: List[SubSpecialtyRead]
+    next_cursor: Optional[str] = None
 
 class InsuranceSuggestion(BaseModel):
     insurances: List[InsuranceRead]
+    next_cursor: Optional[str] = None
 
 class ServiceSuggestion(BaseModel):
     services: List[ServiceRead]
+    next_cursor: Optional[str] = None
 
 class ClinicSuggestion(BaseModel):
-    clinics: List[ClinicRead]
\ No newline at end of file
+    clinics: List[ClinicRead]
+    next_cursor: Optional[str] = None
\ No newline at end of file
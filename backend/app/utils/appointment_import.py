@@ -0,0 +1,197 @@
+import csv
+import io
+from datetime import datetime, timezone
+from itertools import islice
+from sqlalchemy import select, insert, update, tuple_
+from sqlalchemy.orm import Session
+from ..models.models import Appointment, AvailabilitySlot, Calendar, User
+from .availability_cache import invalidate_calendar
+from .capacity import reconcile_counters
+
+# Filas por lote: una consulta de calendarios, una de usuarios y un commit por lote
+IMPORT_BATCH_SIZE = 1000
+# Errores detallados que se devuelven; el resto solo se cuenta
+MAX_REPORTED_ERRORS = 1000
+
+appointments_table = Appointment.__table__
+slots_table = AvailabilitySlot.__table__
+
+
+def iter_csv_rows(stream):
+    """
+    Filas (número de línea, dict) de un CSV binario, leyendo de forma incremental.
+
+    Columnas: calendar_id, user_id, start_time, end_time, description (opcional).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _ics_lines(text):
+    """Desdobla las líneas continuadas de iCalendar (RFC 5545 §3.1)."""
+    current = None
+    start_number = 0
+    for number, raw in enumerate(text, start=1):
+        line = raw.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start_number, current
+        current = line
+        start_number = number
+    if current is not None:
+        yield start_number, current
+
+
+def _ics_datetime(value: str) -> str:
+    """Convierte 20250701T090000(Z) a ISO; las horas UTC se guardan sin zona, como el resto de la app."""
+    return datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S").isoformat()
+
+
+def iter_ics_rows(stream):
+    """
+    Filas (línea del BEGIN:VEVENT, dict) de un archivo .ics, evento por evento.
+
+    Se leen DTSTART, DTEND y SUMMARY/DESCRIPTION; calendario y paciente
+    pueden venir en X-VITALIS-CALENDAR-ID / X-VITALIS-USER-ID.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    event = None
+    event_line = 0
+    for number, line in _ics_lines(text):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].upper()
+        if name == "BEGIN" and value.upper() == "VEVENT":
+            event, event_line = {}, number
+        elif name == "END" and value.upper() == "VEVENT" and event is not None:
+            yield event_line, event
+            event = None
+        elif event is not None:
+            try:
+                if name == "DTSTART":
+                    event["start_time"] = _ics_datetime(value)
+                elif name == "DTEND":
+                    event["end_time"] = _ics_datetime(value)
+            except ValueError:
+                event["error"] = f"Fecha inválida en {name}: {value}"
+            if name == "SUMMARY":
+                event.setdefault("description", value)
+            elif name == "DESCRIPTION":
+                event["description"] = value
+            elif name == "X-VITALIS-CALENDAR-ID":
+                event["calendar_id"] = value
+            elif name == "X-VITALIS-USER-ID":
+                event["user_id"] = value
+
+
+def _parse_row(row: dict, defaults: dict):
+    """Valida los campos de una fila; devuelve (valores, None) o (None, error)."""
+    if row.get("error"):
+        return None, row["error"]
+    try:
+        calendar_id = int(row.get("calendar_id") or defaults.get("calendar_id") or 0)
+        user_id = int(row.get("user_id") or defaults.get("user_id") or 0)
+    except ValueError:
+        return None, "calendar_id y user_id deben ser enteros"
+    if not calendar_id or not user_id:
+        return None, "Faltan calendar_id o user_id"
+    try:
+        start_time = datetime.fromisoformat((row.get("start_time") or "").strip())
+        end_time = datetime.fromisoformat((row.get("end_time") or "").strip())
+    except ValueError:
+        return None, "start_time y end_time deben ser fechas ISO 8601"
+    if start_time.tzinfo is not None:
+        start_time = start_time.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_time.tzinfo is not None:
+        end_time = end_time.astimezone(timezone.utc).replace(tzinfo=None)
+    if end_time <= start_time:
+        return None, "La cita debe terminar después de empezar"
+    return {
+        "calendar_id": calendar_id,
+        "user_id": user_id,
+        "start_time": start_time,
+        "end_time": end_time,
+        "description": (row.get("description") or None),
+    }, None
+
+
+def import_appointments(db: Session, rows, defaults: dict = None, batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """
+    Importa citas en lotes desde un iterador de filas (número, dict).
+
+    Por lote se validan los campos, se comprueban calendarios y usuarios
+    con una consulta IN cada uno, se insertan las filas válidas con un solo
+    executemany y se confirma una vez. Las citas migradas no pasan por las
+    reglas de capacidad ni traslape (son agendas que ya existían); al final
+    se reconstruyen los contadores y se invalida la disponibilidad de los
+    calendarios tocados.
+
+    Returns:
+        dict: Filas importadas, fallidas y el detalle de errores por fila
+    """
+    defaults = defaults or {}
+    imported = 0
+    failed = 0
+    errors = []
+    touched = set()
+
+    def fail(number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": number, "error": message})
+
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+
+        parsed = []
+        for number, row in batch:
+            values, error = _parse_row(row, defaults)
+            if error:
+                fail(number, error)
+            else:
+                parsed.append((number, values))
+        if not parsed:
+            continue
+
+        calendar_ids = {values["calendar_id"] for _, values in parsed}
+        user_ids = {values["user_id"] for _, values in parsed}
+        known_calendars = set(db.execute(select(Calendar.id).where(Calendar.id.in_(calendar_ids))).scalars())
+        known_users = set(db.execute(select(User.id).where(User.id.in_(user_ids))).scalars())
+
+        valid = []
+        for number, values in parsed:
+            if values["calendar_id"] not in known_calendars:
+                fail(number, f"Calendario {values['calendar_id']} no encontrado")
+            elif values["user_id"] not in known_users:
+                fail(number, f"Usuario {values['user_id']} no encontrado")
+            else:
+                valid.append(values)
+        if not valid:
+            continue
+
+        db.execute(insert(appointments_table), valid)
+        # Los slots materializados que coinciden con citas importadas quedan reservados
+        db.execute(
+            update(slots_table).where(
+                tuple_(slots_table.c.calendar_id, slots_table.c.start_time, slots_table.c.end_time).in_(
+                    [(values["calendar_id"], values["start_time"], values["end_time"]) for values in valid]
+                )
+            ).values(is_booked=True)
+        )
+        db.commit()
+        imported += len(valid)
+        touched.update(values["calendar_id"] for values in valid)
+
+    if touched:
+        reconcile_counters(db, calendar_ids=sorted(touched))
+        invalidate_calendar(*touched)
+
+    errors.sort(key=lambda error: error["row"])
+    return {"imported": imported, "failed": failed, "errors": errors}
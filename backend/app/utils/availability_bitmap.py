@@ -0,0 +1,224 @@
+import threading
+from datetime import datetime, date, timedelta
+from sqlalchemy.orm import Session
+from ..models.models import AvailabilityBlock, Appointment
+from .slot_engine import WEEKDAY_CODES, group_blocks_by_day, busy_intervals
+from .availability_cache import calendar_versions, invalidate_calendar
+from .metrics import register_metrics
+from .slot_holds import slot_holds
+
+# Minutos por bit: 5 -> 288 bits (36 bytes) por día
+BITMAP_GRANULARITY_MINUTES = 5
+BITS_PER_DAY = 24 * 60 // BITMAP_GRANULARITY_MINUTES
+BYTES_PER_DAY = BITS_PER_DAY // 8
+BITMAP_HORIZON_DAYS = 60
+
+
+def _bit_floor(value) -> int:
+    return (value.hour * 60 + value.minute) // BITMAP_GRANULARITY_MINUTES
+
+
+def _bit_ceil(value) -> int:
+    minutes = value.hour * 60 + value.minute + (1 if value.second or value.microsecond else 0)
+    return -(-minutes // BITMAP_GRANULARITY_MINUTES)
+
+
+def _range_mask(first_bit: int, last_bit: int) -> int:
+    """Bits [first_bit, last_bit) encendidos."""
+    if last_bit <= first_bit:
+        return 0
+    return ((1 << (last_bit - first_bit)) - 1) << first_bit
+
+
+class CalendarBitmap:
+    """
+    Minutos reservables de un calendario, un bitmap por día.
+
+    El estado completo se guarda como un bytearray de BYTES_PER_DAY por día
+    (forma compacta, ~2 KB por calendario a 60 días), más una máscara por
+    día de la semana con los bits donde puede empezar un slot.
+    """
+
+    def __init__(self, calendar_id: int, start_date: date, days: int, version: int, start_masks, data: bytearray = None):
+        self.calendar_id = calendar_id
+        self.start_date = start_date
+        self.days = days
+        self.version = version
+        self.start_masks = tuple(start_masks)
+        self.data = data if data is not None else bytearray(BYTES_PER_DAY * days)
+
+    def day_bits(self, index: int) -> int:
+        offset = index * BYTES_PER_DAY
+        return int.from_bytes(self.data[offset:offset + BYTES_PER_DAY], "little")
+
+    def set_day_bits(self, index: int, bits: int):
+        offset = index * BYTES_PER_DAY
+        self.data[offset:offset + BYTES_PER_DAY] = bits.to_bytes(BYTES_PER_DAY, "little")
+
+    def clear(self, start: datetime, end: datetime):
+        """Apaga los bits ocupados por el intervalo (redondeando hacia afuera)."""
+        day = max(start.date(), self.start_date)
+        last = min(end.date(), self.start_date + timedelta(days=self.days - 1))
+        while day <= last:
+            first_bit = _bit_floor(start) if day == start.date() else 0
+            last_bit = _bit_ceil(end) if day == end.date() else BITS_PER_DAY
+            index = (day - self.start_date).days
+            self.set_day_bits(index, self.day_bits(index) & ~_range_mask(first_bit, last_bit))
+            day += timedelta(days=1)
+
+    def next_free(self, after: datetime, duration: int, limit: int) -> list:
+        """
+        Próximos `limit` inicios donde cabe una reunión de `duration` minutos.
+
+        Por cada día combina el bitmap consigo mismo desplazado (k bits
+        consecutivos) y con la máscara de inicios válidos; no recorre filas.
+        """
+        needed = -(-duration // BITMAP_GRANULARITY_MINUTES)
+        starts = []
+        day = max(after.date(), self.start_date)
+        while len(starts) < limit and (day - self.start_date).days < self.days:
+            index = (day - self.start_date).days
+            bits = self.day_bits(index)
+            runs = bits
+            for shift in range(1, needed):
+                runs &= bits >> shift
+            candidates = runs & self.start_masks[day.weekday()]
+            if day == after.date():
+                candidates &= ~_range_mask(0, _bit_ceil(after.time()))
+            while candidates and len(starts) < limit:
+                lowest = candidates & -candidates
+                bit = lowest.bit_length() - 1
+                starts.append(datetime.combine(day, datetime.min.time()) + timedelta(minutes=bit * BITMAP_GRANULARITY_MINUTES))
+                candidates ^= lowest
+            day += timedelta(days=1)
+        return starts
+
+    def to_bytes(self) -> bytes:
+        """Forma serializada: cabecera fija + máscaras de inicio + días."""
+        header = self.start_date.toordinal().to_bytes(4, "little") + self.days.to_bytes(2, "little")
+        masks = b"".join(mask.to_bytes(BYTES_PER_DAY, "little") for mask in self.start_masks)
+        return header + masks + bytes(self.data)
+
+    @classmethod
+    def from_bytes(cls, calendar_id: int, version: int, payload: bytes):
+        start_date = date.fromordinal(int.from_bytes(payload[0:4], "little"))
+        days = int.from_bytes(payload[4:6], "little")
+        offset = 6
+        masks = []
+        for _ in range(7):
+            masks.append(int.from_bytes(payload[offset:offset + BYTES_PER_DAY], "little"))
+            offset += BYTES_PER_DAY
+        return cls(calendar_id, start_date, days, version, masks, bytearray(payload[offset:]))
+
+
+def build_bitmap(calendar, blocks, appointments, start_date: date, days: int = BITMAP_HORIZON_DAYS, version: int = 0) -> CalendarBitmap:
+    """Construye el bitmap de un calendario a partir de sus bloques y citas."""
+    by_day = group_blocks_by_day(blocks)
+    interval = calendar.slot_interval or calendar.meeting_duration or BITMAP_GRANULARITY_MINUTES
+    duration = calendar.meeting_duration or interval
+
+    window_masks = []
+    start_masks = []
+    for code in WEEKDAY_CODES:
+        window_mask = 0
+        start_mask = 0
+        for block_start, block_end in by_day.get(code, ()):
+            window_mask |= _range_mask(_bit_ceil(block_start), _bit_floor(block_end))
+            # Inicios válidos: como el motor de slots, desde el inicio del bloque cada slot_interval
+            begin = datetime.combine(date.min, block_start)
+            end = datetime.combine(date.min, block_end)
+            current = begin
+            while current + timedelta(minutes=duration) <= end:
+                start_mask |= 1 << _bit_ceil(current.time())
+                current += timedelta(minutes=interval)
+        window_masks.append(window_mask)
+        start_masks.append(start_mask)
+
+    bitmap = CalendarBitmap(calendar.id, start_date, days, version, start_masks)
+    for index in range(days):
+        bitmap.set_day_bits(index, window_masks[(start_date + timedelta(days=index)).weekday()])
+    for busy_start, busy_end in busy_intervals(calendar, appointments):
+        bitmap.clear(busy_start, busy_end)
+    return bitmap
+
+
+class BitmapStore:
+    """
+    Bitmaps de todos los calendarios, en memoria y en forma compacta.
+
+    Un bitmap se reconstruye cuando cambia la versión del calendario o
+    cuando el día avanzó; las citas nuevas se aplican en sitio con
+    apply_appointment sin reconstruir.
+    """
+
+    def __init__(self):
+        self._bitmaps = {}
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.incremental_updates = 0
+
+    def get(self, db: Session, calendar) -> CalendarBitmap:
+        today = datetime.utcnow().date()
+        version = calendar_versions.get(calendar.id)
+        with self._lock:
+            bitmap = self._bitmaps.get(calendar.id)
+        if bitmap is not None and bitmap.version == version and bitmap.start_date == today:
+            return bitmap
+
+        range_start = datetime.combine(today, datetime.min.time())
+        range_end = range_start + timedelta(days=BITMAP_HORIZON_DAYS)
+        blocks = db.query(AvailabilityBlock).filter(AvailabilityBlock.calendar_id == calendar.id).all()
+        appointments = db.query(Appointment).filter(
+            Appointment.calendar_id == calendar.id,
+            Appointment.start_time < range_end + timedelta(minutes=calendar.buffer_before or 0),
+            Appointment.end_time > range_start - timedelta(minutes=calendar.buffer_after or 0)
+        ).all()
+        # Un apartado cambia la versión del calendario, así que el bitmap se reconstruye con él
+        appointments += slot_holds.active([calendar.id], range_start, range_end).get(calendar.id, [])
+        bitmap = build_bitmap(calendar, blocks, appointments, today, BITMAP_HORIZON_DAYS, version)
+        with self._lock:
+            self._bitmaps[calendar.id] = bitmap
+            self.builds += 1
+        return bitmap
+
+    def apply_appointment(self, calendar, start_time: datetime, end_time: datetime, previous_version: int):
+        """
+        Apaga en sitio los bits de una cita recién creada.
+
+        Solo aplica si el bitmap estaba al día con `previous_version`; si hubo
+        otros cambios entre medio, o el calendario admite varias citas por
+        slot, se descarta para que la siguiente consulta lo reconstruya.
+        """
+        with self._lock:
+            bitmap = self._bitmaps.get(calendar.id)
+            if bitmap is None:
+                return
+            if bitmap.version != previous_version or (calendar.max_per_slot or 1) > 1:
+                del self._bitmaps[calendar.id]
+                return
+            bitmap.clear(
+                start_time - timedelta(minutes=calendar.buffer_before or 0),
+                end_time + timedelta(minutes=calendar.buffer_after or 0)
+            )
+            bitmap.version = calendar_versions.get(calendar.id)
+            self.incremental_updates += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calendars": len(self._bitmaps),
+                "bytes": sum(len(bitmap.data) for bitmap in self._bitmaps.values()),
+                "builds": self.builds,
+                "incremental_updates": self.incremental_updates,
+            }
+
+
+availability_bitmaps = BitmapStore()
+register_metrics("availability_bitmaps", availability_bitmaps.stats)
+
+
+def appointment_created(calendar, start_time: datetime, end_time: datetime):
+    """Invalida la disponibilidad cacheada y actualiza el bitmap tras crear una cita."""
+    previous_version = calendar_versions.get(calendar.id)
+    invalidate_calendar(calendar.id)
+    availability_bitmaps.apply_appointment(calendar, start_time, end_time, previous_version)
@@ -0,0 +1,171 @@
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Optional
+from sqlalchemy import select, update
+from .metrics import register_metrics
+from ..database import engine
+from ..models.models import Calendar
+from ..config import AVAILABILITY_CACHE_MAX_BYTES, AVAILABILITY_VERSIONS_BACKEND
+
+# Cambia en cada arranque para que un ETag de un proceso anterior nunca coincida
+_BOOT_ID = secrets.token_hex(4)
+
+
+class CalendarVersions:
+    """
+    Contador de versión por calendario.
+
+    Se incrementa cada vez que cambian bloques, slots o citas del calendario;
+    toda entrada cacheada con una versión anterior queda invalidada. Los
+    contadores viven en memoria del proceso, así que solo sirven con un
+    único worker: con varios, un cambio hecho en otro proceso (o un
+    calendario borrado) no se ve y se responderían cuerpos cacheados y 304
+    obsoletos. Para eso está SqlCalendarVersions.
+    """
+    # Los contadores se reinician con el proceso: el ETag lleva el id del arranque
+    etag_prefix = _BOOT_ID
+
+    def __init__(self):
+        self._versions = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def get(self, calendar_id: int) -> Optional[int]:
+        return self._versions[calendar_id]
+
+    def bump(self, *calendar_ids, conn=None):
+        with self._lock:
+            for calendar_id in calendar_ids:
+                self._versions[calendar_id] += 1
+
+
+class SqlCalendarVersions:
+    """
+    Versión por calendario en la columna calendars.availability_version.
+
+    Todos los workers leen y avanzan el mismo contador, así que un cambio en
+    cualquiera invalida el cache y los ETags de los demás. Leerla es una
+    consulta por llave primaria (mucho menos que calcular la disponibilidad)
+    y devuelve None si el calendario ya no existe. `bump` acepta la conexión
+    de una transacción en curso para avanzar la versión junto con el cambio.
+    """
+    # Persistente y común a todos los workers: el ETag no depende del arranque
+    etag_prefix = "v"
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._calendars = Calendar.__table__
+
+    def get(self, calendar_id: int) -> Optional[int]:
+        with self.engine.connect() as conn:
+            return conn.execute(
+                select(self._calendars.c.availability_version).where(self._calendars.c.id == calendar_id)
+            ).scalar()
+
+    def bump(self, *calendar_ids, conn=None):
+        if not calendar_ids:
+            return
+        statement = (
+            update(self._calendars)
+            .where(self._calendars.c.id.in_(calendar_ids))
+            .values(availability_version=self._calendars.c.availability_version + 1)
+        )
+        if conn is not None:
+            conn.execute(statement)
+            return
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+
+class AvailabilityCache:
+    """
+    Cache LRU de respuestas de disponibilidad con tope de memoria.
+
+    Las claves incluyen el calendario y los parámetros de la consulta; cada
+    entrada guarda la versión del calendario con la que se calculó, su ETag y
+    el cuerpo JSON ya serializado.
+    """
+
+    def __init__(self, versions, max_bytes: int = AVAILABILITY_CACHE_MAX_BYTES):
+        self.versions = versions
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def etag(self, calendar_id: int, version: int, params: tuple) -> str:
+        """ETag fuerte derivado de calendario, versión y parámetros; no requiere la base de datos."""
+        digest = hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+        return f'"{self.versions.etag_prefix}-{calendar_id}-{version}-{digest}"'
+
+    def get(self, calendar_id: int, version: int, params: tuple):
+        key = (calendar_id, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, calendar_id: int, params: tuple, version: int, etag: str, body: bytes):
+        key = (calendar_id, params)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[2])
+            if len(body) > self.max_bytes:
+                return
+            self._entries[key] = (version, etag, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+                self.evictions += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _build_versions():
+    if AVAILABILITY_VERSIONS_BACKEND == "sql":
+        return SqlCalendarVersions(engine)
+    return CalendarVersions()
+
+
+calendar_versions = _build_versions()
+availability_cache = AvailabilityCache(calendar_versions)
+register_metrics("availability_cache", availability_cache.stats)
+
+
+def etag_matches(if_none_match, etag: str) -> bool:
+    """Compara el encabezado If-None-Match (uno o varios ETags) con el actual."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def invalidate_calendar(*calendar_ids):
+    """Marca como obsoleta la disponibilidad cacheada de los calendarios dados (tras el commit del cambio)."""
+    calendar_versions.bump(*calendar_ids)
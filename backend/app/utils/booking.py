@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, func
+from sqlalchemy.orm import Session
+from ..models.models import Appointment, AvailabilitySlot
+from .capacity import reserve_capacity
+from .slot_holds import slot_holds
+
+slots_table = AvailabilitySlot.__table__
+
+SLOT_TAKEN_DETAIL = "El horario ya no está disponible"
+
+
+def _conflict():
+    return HTTPException(status_code=status.HTTP_409_CONFLICT, detail=SLOT_TAKEN_DETAIL)
+
+
+def claim_slot(db: Session, calendar_id: int, start_time: datetime, end_time: datetime):
+    """
+    Marca como reservado el slot materializado que coincide con la cita.
+
+    En Postgres bloquea la fila con SELECT ... FOR UPDATE SKIP LOCKED, así que
+    un competidor que ya la tiene tomada hace que este intento falle de
+    inmediato en lugar de esperar. En SQLite usa un UPDATE condicional
+    (WHERE is_booked = false) y revisa el rowcount.
+
+    Returns:
+        int | None: id del slot reservado, o None si el calendario no tiene
+        un slot materializado para ese horario (modo de slots calculados)
+
+    Raises:
+        HTTPException: 409 si el slot existe pero ya está reservado
+    """
+    matching = (
+        (slots_table.c.calendar_id == calendar_id)
+        & (slots_table.c.start_time == start_time)
+        & (slots_table.c.end_time == end_time)
+    )
+
+    if db.get_bind().dialect.name == "postgresql":
+        slot_id = db.execute(
+            select(slots_table.c.id)
+            .where(matching, slots_table.c.is_booked == False)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if slot_id is not None:
+            db.execute(update(slots_table).where(slots_table.c.id == slot_id).values(is_booked=True))
+            return slot_id
+    else:
+        slot_id = db.execute(
+            select(slots_table.c.id).where(matching, slots_table.c.is_booked == False).limit(1)
+        ).scalar()
+        if slot_id is not None:
+            result = db.execute(
+                update(slots_table)
+                .where(slots_table.c.id == slot_id, slots_table.c.is_booked == False)
+                .values(is_booked=True)
+            )
+            if result.rowcount == 1:
+                return slot_id
+
+    # No se pudo tomar: o no hay slot materializado, o alguien lo ganó
+    exists = db.execute(select(func.count()).select_from(slots_table).where(matching)).scalar()
+    if exists:
+        db.rollback()
+        raise _conflict()
+    return None
+
+
+def release_slot(db: Session, calendar_id: int, start_time: datetime, end_time: datetime):
+    """Libera el slot materializado de una cita cancelada (misma transacción)."""
+    db.execute(
+        update(slots_table).where(
+            slots_table.c.calendar_id == calendar_id,
+            slots_table.c.start_time == start_time,
+            slots_table.c.end_time == end_time,
+            slots_table.c.is_booked == True
+        ).values(is_booked=False)
+    )
+
+
+def book_appointment(db: Session, calendar, user_id: int, start_time: datetime, end_time: datetime,
+                     description: str = None, hold_token: str = None) -> Appointment:
+    """
+    Reserva el horario y crea la cita en una sola transacción.
+
+    1. Toma el slot materializado, si existe (condicional / SKIP LOCKED).
+    2. Incrementa los contadores de capacidad; el UPDATE del contador diario
+       serializa las reservas del mismo calendario y día.
+    3. Con eso tomado, verifica que no haya citas traslapadas (con buffers)
+       más allá de max_per_slot; los apartados de otros pacientes cuentan
+       como citas, el de `hold_token` no.
+    4. Inserta la cita, confirma y libera el apartado.
+
+    Cualquier conflicto deshace la transacción y lanza 409.
+    """
+    if end_time <= start_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La cita debe terminar después de empezar")
+
+    claim_slot(db, calendar.id, start_time, end_time)
+    reserve_capacity(db, calendar, start_time)
+
+    before = timedelta(minutes=calendar.buffer_before or 0)
+    after = timedelta(minutes=calendar.buffer_after or 0)
+    overlapping = db.execute(
+        select(func.count()).select_from(Appointment).where(
+            Appointment.calendar_id == calendar.id,
+            Appointment.start_time < end_time + before,
+            Appointment.end_time > start_time - after
+        )
+    ).scalar()
+    overlapping += slot_holds.held_by_others(calendar.id, start_time - after, end_time + before, hold_token)
+    if overlapping >= (calendar.max_per_slot or 1):
+        db.rollback()
+        raise _conflict()
+
+    new_appointment = Appointment(
+        start_time=start_time,
+        end_time=end_time,
+        calendar_id=calendar.id,
+        user_id=user_id,
+        description=description
+    )
+    db.add(new_appointment)
+    db.commit()
+    db.refresh(new_appointment)
+    if hold_token:
+        slot_holds.release(hold_token)
+    return new_appointment
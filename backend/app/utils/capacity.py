@@ -0,0 +1,115 @@
+from collections import Counter
+from datetime import datetime
+from fastapi import HTTPException, status
+from sqlalchemy import insert, update, delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from ..models.models import BookingCounter, Appointment
+
+counters_table = BookingCounter.__table__
+
+DAY_SCOPE = "day"
+SLOT_SCOPE = "slot"
+
+
+def _periods(calendar, start_time: datetime):
+    """(scope, inicio del periodo, límite) de cada contador que afecta una cita."""
+    day_start = datetime.combine(start_time.date(), datetime.min.time())
+    return (
+        (DAY_SCOPE, day_start, calendar.max_per_day),
+        (SLOT_SCOPE, start_time, calendar.max_per_slot),
+    )
+
+
+def _ensure_counter(db: Session, calendar_id: int, scope: str, period_start: datetime):
+    values = {"calendar_id": calendar_id, "scope": scope, "period_start": period_start, "count": 0}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        statement = pg_insert(counters_table).values(**values).on_conflict_do_nothing()
+    elif dialect == "sqlite":
+        statement = sqlite_insert(counters_table).values(**values).on_conflict_do_nothing()
+    else:
+        exists = db.execute(select(counters_table.c.id).where(
+            counters_table.c.calendar_id == calendar_id,
+            counters_table.c.scope == scope,
+            counters_table.c.period_start == period_start
+        )).first()
+        if exists:
+            return
+        statement = insert(counters_table).values(**values)
+    db.execute(statement)
+
+
+def reserve_capacity(db: Session, calendar, start_time: datetime):
+    """
+    Incrementa los contadores diario y por slot de una cita nueva.
+
+    Cada contador se actualiza con un UPDATE condicional (count < límite)
+    sobre su clave única, así que la verificación es O(1) y no cuenta citas.
+    Debe llamarse en la misma transacción que inserta la cita; si algún
+    límite se alcanzó lanza 409 y la transacción no debe confirmarse.
+    """
+    for scope, period_start, limit in _periods(calendar, start_time):
+        _ensure_counter(db, calendar.id, scope, period_start)
+        statement = update(counters_table).where(
+            counters_table.c.calendar_id == calendar.id,
+            counters_table.c.scope == scope,
+            counters_table.c.period_start == period_start
+        )
+        if limit:
+            statement = statement.where(counters_table.c.count < limit)
+        result = db.execute(statement.values(count=counters_table.c.count + 1))
+        if result.rowcount != 1:
+            db.rollback()
+            detail = "Se alcanzó el máximo de citas del día" if scope == DAY_SCOPE else "Se alcanzó el máximo de citas para este horario"
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+
+
+def release_capacity(db: Session, calendar, start_time: datetime):
+    """Decrementa los contadores de una cita cancelada (misma transacción que el borrado)."""
+    for scope, period_start, _ in _periods(calendar, start_time):
+        db.execute(update(counters_table).where(
+            counters_table.c.calendar_id == calendar.id,
+            counters_table.c.scope == scope,
+            counters_table.c.period_start == period_start,
+            counters_table.c.count > 0
+        ).values(count=counters_table.c.count - 1))
+
+
+def reconcile_counters(db: Session, calendar_ids=None) -> dict:
+    """
+    Reconstruye los contadores desde la tabla de citas.
+
+    Pensado para correr tras una caída o una importación manual; recorre
+    las citas con un cursor por lotes y reemplaza los contadores existentes.
+
+    Returns:
+        dict: Número de contadores diarios y por slot escritos
+    """
+    statement = select(Appointment.calendar_id, Appointment.start_time)
+    cleanup = delete(counters_table)
+    if calendar_ids is not None:
+        statement = statement.where(Appointment.calendar_id.in_(calendar_ids))
+        cleanup = cleanup.where(counters_table.c.calendar_id.in_(calendar_ids))
+
+    day_counts = Counter()
+    slot_counts = Counter()
+    for calendar_id, start_time in db.execute(statement.execution_options(yield_per=5000)):
+        if start_time is None:
+            continue
+        day_counts[(calendar_id, datetime.combine(start_time.date(), datetime.min.time()))] += 1
+        slot_counts[(calendar_id, start_time)] += 1
+
+    db.execute(cleanup)
+    rows = [
+        {"calendar_id": calendar_id, "scope": DAY_SCOPE, "period_start": period, "count": count}
+        for (calendar_id, period), count in day_counts.items()
+    ] + [
+        {"calendar_id": calendar_id, "scope": SLOT_SCOPE, "period_start": period, "count": count}
+        for (calendar_id, period), count in slot_counts.items()
+    ]
+    for i in range(0, len(rows), 1000):
+        db.execute(insert(counters_table), rows[i:i + 1000])
+    db.commit()
+    return {"day_counters": len(day_counts), "slot_counters": len(slot_counts)}
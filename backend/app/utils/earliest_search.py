@@ -0,0 +1,86 @@
+import heapq
+from datetime import datetime, timedelta
+from itertools import groupby, islice
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ..models.models import AvailabilityBlock, Appointment
+from .slot_engine import iter_bookable_slots
+from .slot_holds import slot_holds
+
+# Días por ventana de búsqueda y ventanas máximas a recorrer
+EARLIEST_WINDOW_DAYS = 7
+EARLIEST_MAX_DAYS = 90
+
+
+def _tagged(calendar_id: int, slots):
+    for start, end in slots:
+        yield start, calendar_id, end
+
+
+def find_earliest_slots(db: Session, calendars, after: datetime, k: int,
+                        window_days: int = EARLIEST_WINDOW_DAYS, max_days: int = EARLIEST_MAX_DAYS) -> list:
+    """
+    Los primeros `k` slots libres entre muchos calendarios (k-way merge).
+
+    Recorre el tiempo por ventanas: en cada una carga bloques y citas de todos
+    los calendarios con una consulta agrupada, crea un generador perezoso por
+    calendario y los mezcla con heapq.merge. Se detiene en cuanto junta `k`
+    resultados, así que casi nunca se calcula el horizonte completo.
+
+    Returns:
+        list: Tuplas (inicio, calendar_id, fin) en orden cronológico
+    """
+    calendars = {calendar.id: calendar for calendar in calendars}
+    if not calendars or k <= 0:
+        return []
+
+    # Solo columnas (filas de Core): miles de objetos ORM cuestan más que la búsqueda
+    blocks = db.execute(
+        select(
+            AvailabilityBlock.calendar_id,
+            AvailabilityBlock.day_of_week,
+            AvailabilityBlock.start_time,
+            AvailabilityBlock.end_time
+        ).where(AvailabilityBlock.calendar_id.in_(list(calendars))).order_by(AvailabilityBlock.calendar_id)
+    ).all()
+    blocks_by_calendar = {key: list(group) for key, group in groupby(blocks, key=lambda b: b.calendar_id)}
+    # Calendarios sin reglas nunca tienen slots
+    calendar_ids = list(blocks_by_calendar)
+    if not calendar_ids:
+        return []
+
+    before = timedelta(minutes=max(calendars[i].buffer_before or 0 for i in calendar_ids))
+    after_buffer = timedelta(minutes=max(calendars[i].buffer_after or 0 for i in calendar_ids))
+
+    results = []
+    window_start = after
+    search_end = after + timedelta(days=max_days)
+    while window_start < search_end and len(results) < k:
+        # Ventanas alineadas a medianoche: ningún slot queda partido entre dos ventanas
+        window_end = min(
+            datetime.combine(window_start.date() + timedelta(days=window_days), datetime.min.time()),
+            search_end
+        )
+        appointments = db.execute(
+            select(Appointment.calendar_id, Appointment.start_time, Appointment.end_time).where(
+                Appointment.calendar_id.in_(calendar_ids),
+                Appointment.start_time < window_end + before,
+                Appointment.end_time > window_start - after_buffer
+            ).order_by(Appointment.calendar_id)
+        ).all()
+        appointments_by_calendar = {key: list(group) for key, group in groupby(appointments, key=lambda a: a.calendar_id)}
+        holds_by_calendar = slot_holds.active(calendar_ids, window_start - after_buffer, window_end + before)
+
+        streams = [
+            _tagged(calendar_id, iter_bookable_slots(
+                calendars[calendar_id],
+                blocks_by_calendar[calendar_id],
+                appointments_by_calendar.get(calendar_id, []) + holds_by_calendar.get(calendar_id, []),
+                window_start,
+                window_end
+            ))
+            for calendar_id in calendar_ids
+        ]
+        results.extend(islice(heapq.merge(*streams), k - len(results)))
+        window_start = window_end
+    return results
@@ -0,0 +1,230 @@
+import asyncio
+import random
+import smtplib
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models.models import EmailOutbox
+from ..config import (
+    EMAIL_OUTBOX_BATCH_SIZE, EMAIL_OUTBOX_POLL_SECONDS, EMAIL_OUTBOX_MAX_ATTEMPTS,
+    EMAIL_OUTBOX_RETRY_BASE_SECONDS, EMAIL_OUTBOX_LEASE_SECONDS
+)
+from .email_utils import SmtpSession, build_raw_message, smtp_configured
+from .metrics import register_metrics
+
+outbox = EmailOutbox.__table__
+
+# Tope del backoff entre reintentos
+MAX_RETRY_DELAY_SECONDS = 6 * 3600
+
+
+def enqueue_email(db: Session, to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> EmailOutbox:
+    """
+    Agrega un correo a la cola dentro de la transacción de `db`.
+
+    Se envía solo si esa transacción se confirma, así que el correo y el
+    cambio que lo origina (un registro, por ejemplo) se guardan juntos.
+    Tras el commit conviene llamar a email_sender.notify() para no esperar
+    al siguiente sondeo.
+    """
+    message = EmailOutbox(to_email=to_email, subject=subject, html_body=html_content, text_body=text_content)
+    db.add(message)
+    return message
+
+
+def retry_delay(attempts: int) -> float:
+    """Backoff exponencial con ±20 % de variación: base, 2·base, 4·base... hasta el tope."""
+    delay = min(EMAIL_OUTBOX_RETRY_BASE_SECONDS * 2 ** (attempts - 1), MAX_RETRY_DELAY_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def claim_batch(batch_size: int = EMAIL_OUTBOX_BATCH_SIZE, lease_seconds: int = EMAIL_OUTBOX_LEASE_SECONDS) -> list:
+    """
+    Toma un lote de correos pendientes que ya tocan.
+
+    Un UPDATE condicional los marca con un token propio y corre su próximo
+    intento al final del lease, de modo que otro proceso no los toma y, si
+    este muere a mitad del envío, vuelven a la cola al vencer el lease.
+    """
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        due = (
+            select(outbox.c.id)
+            .where(outbox.c.status == "pending", outbox.c.next_attempt_at <= now)
+            .order_by(outbox.c.next_attempt_at, outbox.c.id)
+            .limit(batch_size)
+        )
+        db.execute(
+            update(outbox)
+            .where(outbox.c.id.in_(due.scalar_subquery()), outbox.c.status == "pending", outbox.c.next_attempt_at <= now)
+            .values(lease_token=token, next_attempt_at=now + timedelta(seconds=lease_seconds), attempts=outbox.c.attempts + 1)
+        )
+        db.commit()
+        return db.execute(
+            select(outbox).where(outbox.c.lease_token == token, outbox.c.status == "pending").order_by(outbox.c.id)
+        ).all()
+    finally:
+        db.close()
+
+
+def _error_code(error) -> Optional[int]:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return next(iter(error.recipients.values()))[0]
+    return getattr(error, "smtp_code", None)
+
+
+def deliver(rows, session: SmtpSession) -> tuple:
+    """
+    Envía el lote por la sesión SMTP compartida.
+
+    Returns:
+        tuple: (ids enviados, [(fila, error, permanente)])
+    """
+    sent, failures = [], []
+    for i, row in enumerate(rows):
+        try:
+            session.send(build_raw_message(row.to_email, row.subject, row.html_body, row.text_body), row.to_email)
+            sent.append(row.id)
+        except (smtplib.SMTPAuthenticationError, smtplib.SMTPConnectError, smtplib.SMTPHeloError) as e:
+            # Fallo al conectar o autenticarse (p. ej. contraseña rotada): no es culpa
+            # del mensaje; se reintenta el lote sin marcar nada como definitivo
+            session.close()
+            failures.extend((pending, str(e), False) for pending in rows[i:])
+            break
+        except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused) as e:
+            # Rechazo de este mensaje: 5xx es definitivo, 4xx se reintenta
+            code = _error_code(e)
+            failures.append((row, str(e), code is not None and 500 <= code < 600))
+        except (smtplib.SMTPException, OSError) as e:
+            # Servidor inalcanzable: el resto del lote se reintenta más tarde
+            session.close()
+            failures.extend((pending, str(e), False) for pending in rows[i:])
+            break
+    return sent, failures
+
+
+def record_results(sent, failures) -> dict:
+    """Marca los enviados y reprograma (o da por fallidos) los que no salieron."""
+    now = datetime.utcnow()
+    stats = {"sent": len(sent), "retried": 0, "failed": 0}
+    db = SessionLocal()
+    try:
+        if sent:
+            db.execute(
+                update(outbox).where(outbox.c.id.in_(sent))
+                .values(status="sent", sent_at=now, lease_token=None, last_error=None)
+            )
+        for row, error, permanent in failures:
+            values = {"lease_token": None, "last_error": error[:500]}
+            if permanent or row.attempts >= EMAIL_OUTBOX_MAX_ATTEMPTS:
+                values["status"] = "failed"
+                stats["failed"] += 1
+            else:
+                values["next_attempt_at"] = now + timedelta(seconds=retry_delay(row.attempts))
+                stats["retried"] += 1
+            db.execute(update(outbox).where(outbox.c.id == row.id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+    return stats
+
+
+class OutboxSender:
+    """
+    Envío en segundo plano de la cola de correos.
+
+    Un hilo propio toma lotes de EMAIL_OUTBOX_BATCH_SIZE y los manda por una
+    sola sesión SMTP autenticada, que se reutiliza entre lotes mientras no
+    quede inactiva. Revisa la cola cada EMAIL_OUTBOX_POLL_SECONDS, o enseguida
+    tras notify(). Los rechazos temporales y las caídas del servidor se
+    reintentan con backoff exponencial hasta EMAIL_OUTBOX_MAX_ATTEMPTS.
+    """
+
+    def __init__(self, batch_size: int = EMAIL_OUTBOX_BATCH_SIZE, poll_seconds: float = EMAIL_OUTBOX_POLL_SECONDS, session: SmtpSession = None):
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.session = session or SmtpSession()
+        self._executor = None
+        self._task = None
+        self._loop = None
+        self._wake = None
+        self._lock = threading.Lock()
+        self.totals = {"batches": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    def drain(self) -> dict:
+        """Envía todo lo pendiente que ya toca, lote por lote (bloqueante)."""
+        totals = {"sent": 0, "retried": 0, "failed": 0}
+        while True:
+            rows = claim_batch(self.batch_size)
+            if not rows:
+                self.session.close_if_idle()
+                return totals
+            stats = record_results(*deliver(rows, self.session))
+            with self._lock:
+                self.totals["batches"] += 1
+                for key, value in stats.items():
+                    self.totals[key] += value
+                    totals[key] += value
+            # Lote incompleto, o nada salió (servidor caído): esperar al siguiente ciclo
+            if len(rows) < self.batch_size or not stats["sent"]:
+                return totals
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wake.clear()
+            try:
+                await loop.run_in_executor(self._executor, self.drain)
+            except Exception as e:
+                print(f"Error al enviar la cola de correos: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    def notify(self):
+        """Despierta al envío (se puede llamar desde cualquier hilo)."""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._wake.set)
+
+    def start(self):
+        if not smtp_configured():
+            print("SMTP no configurado: los correos quedan en la cola sin enviarse")
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="email-outbox")
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wake = asyncio.Event()
+            self._task = self._loop.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._loop = None
+        if self._executor is not None:
+            # La sesión SMTP pertenece al hilo de envío
+            self._executor.submit(self.session.close)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.totals, "smtp_connections": self.session.connections}
+
+
+email_sender = OutboxSender()
+register_metrics("email_outbox", email_sender.stats)
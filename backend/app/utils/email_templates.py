@@ -0,0 +1,411 @@
+import html
+import re
+from typing import Optional
+from ..config import DEFAULT_EMAIL_LOCALE
+from .email_utils import APP_NAME, APP_URL, send_email
+
+# Campos por destinatario: {{ nombre }}. Las llaves simples del CSS no chocan.
+_FIELD = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Valores fijos de la instalación; se resuelven al compilar, no en cada envío
+CONSTANTS = {"app_name": APP_NAME, "app_url": APP_URL}
+
+
+class CompiledTemplate:
+    """
+    Plantilla partida una sola vez en tramos fijos y campos.
+
+    Las constantes (CONSTANTS) y los bloques anidados ya quedan dentro de
+    los tramos fijos, así que render solo intercala los valores del
+    destinatario: una unión de cadenas, sin volver a recorrer el HTML.
+    En las plantillas HTML los valores se escapan.
+    """
+
+    __slots__ = ("_statics", "_fields", "_escape")
+
+    def __init__(self, source: str, escape: bool = False, constants: dict = CONSTANTS):
+        self._escape = escape
+        pieces = _FIELD.split(source)
+        statics, fields = [pieces[0]], []
+        for name, static in zip(pieces[1::2], pieces[2::2]):
+            if name in constants:
+                value = constants[name]
+                statics[-1] += (html.escape(value) if escape else value) + static
+            else:
+                fields.append(name)
+                statics.append(static)
+        self._statics = tuple(statics)
+        self._fields = tuple(fields)
+
+    @property
+    def fields(self) -> tuple:
+        return self._fields
+
+    def render(self, values: dict) -> str:
+        out = [self._statics[0]]
+        escape = self._escape
+        for name, static in zip(self._fields, self._statics[1:]):
+            value = str(values[name])
+            out.append(html.escape(value) if escape else value)
+            out.append(static)
+        return "".join(out)
+
+
+class EmailTemplate:
+    """Asunto, HTML y texto plano de un correo en un idioma."""
+
+    __slots__ = ("subject", "html", "text")
+
+    def __init__(self, subject: str, html_content: str, text_content: str):
+        self.subject = CompiledTemplate(subject)
+        self.html = CompiledTemplate(html_content, escape=True)
+        self.text = CompiledTemplate(text_content)
+
+    def render(self, **values) -> tuple:
+        """
+        Returns:
+            tuple: (asunto, HTML, texto plano)
+        """
+        return self.subject.render(values), self.html.render(values), self.text.render(values)
+
+
+LAYOUT = """
+    <!DOCTYPE html>
+    <html lang="{{ lang }}">
+    <head>
+        <meta charset="utf-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{{ title }}</title>
+        <style>
+            body {
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                line-height: 1.6;
+                color: #333;
+                max-width: 600px;
+                margin: 0 auto;
+                padding: 20px;
+                background-color: #f4f4f4;
+            }
+            .container {
+                background: white;
+                padding: 40px;
+                border-radius: 10px;
+                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
+            }
+            .header {
+                text-align: center;
+                margin-bottom: 30px;
+            }
+            .logo {
+                font-size: 24px;
+                font-weight: bold;
+                color: #667eea;
+                margin-bottom: 10px;
+            }
+            .verification-code {
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                color: white;
+                font-size: 32px;
+                font-weight: bold;
+                text-align: center;
+                padding: 20px;
+                border-radius: 8px;
+                letter-spacing: 8px;
+                margin: 30px 0;
+            }
+            .instructions {
+                background: #f8f9fa;
+                padding: 20px;
+                border-radius: 8px;
+                border-left: 4px solid #667eea;
+                margin: 20px 0;
+            }
+            .button {
+                display: inline-block;
+                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
+                color: white;
+                padding: 12px 30px;
+                text-decoration: none;
+                border-radius: 6px;
+                font-weight: bold;
+                margin: 20px 0;
+            }
+            .footer {
+                text-align: center;
+                margin-top: 30px;
+                padding-top: 20px;
+                border-top: 1px solid #eee;
+                color: #666;
+                font-size: 14px;
+            }
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <div class="logo">{{ app_name }}</div>
+                <h1>{{ title }}</h1>
+            </div>
+            {{ content }}
+        </div>
+    </body>
+    </html>
+    """
+
+# (plantilla, idioma) -> título, asunto, contenido HTML y texto plano
+SOURCES = {
+    ("verification", "es"): {
+        "title": "Verificación de Email",
+        "subject": "Código de verificación - {{ app_name }}",
+        "html": """
+            <p>Hola <strong>{{ user_name }}</strong>,</p>
+
+            <p>Gracias por registrarte en {{ app_name }}. Para completar tu registro, necesitamos verificar tu dirección de email.</p>
+
+            <p>Tu código de verificación es:</p>
+
+            <div class="verification-code">
+                {{ verification_code }}
+            </div>
+
+            <div class="instructions">
+                <strong>Instrucciones:</strong>
+                <ol>
+                    <li>Ve a la página de verificación de email</li>
+                    <li>Ingresa el código de 6 dígitos mostrado arriba</li>
+                    <li>Haz clic en "Verificar Email"</li>
+                </ol>
+            </div>
+
+            <p>Este código expirará en <strong>24 horas</strong> por seguridad.</p>
+
+            <p>Si no solicitaste esta verificación, puedes ignorar este email de forma segura.</p>
+
+            <div class="footer">
+                <p>Este es un email automático, por favor no respondas a este mensaje.</p>
+                <p>&copy; 2024 {{ app_name }}. Todos los derechos reservados.</p>
+            </div>""",
+        "text": """
+    Hola {{ user_name }},
+
+    Gracias por registrarte en {{ app_name }}.
+
+    Tu código de verificación es: {{ verification_code }}
+
+    Ingresa este código en la página de verificación para completar tu registro.
+
+    Este código expirará en 24 horas.
+
+    Si no solicitaste esta verificación, puedes ignorar este email.
+
+    Saludos,
+    Equipo de {{ app_name }}
+    """,
+    },
+    ("verification", "en"): {
+        "title": "Email Verification",
+        "subject": "Verification code - {{ app_name }}",
+        "html": """
+            <p>Hi <strong>{{ user_name }}</strong>,</p>
+
+            <p>Thanks for signing up for {{ app_name }}. To finish your registration we need to verify your email address.</p>
+
+            <p>Your verification code is:</p>
+
+            <div class="verification-code">
+                {{ verification_code }}
+            </div>
+
+            <div class="instructions">
+                <strong>Instructions:</strong>
+                <ol>
+                    <li>Go to the email verification page</li>
+                    <li>Enter the 6-digit code shown above</li>
+                    <li>Click "Verify Email"</li>
+                </ol>
+            </div>
+
+            <p>For your security this code expires in <strong>24 hours</strong>.</p>
+
+            <p>If you did not request this verification, you can safely ignore this email.</p>
+
+            <div class="footer">
+                <p>This is an automated email, please do not reply to this message.</p>
+                <p>&copy; 2024 {{ app_name }}. All rights reserved.</p>
+            </div>""",
+        "text": """
+    Hi {{ user_name }},
+
+    Thanks for signing up for {{ app_name }}.
+
+    Your verification code is: {{ verification_code }}
+
+    Enter this code on the verification page to finish your registration.
+
+    This code expires in 24 hours.
+
+    If you did not request this verification, you can ignore this email.
+
+    Regards,
+    The {{ app_name }} team
+    """,
+    },
+    ("welcome", "es"): {
+        "title": "¡Bienvenido!",
+        "subject": "¡Bienvenido a {{ app_name }}!",
+        "html": """
+            <p>Hola <strong>{{ user_name }}</strong>,</p>
+
+            <p>¡Tu email ha sido verificado exitosamente! Ya puedes acceder a todas las funcionalidades de {{ app_name }}.</p>
+
+            <p>Ahora puedes:</p>
+            <ul>
+                <li>Completar tu perfil profesional</li>
+                <li>Configurar tu calendario de disponibilidad</li>
+                <li>Gestionar tus citas médicas</li>
+                <li>Y mucho más...</li>
+            </ul>
+
+            <div style="text-align: center;">
+                <a href="{{ app_url }}/dashboard" class="button">Ir al Dashboard</a>
+            </div>
+
+            <p>Si tienes alguna pregunta, no dudes en contactarnos.</p>
+
+            <div class="footer">
+                <p>Gracias por elegir {{ app_name }}</p>
+                <p>&copy; 2024 {{ app_name }}. Todos los derechos reservados.</p>
+            </div>""",
+        "text": """
+    ¡Bienvenido a {{ app_name }}!
+
+    Hola {{ user_name }},
+
+    Tu email ha sido verificado exitosamente.
+
+    Ya puedes acceder a {{ app_url }}/dashboard para comenzar a usar la plataforma.
+
+    Gracias por elegir {{ app_name }}.
+
+    Saludos,
+    Equipo de {{ app_name }}
+    """,
+    },
+    ("welcome", "en"): {
+        "title": "Welcome!",
+        "subject": "Welcome to {{ app_name }}!",
+        "html": """
+            <p>Hi <strong>{{ user_name }}</strong>,</p>
+
+            <p>Your email has been verified! You now have access to every feature of {{ app_name }}.</p>
+
+            <p>You can now:</p>
+            <ul>
+                <li>Complete your professional profile</li>
+                <li>Set up your availability calendar</li>
+                <li>Manage your medical appointments</li>
+                <li>And much more...</li>
+            </ul>
+
+            <div style="text-align: center;">
+                <a href="{{ app_url }}/dashboard" class="button">Go to Dashboard</a>
+            </div>
+
+            <p>If you have any questions, don't hesitate to contact us.</p>
+
+            <div class="footer">
+                <p>Thank you for choosing {{ app_name }}</p>
+                <p>&copy; 2024 {{ app_name }}. All rights reserved.</p>
+            </div>""",
+        "text": """
+    Welcome to {{ app_name }}!
+
+    Hi {{ user_name }},
+
+    Your email has been verified.
+
+    Go to {{ app_url }}/dashboard to start using the platform.
+
+    Thank you for choosing {{ app_name }}.
+
+    Regards,
+    The {{ app_name }} team
+    """,
+    },
+}
+
+
+def compile_templates(sources: dict = SOURCES) -> dict:
+    """Compila cada (plantilla, idioma) una vez, con el layout común ya incrustado."""
+    templates = {}
+    for (name, locale), source in sources.items():
+        page = _FIELD.sub(
+            lambda match: {"content": source["html"], "title": source["title"], "lang": locale}.get(match.group(1), match.group(0)),
+            LAYOUT
+        )
+        templates[(name, locale)] = EmailTemplate(source["subject"], page, source["text"])
+    return templates
+
+
+TEMPLATES = compile_templates()
+LOCALES = frozenset(locale for _, locale in TEMPLATES)
+
+
+def negotiate_locale(accept_language: Optional[str]) -> str:
+    """
+    Idioma de Accept-Language con mayor q que tenga plantillas; si no, DEFAULT_EMAIL_LOCALE.
+
+    Los idiomas con q=0 (o con un q ilegible) se descartan; a igual q gana
+    el que aparece primero.
+    """
+    ranked = []
+    for position, entry in enumerate((accept_language or "").split(",")):
+        tag, *params = entry.split(";")
+        q = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, position, tag.strip().split("-", 1)[0].lower()))
+    for _, _, locale in sorted(ranked):
+        if locale in LOCALES:
+            return locale
+    return DEFAULT_EMAIL_LOCALE
+
+
+def render_email(name: str, locale: str = DEFAULT_EMAIL_LOCALE, **values) -> tuple:
+    """
+    Renderiza un correo con los datos del destinatario.
+
+    Args:
+        name: Plantilla ("verification", "welcome")
+        locale: Idioma; si no existe se usa DEFAULT_EMAIL_LOCALE
+        **values: Campos de la plantilla (user_name, verification_code...)
+
+    Returns:
+        tuple: (asunto, HTML, texto plano)
+    """
+    template = TEMPLATES.get((name, locale)) or TEMPLATES[(name, DEFAULT_EMAIL_LOCALE)]
+    return template.render(**values)
+
+
+def verification_email_content(verification_code: str, user_name: str, locale: str = DEFAULT_EMAIL_LOCALE) -> tuple:
+    return render_email("verification", locale, verification_code=verification_code, user_name=user_name)
+
+
+def welcome_email_content(user_name: str, locale: str = DEFAULT_EMAIL_LOCALE) -> tuple:
+    return render_email("welcome", locale, user_name=user_name)
+
+
+def send_verification_email(to_email: str, verification_code: str, user_name: str, locale: str = DEFAULT_EMAIL_LOCALE) -> bool:
+    """Envía el email de verificación en el momento (sin pasar por la cola)."""
+    return send_email(to_email, *verification_email_content(verification_code, user_name, locale))
+
+
+def send_welcome_email(to_email: str, user_name: str, locale: str = DEFAULT_EMAIL_LOCALE) -> bool:
+    """Envía el email de bienvenida en el momento (sin pasar por la cola)."""
+    return send_email(to_email, *welcome_email_content(user_name, locale))
@@ -1,9 +1,16 @@
+import base64
 import smtplib
 import os
+import time
+import uuid
+from functools import lru_cache
+from email.header import Header
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from email.utils import formataddr, formatdate
 from dotenv import load_dotenv
 from typing import Optional
+from ..config import SMTP_IDLE_TIMEOUT_SECONDS
 
 load_dotenv()
 
@@ -16,6 +23,144 @@ SMTP_FROM_EMAIL = os.getenv("SMTP_FROM_EMAIL")
 SMTP_FROM_NAME = os.getenv("SMTP_FROM_NAME", "Sistema de Calendario Médico")
 APP_NAME = os.getenv("APP_NAME", "Vitalis Stream")
 APP_URL = os.getenv("APP_URL", "http://localhost:5175")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+SMTP_TIMEOUT_SECONDS = 30
+
+def smtp_configured() -> bool:
+    """Hay remitente y, si el servidor usa STARTTLS, credenciales para autenticarse."""
+    return bool(SMTP_FROM_EMAIL) and (not SMTP_STARTTLS or bool(SMTP_USERNAME and SMTP_PASSWORD))
+
+def build_message(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> MIMEMultipart:
+    """Mensaje multipart/alternative con texto plano (opcional) y HTML."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
+    msg['To'] = to_email
+    
+    # Agregar contenido de texto plano si se proporciona
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain', 'utf-8'))
+    
+    # Agregar contenido HTML
+    msg.attach(MIMEText(html_content, 'html', 'utf-8'))
+    return msg
+
+# Partes fijas del MIME ya codificadas: por mensaje solo se codifican los cuerpos
+_BOUNDARY = "=_vitalis_alt"  # "=_" no aparece en base64, así que nunca choca con los cuerpos
+_PART_HEADERS = {
+    "plain": (f"--{_BOUNDARY}\r\nContent-Type: text/plain; charset=\"utf-8\"\r\n"
+              "Content-Transfer-Encoding: base64\r\n\r\n").encode(),
+    "html": (f"--{_BOUNDARY}\r\nContent-Type: text/html; charset=\"utf-8\"\r\n"
+             "Content-Transfer-Encoding: base64\r\n\r\n").encode(),
+}
+_CLOSING = f"--{_BOUNDARY}--\r\n".encode()
+
+@lru_cache(maxsize=1)
+def _static_headers() -> bytes:
+    sender = formataddr((SMTP_FROM_NAME, SMTP_FROM_EMAIL or ""), charset="utf-8")
+    return (
+        f"From: {sender}\r\nMIME-Version: 1.0\r\n"
+        f"Content-Type: multipart/alternative; boundary=\"{_BOUNDARY}\"\r\n"
+    ).encode()
+
+@lru_cache(maxsize=256)
+def _subject_header(subject: str) -> bytes:
+    # Los asuntos se repiten por plantilla e idioma: se codifican (RFC 2047) una vez.
+    # Los largos se pliegan en varias líneas, con CRLF como el resto del mensaje
+    encoded = Header(subject, "utf-8").encode(linesep="\r\n")
+    return f"Subject: {encoded}\r\n".encode()
+
+def _encode_body(content: str) -> bytes:
+    return base64.encodebytes(content.encode("utf-8")).replace(b"\n", b"\r\n")
+
+def build_raw_message(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bytes:
+    """
+    El mismo multipart/alternative que build_message, armado directamente en bytes.
+
+    Encabezados fijos, separadores y encabezados de cada parte se codifican
+    una sola vez; por mensaje solo se codifican los cuerpos en base64. Es el
+    formato que usa el envío en lote (email_outbox).
+    """
+    domain = (SMTP_FROM_EMAIL or "localhost").rpartition("@")[2]
+    parts = [
+        _static_headers(),
+        _subject_header(subject),
+        f"To: {to_email}\r\nDate: {formatdate()}\r\nMessage-ID: <{uuid.uuid4().hex}@{domain}>\r\n\r\n".encode(),
+    ]
+    if text_content:
+        parts += (_PART_HEADERS["plain"], _encode_body(text_content))
+    parts += (_PART_HEADERS["html"], _encode_body(html_content), _CLOSING)
+    return b"".join(parts)
+
+class SmtpSession:
+    """
+    Una conexión SMTP (STARTTLS + login) reutilizada para muchos mensajes.
+
+    Conectar, negociar TLS y autenticarse cuesta varios viajes de red; aquí
+    se hace una vez y los mensajes siguientes solo pagan MAIL/RCPT/DATA. Si
+    el servidor cerró la conexión se reconecta una vez, y la sesión inactiva
+    más de SMTP_IDLE_TIMEOUT_SECONDS se cierra antes de reutilizarla. No es
+    segura entre hilos: cada hilo de envío usa la suya.
+    """
+
+    def __init__(self, host: str = SMTP_SERVER, port: int = SMTP_PORT, username: Optional[str] = SMTP_USERNAME,
+                 password: Optional[str] = SMTP_PASSWORD, starttls: bool = SMTP_STARTTLS,
+                 idle_timeout: float = SMTP_IDLE_TIMEOUT_SECONDS):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.idle_timeout = idle_timeout
+        self._smtp = None
+        self._last_used = 0.0
+        self.connections = 0
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except BaseException:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self.connections += 1
+
+    def send(self, msg, to_email: Optional[str] = None):
+        """
+        Envía `msg` (un Message, o los bytes de build_raw_message junto con
+        `to_email`); los errores SMTP del mensaje se propagan y la sesión
+        sigue utilizable.
+        """
+        if isinstance(msg, bytes):
+            transmit = lambda smtp: smtp.sendmail(SMTP_FROM_EMAIL, [to_email], msg)
+        else:
+            transmit = lambda smtp: smtp.send_message(msg)
+        self.close_if_idle()
+        if self._smtp is None:
+            self._connect()
+        try:
+            transmit(self._smtp)
+        except smtplib.SMTPServerDisconnected:
+            self.close()
+            self._connect()
+            transmit(self._smtp)
+        self._last_used = time.monotonic()
+
+    def close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self.close()
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                self._smtp.close()
+            self._smtp = None
 
 def send_email(to_email: str, subject: str, html_content: str, text_content: Optional[str] = None) -> bool:
     """
@@ -32,30 +177,16 @@ def send_email(to_email: str, subject: str, html_content: str, text_content: Opt
     """
     try:
         # Verificar que las credenciales estén configuradas
-        if not SMTP_USERNAME or not SMTP_PASSWORD or not SMTP_FROM_EMAIL:
+        if not smtp_configured():
             print("Error: Credenciales de email no configuradas en .env")
             return False
         
-        # Crear mensaje
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = subject
-        msg['From'] = f"{SMTP_FROM_NAME} <{SMTP_FROM_EMAIL}>"
-        msg['To'] = to_email
-        
-        # Agregar contenido de texto plano si se proporciona
-        if text_content:
-            text_part = MIMEText(text_content, 'plain', 'utf-8')
-            msg.attach(text_part)
-        
-        # Agregar contenido HTML
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
-        
-        # Conectar al servidor SMTP y enviar
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+        # Conexión propia; los envíos en lote van por la cola (email_outbox)
+        session = SmtpSession()
+        try:
+            session.send(build_message(to_email, subject, html_content, text_content))
+        finally:
+            session.close()
         
         print(f"Email enviado exitosamente a {to_email}")
         return True
@@ -63,265 +194,3 @@ def send_email(to_email: str, subject: str, html_content: str, text_content: Opt
     except Exception as e:
         print(f"Error al enviar email a {to_email}: {str(e)}")
         return False
-
-def send_verification_email(to_email: str, verification_code: str, user_name: str) -> bool:
-    """
-    Envía un email de verificación con el código.
-    
-    Args:
-        to_email: Email del destinatario
-        verification_code: Código de verificación de 6 dígitos
-        user_name: Nombre del usuario
-    
-    Returns:
-        bool: True si el email se envió exitosamente
-    """
-    subject = f"Código de verificación - {APP_NAME}"
-    
-    # Contenido HTML del email
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Verificación de Email</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #f4f4f4;
-            }}
-            .container {{
-                background: white;
-                padding: 40px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .header {{
-                text-align: center;
-                margin-bottom: 30px;
-            }}
-            .logo {{
-                font-size: 24px;
-                font-weight: bold;
-                color: #667eea;
-                margin-bottom: 10px;
-            }}
-            .verification-code {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                font-size: 32px;
-                font-weight: bold;
-                text-align: center;
-                padding: 20px;
-                border-radius: 8px;
-                letter-spacing: 8px;
-                margin: 30px 0;
-            }}
-            .instructions {{
-                background: #f8f9fa;
-                padding: 20px;
-                border-radius: 8px;
-                border-left: 4px solid #667eea;
-                margin: 20px 0;
-            }}
-            .footer {{
-                text-align: center;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #eee;
-                color: #666;
-                font-size: 14px;
-            }}
-            .button {{
-                display: inline-block;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 12px 30px;
-                text-decoration: none;
-                border-radius: 6px;
-                font-weight: bold;
-                margin: 20px 0;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">{APP_NAME}</div>
-                <h1>Verificación de Email</h1>
-            </div>
-            
-            <p>Hola <strong>{user_name}</strong>,</p>
-            
-            <p>Gracias por registrarte en {APP_NAME}. Para completar tu registro, necesitamos verificar tu dirección de email.</p>
-            
-            <p>Tu código de verificación es:</p>
-            
-            <div class="verification-code">
-                {verification_code}
-            </div>
-            
-            <div class="instructions">
-                <strong>Instrucciones:</strong>
-                <ol>
-                    <li>Ve a la página de verificación de email</li>
-                    <li>Ingresa el código de 6 dígitos mostrado arriba</li>
-                    <li>Haz clic en "Verificar Email"</li>
-                </ol>
-            </div>
-            
-            <p>Este código expirará en <strong>24 horas</strong> por seguridad.</p>
-            
-            <p>Si no solicitaste esta verificación, puedes ignorar este email de forma segura.</p>
-            
-            <div class="footer">
-                <p>Este es un email automático, por favor no respondas a este mensaje.</p>
-                <p>&copy; 2024 {APP_NAME}. Todos los derechos reservados.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    # Contenido de texto plano como respaldo
-    text_content = f"""
-    Hola {user_name},
-    
-    Gracias por registrarte en {APP_NAME}.
-    
-    Tu código de verificación es: {verification_code}
-    
-    Ingresa este código en la página de verificación para completar tu registro.
-    
-    Este código expirará en 24 horas.
-    
-    Si no solicitaste esta verificación, puedes ignorar este email.
-    
-    Saludos,
-    Equipo de {APP_NAME}
-    """
-    
-    return send_email(to_email, subject, html_content, text_content)
-
-def send_welcome_email(to_email: str, user_name: str) -> bool:
-    """
-    Envía un email de bienvenida después de la verificación exitosa.
-    
-    Args:
-        to_email: Email del destinatario
-        user_name: Nombre del usuario
-    
-    Returns:
-        bool: True si el email se envió exitosamente
-    """
-    subject = f"¡Bienvenido a {APP_NAME}!"
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="utf-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>Bienvenido</title>
-        <style>
-            body {{
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-                line-height: 1.6;
-                color: #333;
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 20px;
-                background-color: #f4f4f4;
-            }}
-            .container {{
-                background: white;
-                padding: 40px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .header {{
-                text-align: center;
-                margin-bottom: 30px;
-            }}
-            .logo {{
-                font-size: 24px;
-                font-weight: bold;
-                color: #667eea;
-                margin-bottom: 10px;
-            }}
-            .button {{
-                display: inline-block;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 12px 30px;
-                text-decoration: none;
-                border-radius: 6px;
-                font-weight: bold;
-                margin: 20px 0;
-            }}
-            .footer {{
-                text-align: center;
-                margin-top: 30px;
-                padding-top: 20px;
-                border-top: 1px solid #eee;
-                color: #666;
-                font-size: 14px;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <div class="logo">{APP_NAME}</div>
-                <h1>¡Bienvenido!</h1>
-            </div>
-            
-            <p>Hola <strong>{user_name}</strong>,</p>
-            
-            <p>¡Tu email ha sido verificado exitosamente! Ya puedes acceder a todas las funcionalidades de {APP_NAME}.</p>
-            
-            <p>Ahora puedes:</p>
-            <ul>
-                <li>Completar tu perfil profesional</li>
-                <li>Configurar tu calendario de disponibilidad</li>
-                <li>Gestionar tus citas médicas</li>
-                <li>Y mucho más...</li>
-            </ul>
-            
-            <div style="text-align: center;">
-                <a href="{APP_URL}/dashboard" class="button">Ir al Dashboard</a>
-            </div>
-            
-            <p>Si tienes alguna pregunta, no dudes en contactarnos.</p>
-            
-            <div class="footer">
-                <p>Gracias por elegir {APP_NAME}</p>
-                <p>&copy; 2024 {APP_NAME}. Todos los derechos reservados.</p>
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    text_content = f"""
-    ¡Bienvenido a {APP_NAME}!
-    
-    Hola {user_name},
-    
-    Tu email ha sido verificado exitosamente.
-    
-    Ya puedes acceder a {APP_URL}/dashboard para comenzar a usar la plataforma.
-    
-    Gracias por elegir {APP_NAME}.
-    
-    Saludos,
-    Equipo de {APP_NAME}
-    """
-    
-    return send_email(to_email, subject, html_content, text_content)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+import requests
+from fastapi import HTTPException, status
+from jose import jwt, JWTError
+from ..config import GOOGLE_CLIENT_IDS, GOOGLE_JWKS_URL, GOOGLE_JWKS_FILE, GOOGLE_JWKS_DEFAULT_MAX_AGE
+from .metrics import register_metrics
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+JWKS_TIMEOUT_SECONDS = 5
+# Se refresca un poco antes de que venza el max-age
+JWKS_REFRESH_MARGIN_SECONDS = 60
+# Un kid desconocido dispara a lo sumo una descarga por este intervalo
+JWKS_MIN_REFETCH_SECONDS = 60
+
+_MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class JWKSCache:
+    """
+    Llaves públicas de Google (JWKS) por `kid`, en memoria.
+
+    Se descargan con una sesión HTTP reutilizable y se conservan lo que
+    indica Cache-Control max-age. Una tarea de fondo las renueva antes de
+    vencer, así que verificar un token no hace llamadas de red; solo un
+    `kid` desconocido (rotación de llaves) fuerza una descarga, limitada a
+    una por JWKS_MIN_REFETCH_SECONDS. Con GOOGLE_JWKS_FILE las llaves se leen
+    de ese archivo y nunca se usa la red.
+    """
+
+    def __init__(self, url: str = GOOGLE_JWKS_URL, path: str = GOOGLE_JWKS_FILE):
+        self.url = url
+        self.path = path
+        self._keys = {}
+        self._expires_at = 0.0
+        self._last_fetch = 0.0
+        self._file_mtime = None
+        self._lock = threading.Lock()
+        self._session = requests.Session()
+        self._task = None
+        self.fetches = 0
+        self.fetch_errors = 0
+        self.unknown_kids = 0
+
+    def _load(self):
+        if self.path:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._file_mtime:
+                return
+            with open(self.path) as f:
+                keys = json.load(f)["keys"]
+            max_age = None
+            self._file_mtime = mtime
+        else:
+            response = self._session.get(self.url, timeout=JWKS_TIMEOUT_SECONDS)
+            response.raise_for_status()
+            keys = response.json()["keys"]
+            match = _MAX_AGE.search(response.headers.get("cache-control", ""))
+            max_age = int(match.group(1)) if match else GOOGLE_JWKS_DEFAULT_MAX_AGE
+        with self._lock:
+            self._keys = {key["kid"]: key for key in keys}
+            self._expires_at = float("inf") if max_age is None else time.monotonic() + max_age
+            self.fetches += 1
+
+    def refresh(self, force: bool = False) -> bool:
+        """Recarga las llaves si vencieron (o si `force`); devuelve False si falló o se omitió."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now < self._expires_at:
+                return True
+            if not self.path and self._keys and now - self._last_fetch < JWKS_MIN_REFETCH_SECONDS:
+                return False
+            self._last_fetch = now
+        try:
+            self._load()
+            return True
+        except (requests.RequestException, OSError, ValueError, KeyError) as e:
+            self.fetch_errors += 1
+            print(f"Error al cargar las llaves de Google: {e}")
+            return False
+
+    def get(self, kid: str):
+        """Llave pública del `kid`, o None si Google no la publica."""
+        with self._lock:
+            key = self._keys.get(kid)
+            stale = time.monotonic() >= self._expires_at
+        if key is None or stale:
+            # Sin tarea de fondo (o si falló) se renueva aquí; ante un error se
+            # sigue usando la última copia de la llave
+            if self.refresh(force=key is None):
+                with self._lock:
+                    key = self._keys.get(kid)
+        if key is None:
+            with self._lock:
+                self.unknown_kids += 1
+        return key
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.to_thread(self.refresh)
+            with self._lock:
+                delay = self._expires_at - time.monotonic() - JWKS_REFRESH_MARGIN_SECONDS
+            # Tras un error se reintenta pronto; con llaves vigentes, poco antes de vencer
+            await asyncio.sleep(min(max(delay, JWKS_MIN_REFETCH_SECONDS), 24 * 3600))
+
+    def start(self):
+        """Tarea de fondo que mantiene las llaves vigentes (no aplica con GOOGLE_JWKS_FILE)."""
+        if self.path is None and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "keys": len(self._keys),
+                "fetches": self.fetches,
+                "fetch_errors": self.fetch_errors,
+                "unknown_kids": self.unknown_kids,
+            }
+
+
+google_jwks = JWKSCache()
+register_metrics("google_jwks", google_jwks.stats)
+
+
+def _invalid(detail: str = "Token de Google inválido"):
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+
+def verify_google_id_token(id_token: str, client_ids=None) -> dict:
+    """
+    Verifica localmente un ID token de Google y devuelve sus claims.
+
+    Comprueba la firma RS256 con la llave de su `kid`, el vencimiento, el
+    emisor y que la audiencia sea uno de los client ids configurados.
+
+    Raises:
+        HTTPException: 400 si el token no es válido; 503 si no hay client id
+    """
+    client_ids = GOOGLE_CLIENT_IDS if client_ids is None else client_ids
+    if not client_ids:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Inicio de sesión con Google no configurado")
+
+    try:
+        header = jwt.get_unverified_header(id_token)
+    except JWTError:
+        raise _invalid()
+    if header.get("alg") != "RS256" or not header.get("kid"):
+        raise _invalid()
+
+    key = google_jwks.get(header["kid"])
+    if key is None:
+        raise _invalid()
+
+    try:
+        # La audiencia se valida aparte porque puede haber varios client ids (web, iOS, Android)
+        claims = jwt.decode(
+            id_token, key, algorithms=["RS256"], issuer=GOOGLE_ISSUERS, options={"verify_aud": False}
+        )
+    except JWTError:
+        raise _invalid()
+    if claims.get("aud") not in client_ids:
+        raise _invalid()
+    return claims
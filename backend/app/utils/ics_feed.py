@@ -0,0 +1,121 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from ..database import engine
+from ..models.models import Appointment
+
+ICS_MEDIA_TYPE = "text/calendar; charset=utf-8"
+# Filas que se traen del cursor por cada lote
+FEED_YIELD_PER = 500
+
+appointments_table = Appointment.__table__
+
+
+def feed_state(db: Session, calendar_id: int):
+    """
+    (última modificación, número de citas) del calendario.
+
+    Una sola consulta resuelta con el índice (calendar_id, updated_at); el
+    conteo hace que cancelar una cita también cambie el ETag.
+    """
+    return db.execute(
+        select(func.max(appointments_table.c.updated_at), func.count()).where(
+            appointments_table.c.calendar_id == calendar_id
+        )
+    ).one()
+
+
+def feed_etag(calendar_id: int, last_modified, count: int) -> str:
+    stamp = last_modified.isoformat() if last_modified else "-"
+    digest = hashlib.sha1(f"{calendar_id}:{stamp}:{count}".encode()).hexdigest()[:16]
+    return f'"{digest}"'
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def not_modified_since(if_modified_since, last_modified) -> bool:
+    """True si el cliente ya tiene la versión de `last_modified` (precisión de segundos)."""
+    if not if_modified_since or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is not None:
+        since = since.astimezone(timezone.utc).replace(tzinfo=None)
+    return last_modified.replace(microsecond=0) <= since
+
+
+def _escape(value: str) -> str:
+    # Los textos importados (CSV/ICS) pueden traer CRLF o CR sueltos: un CR sin escapar rompe la línea
+    value = value.replace("\r\n", "\n").replace("\r", "\n")
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+def _fold(line: str) -> str:
+    """Parte las líneas de más de 75 octetos (RFC 5545 §3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts = []
+    while encoded:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(encoded))
+        # No cortar a mitad de un carácter UTF-8
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _local(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%S")
+
+
+def _utc(value: datetime) -> str:
+    return value.strftime("%Y%m%dT%H%M%SZ")
+
+
+def iter_feed(calendar_id: int, calendar_name: str):
+    """
+    Emite el feed iCalendar del calendario por partes, un lote de citas a la vez.
+
+    Las horas de las citas se guardan sin zona, así que se publican como
+    horas flotantes; DTSTAMP y LAST-MODIFIED van en UTC.
+    """
+    yield "".join(_fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Vitalis//Agenda//ES",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_escape(calendar_name or f'Calendario {calendar_id}')}",
+    ))
+
+    columns = appointments_table.c
+    statement = select(
+        columns.id, columns.start_time, columns.end_time, columns.description, columns.updated_at
+    ).where(columns.calendar_id == calendar_id).order_by(columns.start_time, columns.id)
+
+    # Conexión propia: la sesión de get_db se cierra antes de que termine el streaming
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=FEED_YIELD_PER).execute(statement)
+        for rows in result.partitions():
+            chunk = []
+            for appointment_id, start_time, end_time, description, updated_at in rows:
+                if start_time is None or end_time is None:
+                    continue
+                stamp = _utc(updated_at or datetime.utcnow())
+                chunk.append("BEGIN:VEVENT\r\n")
+                chunk.append(_fold(f"UID:appointment-{appointment_id}@vitalis"))
+                chunk.append(f"DTSTAMP:{stamp}\r\nLAST-MODIFIED:{stamp}\r\n")
+                chunk.append(f"DTSTART:{_local(start_time)}\r\nDTEND:{_local(end_time)}\r\n")
+                chunk.append(_fold(f"SUMMARY:{_escape(description or 'Cita')}"))
+                chunk.append("END:VEVENT\r\n")
+            yield "".join(chunk)
+
+    yield "END:VCALENDAR\r\n"
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from ..config import IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES
+from .metrics import register_metrics
+from .rate_limit import client_ip
+from .token_utils import verify_token
+
+# Máximo que espera un reintento a que termine la petición original (segundos)
+IN_FLIGHT_WAIT_SECONDS = 30
+MAX_KEY_LENGTH = 255
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "expires_at", "done", "status_code", "body")
+
+    def __init__(self, fingerprint: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.expires_at = expires_at
+        self.done = threading.Event()
+        self.status_code = None
+        self.body = None
+
+
+class IdempotencyStore:
+    """
+    Respuestas guardadas por (endpoint, cliente, Idempotency-Key), en memoria del proceso.
+
+    La primera petición con una clave la reserva (en curso); una petición
+    idéntica que llega mientras tanto espera a que termine y recibe la misma
+    respuesta, en lugar de repetir el trabajo. Las entradas vencen tras
+    IDEMPOTENCY_TTL_SECONDS y la cantidad está acotada (se descartan las más
+    antiguas). Como el resto de caches, no se comparte entre workers.
+    """
+
+    def __init__(self, ttl_seconds: int = IDEMPOTENCY_TTL_SECONDS, max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stored = 0
+        self.replays = 0
+        self.waits = 0
+        self.mismatches = 0
+
+    def _evict_locked(self, now: float):
+        # TTL constante: el orden de inserción es el orden de vencimiento
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry.expires_at > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def begin(self, key: tuple, fingerprint: str):
+        """
+        Reserva la clave o devuelve la respuesta ya guardada.
+
+        Returns:
+            _Entry | None: None si esta petición debe ejecutarse; la entrada
+            terminada si es un reintento
+
+        Raises:
+            HTTPException: 422 si la clave se usó con otro cuerpo; 409 si la
+            petición original sigue en curso tras la espera
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._evict_locked(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = _Entry(fingerprint, now + self.ttl_seconds)
+                return None
+            if entry.fingerprint != fingerprint:
+                self.mismatches += 1
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="La Idempotency-Key ya se usó con otra solicitud"
+                )
+            if not entry.done.is_set():
+                self.waits += 1
+
+        if not entry.done.wait(IN_FLIGHT_WAIT_SECONDS) or entry.body is None:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="La solicitud original sigue en proceso")
+        with self._lock:
+            self.replays += 1
+        return entry
+
+    def complete(self, key: tuple, status_code: int, body):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.status_code = status_code
+            entry.body = body
+            self.stored += 1
+        entry.done.set()
+
+    def abort(self, key: tuple):
+        """Libera la clave tras un error inesperado, para que el reintento se ejecute."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            entry.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "stored": self.stored,
+                "replays": self.replays,
+                "waits": self.waits,
+                "mismatches": self.mismatches,
+            }
+
+
+idempotency_store = IdempotencyStore()
+register_metrics("idempotency", idempotency_store.stats)
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(jsonable_encoder(payload), sort_keys=True).encode()).hexdigest()
+
+
+def request_owner(request: Request) -> str:
+    """
+    Dueño de las Idempotency-Key de la petición.
+
+    El usuario del access token si lo hay; si no (registro anónimo), la IP
+    del cliente. Así la clave de un cliente nunca devuelve ni bloquea la
+    respuesta de otro.
+    """
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = verify_token(token.strip())
+        if payload is not None:
+            return f"user:{payload['sub']}"
+    return f"ip:{client_ip(request)}"
+
+
+def run_idempotent(idempotency_key, scope: str, owner: str, payload, response_model, handler):
+    """
+    Ejecuta `handler` una sola vez por Idempotency-Key de `owner` (ver request_owner).
+
+    Sin clave ejecuta normalmente. Con clave, un reintento (o una petición
+    idéntica simultánea) recibe la respuesta guardada de la primera, incluidos
+    los errores HTTP, con el encabezado Idempotent-Replayed. Los errores no
+    HTTP liberan la clave.
+    """
+    if not idempotency_key:
+        return handler()
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key demasiado larga")
+
+    key = (scope, owner, idempotency_key)
+    entry = idempotency_store.begin(key, fingerprint(payload))
+    if entry is not None:
+        return JSONResponse(status_code=entry.status_code, content=entry.body, headers={"Idempotent-Replayed": "true"})
+
+    try:
+        result = handler()
+    except HTTPException as e:
+        idempotency_store.complete(key, e.status_code, {"detail": e.detail})
+        raise
+    except BaseException:
+        idempotency_store.abort(key)
+        raise
+
+    body = jsonable_encoder(response_model.model_validate(result))
+    idempotency_store.complete(key, status.HTTP_200_OK, body)
+    return body
+
+
+async def run_idempotent_async(idempotency_key, scope: str, owner: str, payload, response_model, handler):
+    """Igual que run_idempotent para endpoints async; `handler` devuelve un awaitable."""
+    if not idempotency_key:
+        return await handler()
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Idempotency-Key demasiado larga")
+
+    key = (scope, owner, idempotency_key)
+    # begin puede esperar a la petición original: fuera del event loop
+    entry = await run_in_threadpool(idempotency_store.begin, key, fingerprint(payload))
+    if entry is not None:
+        return JSONResponse(status_code=entry.status_code, content=entry.body, headers={"Idempotent-Replayed": "true"})
+
+    try:
+        result = await handler()
+    except HTTPException as e:
+        idempotency_store.complete(key, e.status_code, {"detail": e.detail})
+        raise
+    except BaseException:
+        idempotency_store.abort(key)
+        raise
+
+    body = jsonable_encoder(response_model.model_validate(result))
+    idempotency_store.complete(key, status.HTTP_200_OK, body)
+    return body
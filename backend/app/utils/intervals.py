@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+
+def merge_intervals(intervals) -> list:
+    """
+    Ordena y fusiona intervalos (inicio, fin) que se traslapan o se tocan.
+
+    Returns:
+        list: Intervalos disjuntos ordenados por inicio
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def saturated_intervals(intervals, capacity: int = 1) -> list:
+    """
+    Devuelve los tramos donde al menos `capacity` intervalos se traslapan.
+
+    Barrido de eventos ordenados: O(m log m) para m intervalos.
+    """
+    if capacity <= 1:
+        return merge_intervals(intervals)
+
+    events = []
+    for start, end in intervals:
+        if start < end:
+            events.append((start, 1))
+            events.append((end, -1))
+    # Los cierres van antes que las aperturas en el mismo instante
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    saturated = []
+    active = 0
+    opened_at = None
+    for instant, delta in events:
+        active += delta
+        if active >= capacity and opened_at is None:
+            opened_at = instant
+        elif active < capacity and opened_at is not None:
+            if instant > opened_at:
+                saturated.append((opened_at, instant))
+            opened_at = None
+    return merge_intervals(saturated)
+
+
+def subtract_intervals(windows, busy) -> list:
+    """
+    Resta intervalos ocupados a ventanas; ambas listas disjuntas y ordenadas.
+
+    Recorrido lineal con dos punteros: O(n + m).
+    """
+    free = []
+    i = 0
+    for window_start, window_end in windows:
+        cursor = window_start
+        # Saltar los ocupados que terminan antes de la ventana
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < window_end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                free.append((cursor, busy_start))
+            if busy_end > cursor:
+                cursor = busy_end
+            if cursor >= window_end:
+                break
+            j += 1
+        if cursor < window_end:
+            free.append((cursor, window_end))
+    return free
+
+
+def clip_intervals(intervals, range_start, range_end) -> list:
+    """Recorta intervalos ordenados al rango [range_start, range_end]."""
+    clipped = []
+    for start, end in intervals:
+        start = max(start, range_start)
+        end = min(end, range_end)
+        if start < end:
+            clipped.append((start, end))
+    return clipped
+
+
+def fitting_intervals(intervals, minutes: int) -> list:
+    """Filtra los intervalos donde cabe una reunión de `minutes` minutos."""
+    needed = timedelta(minutes=minutes)
+    return [(start, end) for start, end in intervals if end - start >= needed]
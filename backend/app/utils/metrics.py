@@ -0,0 +1,27 @@
+import threading
+
+# nombre del subsistema -> función que devuelve un dict de contadores numéricos
+_providers = {}
+_lock = threading.Lock()
+
+
+def register_metrics(name: str, provider):
+    """Registra una fuente de contadores para exponerla en /metrics."""
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_metrics() -> dict:
+    """Devuelve {subsistema: {contador: valor}} de todas las fuentes registradas."""
+    with _lock:
+        providers = list(_providers.items())
+    return {name: provider() for name, provider in providers}
+
+
+def render_prometheus(metrics: dict) -> str:
+    """Formato de texto de Prometheus: vitalis_<subsistema>_<contador> <valor>."""
+    lines = []
+    for name, counters in sorted(metrics.items()):
+        for counter, value in sorted(counters.items()):
+            lines.append(f"vitalis_{name}_{counter} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,61 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values) -> str:
+    """Cursor opaco con los valores de la última fila de la página."""
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys) -> tuple:
+    """
+    Recupera los valores del cursor, con el tipo de cada columna del orden.
+
+    Raises:
+        HTTPException: 400 si el cursor no corresponde a este listado
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(keys):
+            raise ValueError
+        values = []
+        for key, value in zip(keys, raw):
+            python_type = key.type.python_type
+            values.append(datetime.fromisoformat(value) if python_type is datetime else python_type(value))
+        return tuple(values)
+    except (ValueError, TypeError, json.JSONDecodeError, NotImplementedError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+
+
+def keyset_page(query, keys, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Una página de `query` ordenada por `keys`, continuando después del cursor.
+
+    Filtra con (k1, k2, ...) > valores del cursor en lugar de OFFSET, así que
+    con un índice sobre las claves cualquier página cuesta lo mismo que la
+    primera. La última clave debe ser única (normalmente el id).
+
+    Returns:
+        tuple: (filas de la página, cursor de la siguiente o None)
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        if len(keys) == 1:
+            query = query.filter(keys[0] > values[0])
+        else:
+            query = query.filter(tuple_(*keys) > values)
+
+    rows = query.order_by(*keys).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor([getattr(rows[-1], key.key) for key in keys])
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from ..models.models import User
+from ..config import PRINCIPAL_CACHE_TTL_SECONDS, PRINCIPAL_CACHE_MAX_ENTRIES
+from .metrics import register_metrics
+
+# Secretos que no se copian al cache; si alguien los lee, el User fusionado los carga de la base
+_SECRET_COLUMNS = {"hashed_password", "verification_code"}
+_user_columns = [column.key for column in User.__table__.columns if column.key not in _SECRET_COLUMNS]
+
+
+class PrincipalCache:
+    """
+    Usuarios autenticados por `sub` del token, LRU con TTL.
+
+    Guarda una instantánea de las columnas del usuario, sin el hash de la
+    contraseña ni el código de verificación, no la instancia ORM (que
+    pertenece a la sesión de otra petición). Al acertar se reconstruye el
+    User y se une a la sesión actual con merge(load=False), sin consultar la
+    base; sus cambios y relaciones funcionan como con un usuario cargado.
+    Cualquier UPDATE o DELETE del usuario vía ORM invalida sus entradas al
+    confirmarse la transacción; el TTL acota lo que pueda cambiar por otro
+    proceso.
+    """
+
+    def __init__(self, ttl_seconds: int = PRINCIPAL_CACHE_TTL_SECONDS, max_entries: int = PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # sub -> (vence, columnas)
+        self._keys_by_user = {}  # user_id -> {sub}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, db: Session, sub: str):
+        with self._lock:
+            entry = self._entries.get(sub)
+            if entry is None or entry[0] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(sub)
+            self.hits += 1
+            values = entry[1]
+
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def put(self, sub: str, user: User):
+        values = {key: getattr(user, key) for key in _user_columns}
+        with self._lock:
+            self._entries[sub] = (time.monotonic() + self.ttl_seconds, values)
+            self._entries.move_to_end(sub)
+            self._keys_by_user.setdefault(user.id, set()).add(sub)
+            while len(self._entries) > self.max_entries:
+                evicted_sub, (_, evicted) = self._entries.popitem(last=False)
+                self._discard_key(evicted["id"], evicted_sub)
+
+    def _discard_key(self, user_id: int, sub: str):
+        keys = self._keys_by_user.get(user_id)
+        if keys is not None:
+            keys.discard(sub)
+            if not keys:
+                del self._keys_by_user[user_id]
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for sub in self._keys_by_user.pop(user_id, ()):
+                self._entries.pop(sub, None)
+                self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+principal_cache = PrincipalCache()
+register_metrics("principal_cache", principal_cache.stats)
+
+
+_PENDING_KEY = "principal_cache_user_ids"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_users(session, flush_context):
+    # dirty y deleted todavía reflejan lo que se acaba de escribir
+    user_ids = {obj.id for obj in (*session.dirty, *session.deleted) if isinstance(obj, User) and obj.id is not None}
+    if user_ids:
+        session.info.setdefault(_PENDING_KEY, set()).update(user_ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    # Solo tras el commit: antes, otra petición podría volver a cachear la fila vieja
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        principal_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
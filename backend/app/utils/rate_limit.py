@@ -0,0 +1,216 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from ..config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_BACKEND, RATE_LIMIT_SQLITE_PATH, RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_EMAIL_PER_MINUTE,
+    RATE_LIMIT_TRUST_FORWARDED, RATE_LIMIT_TRUSTED_PROXY_HOPS
+)
+from .metrics import register_metrics
+
+# Cada cuántas operaciones el backend SQLite borra los buckets ya llenos
+SQLITE_PRUNE_EVERY = 1000
+
+
+def refill(tokens: float, updated_at: float, now: float, capacity: int, rate: float) -> float:
+    """Fichas del bucket en `now`, a `rate` fichas por segundo y sin pasar de `capacity`."""
+    return min(capacity, tokens + (now - updated_at) * rate)
+
+
+class MemoryRateLimitBackend:
+    """
+    Buckets en memoria del proceso, LRU acotado a RATE_LIMIT_MAX_KEYS.
+
+    Una llave descartada vuelve con el bucket lleno, así que el límite de
+    tamaño solo puede dar algo de holgura, nunca bloquear de más. Con varios
+    workers cada uno lleva su cuenta (el límite efectivo se multiplica).
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # llave -> (fichas, actualizado)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        """
+        Consume una ficha si hay.
+
+        Returns:
+            float: 0 si se permitió; si no, segundos hasta la siguiente ficha
+        """
+        with self._lock:
+            bucket = self._buckets.get(key)
+            tokens = capacity if bucket is None else refill(bucket[0], bucket[1], now, capacity, rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+
+class SqliteRateLimitBackend:
+    """
+    Buckets en un archivo SQLite compartido por los workers de la máquina.
+
+    Cada toma es una transacción BEGIN IMMEDIATE (lectura y escritura del
+    bucket bajo el mismo bloqueo), con WAL para no frenar las lecturas. Es
+    un archivo aparte de la base de la aplicación. Los buckets que ya se
+    habrían llenado se borran cada SQLITE_PRUNE_EVERY operaciones.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._operations = 0
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_limit_buckets ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, full_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_full ON rate_limit_buckets (full_at)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit: las transacciones se abren explícitamente
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, capacity: int, rate: float, now: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated_at FROM rate_limit_buckets WHERE key = ?", (key,)).fetchone()
+            tokens = capacity if row is None else refill(row[0], row[1], now, capacity, rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            conn.execute(
+                "INSERT INTO rate_limit_buckets (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at, full_at = excluded.full_at",
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            self._operations += 1
+            if self._operations % SQLITE_PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_limit_buckets WHERE full_at <= ?", (now,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM rate_limit_buckets").fetchone()[0]
+
+
+class RateLimiter:
+    """
+    Token buckets por IP y por email para login y verificación de email.
+
+    El bucket por IP frena ráfagas de una misma fuente (credential stuffing);
+    el de email frena el ataque distribuido contra una cuenta y la fuerza
+    bruta del código de verificación. Se consulta antes de tocar la base o
+    bcrypt, así que una petición rechazada no cuesta CPU de hashing.
+    """
+
+    def __init__(self, backend, enabled: bool = RATE_LIMIT_ENABLED,
+                 ip_burst: int = RATE_LIMIT_IP_BURST, ip_per_minute: float = RATE_LIMIT_IP_PER_MINUTE,
+                 email_burst: int = RATE_LIMIT_EMAIL_BURST, email_per_minute: float = RATE_LIMIT_EMAIL_PER_MINUTE):
+        self.backend = backend
+        self.enabled = enabled
+        self.rules = {
+            "ip": (ip_burst, ip_per_minute / 60),
+            "email": (email_burst, email_per_minute / 60),
+        }
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = {"ip": 0, "email": 0}
+
+    def check(self, scope: str, ip: str, email: str = None):
+        """
+        Consume una ficha del bucket de la IP y, si hay email, del de la cuenta.
+
+        Raises:
+            HTTPException: 429 con Retry-After si alguno está vacío
+        """
+        if not self.enabled:
+            return
+        now = time.time()
+        keys = [("ip", f"{scope}:ip:{ip}")]
+        if email:
+            keys.append(("email", f"{scope}:email:{email.strip().lower()}"))
+        for kind, key in keys:
+            capacity, rate = self.rules[kind]
+            wait = self.backend.take(key, capacity, rate, now)
+            if wait:
+                with self._lock:
+                    self.throttled[kind] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Demasiados intentos, intenta de nuevo más tarde",
+                    headers={"Retry-After": str(math.ceil(wait))}
+                )
+        with self._lock:
+            self.allowed += 1
+
+    async def check_async(self, scope: str, ip: str, email: str = None):
+        # El backend SQLite hace I/O: fuera del event loop
+        if isinstance(self.backend, SqliteRateLimitBackend):
+            await run_in_threadpool(self.check, scope, ip, email)
+        else:
+            self.check(scope, ip, email)
+
+    def stats(self) -> dict:
+        keys = len(self.backend)
+        with self._lock:
+            return {
+                "enabled": int(self.enabled),
+                "allowed": self.allowed,
+                "throttled_ip": self.throttled["ip"],
+                "throttled_email": self.throttled["email"],
+                "keys": keys,
+            }
+
+
+def client_ip(request: Request, hops: int = RATE_LIMIT_TRUSTED_PROXY_HOPS) -> str:
+    """
+    IP del cliente; X-Forwarded-For solo se usa si RATE_LIMIT_TRUST_FORWARDED.
+
+    Cada proxy agrega al final la IP de quien le habló, así que lo que el
+    cliente mande por su cuenta queda a la izquierda. Con `hops` proxies
+    propios delante, la IP real es la entrada `hops` contando desde la
+    derecha (la última con un solo proxy).
+    """
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = [entry.strip() for entry in request.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if forwarded:
+            return forwarded[max(len(forwarded) - max(hops, 1), 0)]
+    return request.client.host if request.client else "desconocida"
+
+
+def _build_backend():
+    if RATE_LIMIT_BACKEND == "sqlite":
+        return SqliteRateLimitBackend()
+    return MemoryRateLimitBackend()
+
+
+login_limiter = RateLimiter(_build_backend())
+register_metrics("rate_limit", login_limiter.stats)
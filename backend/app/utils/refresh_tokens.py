@@ -0,0 +1,215 @@
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from jose import jwt, JWTError
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from ..models.models import RefreshToken, User
+from ..config import SECRET_KEY, ALGORITHM, TOKEN_EMBED_USER_ID, REFRESH_REVOCATION_MAX_ENTRIES
+from .metrics import register_metrics
+from .token_utils import create_access_token
+
+refresh_table = RefreshToken.__table__
+
+REFRESH_TOKEN_TYPE = "refresh"
+REFRESH_TOKEN_LIFETIME = timedelta(days=30)
+
+
+def hash_token(token: str) -> str:
+    # El token lleva 128 bits aleatorios (jti): sha256 basta, no hace falta bcrypt
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationSet:
+    """
+    jti y familias revocados, en memoria hasta que vencen los tokens.
+
+    Permite rechazar un token rotado o revocado sin ir a la base. La base
+    sigue siendo la fuente de verdad: si la entrada se descartó (límite de
+    tamaño) o la revocación ocurrió en otro proceso, el UPDATE condicional
+    de la rotación lo detecta igual.
+    """
+
+    def __init__(self, max_entries: int = REFRESH_REVOCATION_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # clave -> vencimiento (epoch)
+        self._lock = threading.Lock()
+
+    def add(self, key: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            return True
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+revocations = RevocationSet()
+_counters = {"issued": 0, "rotated": 0, "rejected_in_memory": 0, "reuse_detected": 0, "purged": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name: str):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def refresh_stats() -> dict:
+    with _counters_lock:
+        return {**_counters, "revocations": len(revocations)}
+
+
+register_metrics("refresh_tokens", refresh_stats)
+
+
+def _unauthorized(detail: str = "Token de refresco inválido o expirado"):
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+def _new_token(db: Session, user_id: int, email: str, lifetime: timedelta, family_id: str = None) -> str:
+    now = datetime.utcnow()
+    family_id = family_id or secrets.token_urlsafe(16)
+    token = jwt.encode({
+        "sub": email,
+        "uid": user_id,
+        "jti": secrets.token_urlsafe(16),
+        "fam": family_id,
+        "typ": REFRESH_TOKEN_TYPE,
+        "iat": now,
+        "exp": now + lifetime,
+    }, SECRET_KEY, algorithm=ALGORITHM)
+    db.execute(insert(refresh_table).values(
+        user_id=user_id, token_hash=hash_token(token), family_id=family_id, expires_at=now + lifetime, created_at=now
+    ))
+    _count("issued")
+    return token
+
+
+def issue_refresh_token(db: Session, user: User, lifetime: timedelta = REFRESH_TOKEN_LIFETIME) -> str:
+    """Token de refresco de un login nuevo (familia nueva); se guarda solo su hash."""
+    token = _new_token(db, user.id, user.email, lifetime)
+    db.commit()
+    return token
+
+
+def _decode(token: str, verify_exp: bool = True) -> dict:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"verify_exp": verify_exp})
+    except JWTError:
+        raise _unauthorized()
+    if payload.get("typ") != REFRESH_TOKEN_TYPE or not payload.get("jti") or not payload.get("fam"):
+        raise _unauthorized()
+    return payload
+
+
+def _revoke_family(db: Session, payload: dict, now: datetime):
+    # Reuso de un token ya rotado: el cliente legítimo y el atacante comparten
+    # familia, así que se revocan todas sus rotaciones
+    db.execute(
+        update(refresh_table)
+        .where(refresh_table.c.family_id == payload["fam"], refresh_table.c.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    db.commit()
+    revocations.add(payload["fam"], payload["exp"])
+    _count("reuse_detected")
+
+
+def rotate_refresh_token(db: Session, token: str) -> tuple:
+    """
+    Canjea un token de refresco por un access token y un refresco nuevo.
+
+    La firma, el vencimiento y las familias revocadas se comprueban en
+    memoria; lo único que toca la base es un UPDATE condicional que marca
+    el token como usado más el INSERT del siguiente, en una transacción (sin
+    cargar el usuario ni pasar por bcrypt). Si el token ya se había usado
+    (lo sepa este proceso en memoria o lo diga la base), se asume robado y
+    se revoca toda su familia.
+
+    Returns:
+        tuple: (access token, token de refresco nuevo)
+
+    Raises:
+        HTTPException: 401 si el token no es válido, venció o fue revocado
+    """
+    payload = _decode(token)
+    if payload["fam"] in revocations:
+        # Familia ya revocada (logout o reuso detectado): no hay nada más que hacer
+        _count("rejected_in_memory")
+        raise _unauthorized()
+
+    now = datetime.utcnow()
+    if payload["jti"] in revocations:
+        # Token ya rotado en este proceso: reuso, sin necesidad de consultar el token
+        _revoke_family(db, payload, now)
+        raise _unauthorized()
+
+    result = db.execute(
+        update(refresh_table)
+        .where(refresh_table.c.token_hash == hash_token(token), refresh_table.c.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if result.rowcount != 1:
+        _revoke_family(db, payload, now)
+        raise _unauthorized()
+
+    # Misma duración que el token original (24 h o 30 días con remember_me)
+    lifetime = timedelta(seconds=payload["exp"] - payload["iat"])
+    new_token = _new_token(db, payload["uid"], payload["sub"], lifetime, family_id=payload["fam"])
+    db.commit()
+    revocations.add(payload["jti"], payload["exp"])
+    _count("rotated")
+
+    claims = {"sub": payload["sub"]}
+    if TOKEN_EMBED_USER_ID:
+        claims["uid"] = payload["uid"]
+    return create_access_token(data=claims), new_token
+
+
+def revoke_refresh_token(db: Session, token: str):
+    """Cierra la sesión: revoca el token y todas sus rotaciones."""
+    payload = _decode(token, verify_exp=False)
+    db.execute(
+        update(refresh_table)
+        .where(refresh_table.c.family_id == payload["fam"], refresh_table.c.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    db.commit()
+    revocations.add(payload["fam"], payload["exp"])
+
+
+def purge_expired_refresh_tokens(db: Session, now: datetime = None) -> int:
+    """
+    Borra los tokens de refresco ya vencidos (rotados, revocados o sin usar).
+
+    Cada rotación inserta una fila y la anterior solo se marca como usada,
+    así que la tabla crece con cada refresco. Pasado expires_at la firma ya
+    rechaza el token, y con él su detección de reuso: la fila no aporta nada.
+    Las filas sin vencer de una familia activa se conservan.
+
+    Returns:
+        int: Número de filas borradas
+    """
+    result = db.execute(delete(refresh_table).where(refresh_table.c.expires_at <= (now or datetime.utcnow())))
+    db.commit()
+    purged = result.rowcount or 0
+    with _counters_lock:
+        _counters["purged"] += purged
+    return purged
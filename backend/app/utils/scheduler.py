@@ -0,0 +1,179 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, date
+from sqlalchemy import select, delete, func
+from ..database import SessionLocal
+from ..models.models import Calendar, AvailabilitySlot, AvailabilityBlock
+from ..config import SLOT_SCHEDULER_HOUR, SLOT_SCHEDULER_BATCH_SIZE
+from .slot_generator import generate_slots_for_calendar, SLOT_HORIZON_DAYS
+from .availability_cache import invalidate_calendar
+from .vector_slots import generate_slot_arrays, split_by_calendar, minute_pairs
+from .refresh_tokens import purge_expired_refresh_tokens
+
+slots_table = AvailabilitySlot.__table__
+
+
+def next_calendar_ids(last_id: int, batch_size: int) -> list:
+    """Siguiente lote de ids de calendario por keyset (id > last_id)."""
+    db = SessionLocal()
+    try:
+        return db.execute(
+            select(Calendar.id).where(Calendar.id > last_id).order_by(Calendar.id).limit(batch_size)
+        ).scalars().all()
+    finally:
+        db.close()
+
+
+def maintain_batch(calendar_ids, today: date) -> dict:
+    """
+    Extiende el horizonte y poda los días vencidos de un lote de calendarios.
+
+    Cada calendario se extiende desde su último día materializado hasta
+    today + SLOT_HORIZON_DAYS - 1 (normalmente un solo día), de modo que una
+    noche perdida se recupera en la siguiente.
+    """
+    stats = {"calendars": 0, "inserted": 0, "deleted": 0, "pruned": 0}
+    horizon_end = today + timedelta(days=SLOT_HORIZON_DAYS - 1)
+    today_start = datetime.combine(today, datetime.min.time())
+
+    db = SessionLocal()
+    try:
+        # Podar slots vencidos sin reservar; los reservados quedan como historial
+        result = db.execute(
+            delete(slots_table).where(
+                slots_table.c.calendar_id.in_(calendar_ids),
+                slots_table.c.end_time < today_start,
+                slots_table.c.is_booked == False
+            )
+        )
+        stats["pruned"] = result.rowcount or 0
+        db.commit()
+
+        last_days = dict(db.execute(
+            select(AvailabilitySlot.calendar_id, func.max(AvailabilitySlot.start_time))
+            .where(AvailabilitySlot.calendar_id.in_(calendar_ids))
+            .group_by(AvailabilitySlot.calendar_id)
+        ).all())
+
+        calendars = db.query(Calendar).filter(Calendar.id.in_(calendar_ids)).all()
+        start_dates = {}
+        for calendar in calendars:
+            last_start = last_days.get(calendar.id)
+            start_date = today
+            if last_start is not None and last_start.date() >= today:
+                start_date = last_start.date() + timedelta(days=1)
+            if start_date <= horizon_end:
+                start_dates[calendar.id] = start_date
+
+        # Slots deseados de todo el lote en una sola pasada vectorizada, desde el
+        # primer día que le falta a algún calendario (normalmente solo el último)
+        desired_by_calendar = {}
+        if start_dates:
+            first_day = min(start_dates.values())
+            blocks = db.query(AvailabilityBlock).filter(AvailabilityBlock.calendar_id.in_(list(start_dates))).all()
+            desired_by_calendar = split_by_calendar(
+                generate_slot_arrays(calendars, blocks, first_day, (horizon_end - first_day).days + 1)
+            )
+
+        for calendar in calendars:
+            start_date = start_dates.get(calendar.id)
+            if start_date is None:
+                continue
+            desired = set()
+            if calendar.id in desired_by_calendar:
+                desired = minute_pairs(*desired_by_calendar[calendar.id], since=start_date)
+            result = generate_slots_for_calendar(
+                calendar, db, start_date=start_date, days=(horizon_end - start_date).days + 1, desired=desired
+            )
+            stats["calendars"] += 1
+            stats["inserted"] += result["inserted"]
+            stats["deleted"] += result["deleted"]
+    finally:
+        db.close()
+    invalidate_calendar(*calendar_ids)
+    return stats
+
+
+def purge_refresh_tokens() -> int:
+    """Limpieza nocturna de los tokens de refresco vencidos."""
+    db = SessionLocal()
+    try:
+        return purge_expired_refresh_tokens(db)
+    finally:
+        db.close()
+
+
+class SlotHorizonScheduler:
+    """
+    Tarea periódica en proceso que mantiene el horizonte rodante de slots.
+
+    Corre una vez por noche (SLOT_SCHEDULER_HOUR, UTC) y procesa los
+    calendarios por lotes en un hilo propio, sin ocupar el pool de hilos que
+    atiende las peticiones.
+    """
+
+    def __init__(self, run_hour: int = SLOT_SCHEDULER_HOUR, batch_size: int = SLOT_SCHEDULER_BATCH_SIZE):
+        self.run_hour = run_hour
+        self.batch_size = batch_size
+        self._executor = None
+        self._task = None
+
+    def seconds_until_next_run(self, now: datetime = None) -> float:
+        now = now or datetime.utcnow()
+        next_run = now.replace(hour=self.run_hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
+
+    async def run_once(self, today: date = None) -> dict:
+        """Ejecuta un ciclo completo, cediendo el event loop entre lotes."""
+        today = today or datetime.utcnow().date()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slot-horizon")
+        loop = asyncio.get_running_loop()
+        totals = {"calendars": 0, "inserted": 0, "deleted": 0, "pruned": 0}
+        last_id = 0
+        while True:
+            calendar_ids = await loop.run_in_executor(self._executor, next_calendar_ids, last_id, self.batch_size)
+            if not calendar_ids:
+                break
+            stats = await loop.run_in_executor(self._executor, maintain_batch, calendar_ids, today)
+            # Un resumen por lote; generate_slots_for_calendar solo devuelve sus conteos
+            print(f"Lote de slots (calendarios {calendar_ids[0]}-{calendar_ids[-1]}): {stats}")
+            for key, value in stats.items():
+                totals[key] += value
+            last_id = calendar_ids[-1]
+        print(f"Horizonte de slots actualizado: {totals}")
+        # Aprovecha la pasada nocturna: cada refresco deja una fila que nadie más borra
+        purged = await loop.run_in_executor(self._executor, purge_refresh_tokens)
+        print(f"Tokens de refresco vencidos eliminados: {purged}")
+        return totals
+
+    async def _loop(self):
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run())
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Error en el mantenimiento de slots: {e}")
+
+    def start(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slot-horizon")
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+slot_scheduler = SlotHorizonScheduler()
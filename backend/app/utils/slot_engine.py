@@ -0,0 +1,240 @@
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import groupby
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import Session
+from ..models.models import AvailabilityBlock, Appointment
+from .slot_holds import slot_holds
+from .intervals import merge_intervals, saturated_intervals, subtract_intervals, clip_intervals, fitting_intervals
+
+# Códigos de día en el mismo orden que date.weekday()
+WEEKDAY_CODES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+
+def day_code(block) -> str:
+    value = block.day_of_week
+    return getattr(value, "value", value)
+
+
+def group_blocks_by_day(blocks) -> dict:
+    """Agrupa los bloques de disponibilidad por código de día ("mon", "tue", ...)."""
+    by_day = defaultdict(list)
+    for block in blocks:
+        by_day[day_code(block)].append((block.start_time, block.end_time))
+    for windows in by_day.values():
+        windows.sort()
+    return by_day
+
+
+def expand_windows(blocks, start_date: date, end_date: date):
+    """
+    Expande las reglas semanales en ventanas concretas de fecha y hora.
+
+    Args:
+        blocks: Bloques de disponibilidad del calendario
+        start_date: Primer día a expandir (incluido)
+        end_date: Último día a expandir (incluido)
+
+    Yields:
+        tuple: (inicio, fin) de cada ventana, en orden cronológico
+    """
+    by_day = group_blocks_by_day(blocks)
+    if not by_day:
+        return
+    current = start_date
+    while current <= end_date:
+        for block_start, block_end in by_day.get(WEEKDAY_CODES[current.weekday()], ()):
+            yield datetime.combine(current, block_start), datetime.combine(current, block_end)
+        current += timedelta(days=1)
+
+
+def busy_intervals(calendar, appointments) -> list:
+    """
+    Intervalos ocupados del calendario, disjuntos y ordenados.
+
+    Cada cita se amplía con buffer_before/buffer_after y un tramo solo cuenta
+    como ocupado cuando alcanza max_per_slot citas simultáneas.
+    """
+    before = timedelta(minutes=calendar.buffer_before or 0)
+    after = timedelta(minutes=calendar.buffer_after or 0)
+    expanded = [(a.start_time - before, a.end_time + after) for a in appointments]
+    return saturated_intervals(expanded, calendar.max_per_slot or 1)
+
+
+def _overlaps(busy_starts, busy, start, end) -> bool:
+    # El único candidato es el último intervalo ocupado que empieza antes del fin del slot
+    idx = bisect_left(busy_starts, end) - 1
+    return idx >= 0 and busy[idx][1] > start
+
+
+def iter_rule_slots(calendar, blocks, start_date: date, end_date: date, duration: int = None):
+    """
+    Genera los slots que dictan las reglas, sin descontar citas.
+
+    Args:
+        calendar: Calendario con meeting_duration y slot_interval
+        blocks: Reglas de disponibilidad (AvailabilityBlock)
+        start_date: Primer día (incluido)
+        end_date: Último día (incluido)
+        duration: Duración en minutos (por defecto calendar.meeting_duration)
+
+    Yields:
+        tuple: (inicio, fin) de cada slot
+    """
+    duration = duration or calendar.meeting_duration
+    if not duration or not calendar.slot_interval:
+        return
+
+    meeting = timedelta(minutes=duration)
+    step = timedelta(minutes=calendar.slot_interval)
+    for window_start, window_end in expand_windows(blocks, start_date, end_date):
+        current = window_start
+        while current + meeting <= window_end:
+            yield current, current + meeting
+            current += step
+
+
+def compute_slots(calendar, blocks, appointments, range_start: datetime, range_end: datetime, duration: int = None):
+    """
+    Calcula los slots reservables de un calendario sin materializarlos.
+
+    Args:
+        calendar: Calendario con meeting_duration y slot_interval
+        blocks: Reglas de disponibilidad (AvailabilityBlock)
+        appointments: Citas existentes que ocupan tiempo
+        range_start: Inicio del rango a consultar
+        range_end: Fin del rango a consultar
+        duration: Duración en minutos (por defecto calendar.meeting_duration)
+
+    Returns:
+        list: Tuplas (inicio, fin) ordenadas de los slots libres
+    """
+    busy = busy_intervals(calendar, appointments)
+    busy_starts = [interval[0] for interval in busy]
+
+    slots = [
+        (start, end)
+        for start, end in iter_rule_slots(calendar, blocks, range_start.date(), range_end.date(), duration)
+        if start >= range_start and end <= range_end and not _overlaps(busy_starts, busy, start, end)
+    ]
+    slots.sort()
+    return slots
+
+
+def compute_free_intervals(calendar, blocks, appointments, range_start: datetime, range_end: datetime, duration: int = None):
+    """
+    Calcula los intervalos libres exactos de un calendario.
+
+    Fusiona las ventanas de disponibilidad y les resta las citas (con buffers
+    y capacidad por slot) en O((n+m) log n).
+
+    Returns:
+        list: Tuplas (inicio, fin) donde cabe una reunión de `duration` minutos
+    """
+    duration = duration or calendar.meeting_duration or 0
+    windows = merge_intervals(expand_windows(blocks, range_start.date(), range_end.date()))
+    windows = clip_intervals(windows, range_start, range_end)
+    free = subtract_intervals(windows, busy_intervals(calendar, appointments))
+    return fitting_intervals(free, duration)
+
+
+def iter_bookable_slots(calendar, blocks, appointments, range_start: datetime, range_end: datetime, duration: int = None):
+    """
+    Versión perezosa de compute_slots: genera los slots libres en orden, día por día.
+
+    Solo expande los días que el consumidor llega a pedir, lo que permite
+    mezclar muchos calendarios con heapq.merge sin calcular sus horizontes.
+    """
+    duration = duration or calendar.meeting_duration
+    if not duration or not calendar.slot_interval:
+        return
+
+    meeting = timedelta(minutes=duration)
+    step = timedelta(minutes=calendar.slot_interval)
+    by_day = group_blocks_by_day(blocks)
+    busy = busy_intervals(calendar, appointments)
+    busy_starts = [interval[0] for interval in busy]
+
+    day = range_start.date()
+    while day <= range_end.date():
+        day_slots = []
+        for block_start, block_end in by_day.get(WEEKDAY_CODES[day.weekday()], ()):
+            current = datetime.combine(day, block_start)
+            window_end = datetime.combine(day, block_end)
+            while current + meeting <= window_end:
+                slot_end = current + meeting
+                if current >= range_start and slot_end <= range_end and not _overlaps(busy_starts, busy, current, slot_end):
+                    day_slots.append((current, slot_end))
+                current += step
+        day_slots.sort()
+        yield from day_slots
+        day += timedelta(days=1)
+
+
+def _load_rules(db: Session, calendar, range_start: datetime, range_end: datetime):
+    blocks = db.query(AvailabilityBlock).filter(AvailabilityBlock.calendar_id == calendar.id).all()
+    before = timedelta(minutes=calendar.buffer_before or 0)
+    after = timedelta(minutes=calendar.buffer_after or 0)
+    appointments = db.query(Appointment).filter(
+        Appointment.calendar_id == calendar.id,
+        Appointment.start_time < range_end + before,
+        Appointment.end_time > range_start - after
+    ).all()
+    # Los apartados vigentes ocupan tiempo igual que una cita
+    holds = slot_holds.active([calendar.id], range_start - after, range_end + before).get(calendar.id, [])
+    return blocks, appointments + holds
+
+
+def get_bookable_slots(db: Session, calendar, range_start: datetime, range_end: datetime, duration: int = None):
+    """Consulta reglas y citas del calendario y devuelve sus slots libres en el rango."""
+    blocks, appointments = _load_rules(db, calendar, range_start, range_end)
+    return compute_slots(calendar, blocks, appointments, range_start, range_end, duration)
+
+
+def get_free_intervals(db: Session, calendar, range_start: datetime, range_end: datetime, duration: int = None):
+    """Consulta reglas y citas del calendario y devuelve sus intervalos libres en el rango."""
+    blocks, appointments = _load_rules(db, calendar, range_start, range_end)
+    return compute_free_intervals(calendar, blocks, appointments, range_start, range_end, duration)
+
+
+def get_bookable_slots_bulk(db: Session, calendars, range_start: datetime, range_end: datetime, duration: int = None) -> dict:
+    """
+    Slots libres de muchos calendarios con un número fijo de consultas.
+
+    Carga bloques y citas de todos los calendarios en una consulta agrupada
+    cada una, en lugar de dos consultas por calendario.
+
+    Returns:
+        dict: calendar_id -> lista de tuplas (inicio, fin)
+    """
+    calendars = list(calendars)
+    if not calendars:
+        return {}
+    calendar_ids = [calendar.id for calendar in calendars]
+    before = timedelta(minutes=max(calendar.buffer_before or 0 for calendar in calendars))
+    after = timedelta(minutes=max(calendar.buffer_after or 0 for calendar in calendars))
+
+    blocks = db.query(AvailabilityBlock).filter(
+        AvailabilityBlock.calendar_id.in_(calendar_ids)
+    ).order_by(AvailabilityBlock.calendar_id).all()
+    appointments = db.query(Appointment).filter(
+        Appointment.calendar_id.in_(calendar_ids),
+        Appointment.start_time < range_end + before,
+        Appointment.end_time > range_start - after
+    ).order_by(Appointment.calendar_id).all()
+
+    blocks_by_calendar = {key: list(group) for key, group in groupby(blocks, key=lambda b: b.calendar_id)}
+    appointments_by_calendar = {key: list(group) for key, group in groupby(appointments, key=lambda a: a.calendar_id)}
+    holds_by_calendar = slot_holds.active(calendar_ids, range_start - after, range_end + before)
+
+    return {
+        calendar.id: compute_slots(
+            calendar,
+            blocks_by_calendar.get(calendar.id, []),
+            appointments_by_calendar.get(calendar.id, []) + holds_by_calendar.get(calendar.id, []),
+            range_start,
+            range_end,
+            duration
+        )
+        for calendar in calendars
+    }
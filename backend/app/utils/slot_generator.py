@@ -1,38 +1,120 @@
-from datetime import datetime, timedelta, time
-from ..models.models import AvailabilitySlot, AvailabilityBlock
+from datetime import datetime, timedelta, date
+from sqlalchemy import select, insert, delete
 from sqlalchemy.orm import Session
+from ..models.models import AvailabilitySlot, AvailabilityBlock
+from .slot_engine import iter_rule_slots
+
+slots_table = AvailabilitySlot.__table__
+
+# Días hacia adelante que se mantienen materializados
+SLOT_HORIZON_DAYS = 30
+# Filas por sentencia en inserts y deletes masivos
+BULK_CHUNK_SIZE = 1000
+
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def to_minutes(value: datetime) -> int:
+    """Minutos desde epoch (la misma unidad que datetime64[m] de vector_slots)."""
+    return (value - _EPOCH) // _MINUTE
+
+
+def from_minutes(minutes: int) -> datetime:
+    return _EPOCH + timedelta(minutes=minutes)
+
 
-def generate_slots_for_calendar(calendar, db: Session):
-    # Elimina todos los slots existentes para este calendario
-    db.query(AvailabilitySlot).filter_by(calendar_id=calendar.id).delete()
+def _stored_key(start_time: datetime, end_time: datetime):
+    # Un slot cargado a mano con segundos nunca coincide con uno de las reglas
+    if start_time.second or start_time.microsecond or end_time.second or end_time.microsecond:
+        return None
+    return to_minutes(start_time), to_minutes(end_time)
 
-    # Recupera los bloques de disponibilidad de ese calendario
-    availability_blocks = db.query(AvailabilityBlock).filter_by(calendar_id=calendar.id).all()
+
+def generate_slots_for_calendar(calendar, db: Session, start_date: date = None, days: int = SLOT_HORIZON_DAYS, desired: set = None) -> dict:
+    """
+    Sincroniza los slots materializados de un calendario con sus reglas.
+
+    Compara el conjunto deseado de slots con el almacenado dentro del horizonte:
+    inserta solo los que faltan (insert masivo de Core), elimina solo los
+    obsoletos no reservados y nunca toca los slots reservados. El diff se hace
+    con enteros (minutos desde epoch); solo los slots a insertar vuelven a
+    datetime.
+
+    Args:
+        calendar: Calendario a regenerar
+        db: Sesión de base de datos
+        start_date: Primer día del horizonte (por defecto hoy, UTC)
+        days: Número de días del horizonte
+        desired: Slots (inicio, fin) en minutos desde epoch ya calculados,
+            p. ej. con vector_slots.minute_pairs
+
+    Returns:
+        dict: Conteos de la regeneración (inserted, deleted, kept)
+    """
+    stats = {"inserted": 0, "deleted": 0, "kept": 0}
 
     # Validación de configuración básica
     if calendar.meeting_duration is None or calendar.slot_interval is None:
-        return
-
-    # Generar para los próximos 30 días
-    today = datetime.utcnow().date()
-    end_date = today + timedelta(days=30)
-
-    for single_date in (today + timedelta(n) for n in range((end_date - today).days)):
-        weekday_str = single_date.strftime('%a').lower()[:3]  # ej: "mon", "tue"
-        day_blocks = [b for b in availability_blocks if b.day_of_week == weekday_str]
-
-        for block in day_blocks:
-            start_time = datetime.combine(single_date, block.start_time)
-            end_time = datetime.combine(single_date, block.end_time)
-
-            current = start_time
-            while current + timedelta(minutes=calendar.meeting_duration) <= end_time:
-                new_slot = AvailabilitySlot(
-                    calendar_id=calendar.id,
-                    start_time=current,
-                    end_time=current + timedelta(minutes=calendar.meeting_duration)
-                )
-                db.add(new_slot)
-                current += timedelta(minutes=calendar.slot_interval)
+        return stats
+
+    start_date = start_date or datetime.utcnow().date()
+    end_date = start_date + timedelta(days=days - 1)
+    range_start = datetime.combine(start_date, datetime.min.time())
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time())
+
+    if desired is None:
+        availability_blocks = db.query(AvailabilityBlock).filter_by(calendar_id=calendar.id).all()
+        desired = {
+            (to_minutes(start), to_minutes(end))
+            for start, end in iter_rule_slots(calendar, availability_blocks, start_date, end_date)
+        }
+
+    stored = db.execute(
+        select(
+            AvailabilitySlot.id,
+            AvailabilitySlot.start_time,
+            AvailabilitySlot.end_time,
+            AvailabilitySlot.is_booked
+        ).where(
+            AvailabilitySlot.calendar_id == calendar.id,
+            AvailabilitySlot.start_time >= range_start,
+            AvailabilitySlot.start_time < range_end
+        )
+    ).all()
+
+    present = set()
+    obsolete_ids = []
+    for slot_id, start_time, end_time, is_booked in stored:
+        key = _stored_key(start_time, end_time)
+        if is_booked or (key in desired and key not in present):
+            present.add(key)
+        else:
+            # Slot fuera de las reglas o duplicado, y sin reservar
+            obsolete_ids.append(slot_id)
+
+    missing = sorted(desired - present)
+
+    for chunk in _chunks(obsolete_ids, BULK_CHUNK_SIZE):
+        db.execute(delete(slots_table).where(slots_table.c.id.in_(chunk)))
+
+    for chunk in _chunks(missing, BULK_CHUNK_SIZE):
+        db.execute(
+            insert(slots_table),
+            [
+                {"calendar_id": calendar.id, "start_time": from_minutes(start), "end_time": from_minutes(end), "is_booked": False}
+                for start, end in chunk
+            ]
+        )
 
     db.commit()
+
+    stats["inserted"] = len(missing)
+    stats["deleted"] = len(obsolete_ids)
+    stats["kept"] = len(stored) - len(obsolete_ids)
+    return stats
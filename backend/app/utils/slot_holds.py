@@ -0,0 +1,332 @@
+import math
+import secrets
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete
+from sqlalchemy.exc import IntegrityError
+from ..database import engine
+from ..models.models import SlotHold
+from ..config import SLOT_HOLD_TTL_SECONDS, SLOT_HOLD_BACKEND
+from .availability_cache import SqlCalendarVersions, calendar_versions, invalidate_calendar
+from .metrics import register_metrics
+
+holds_table = SlotHold.__table__
+
+# Se usa como pseudo-cita en los cálculos de disponibilidad (start_time / end_time)
+Hold = namedtuple("Hold", "token calendar_id start_time end_time expires_at")
+
+# Cada cuánto el backend SQL borra los apartados vencidos (segundos)
+SQL_PURGE_INTERVAL_SECONDS = 60
+
+
+class TimerWheel:
+    """
+    Rueda de temporizadores de un nivel con un bucket por tick.
+
+    schedule y cancel son O(1); advance vacía solo los buckets de los ticks
+    transcurridos. El tamaño debe superar el TTL máximo en ticks para que un
+    bucket nunca mezcle vencimientos de dos vueltas distintas.
+    """
+
+    def __init__(self, size: int, tick_seconds: float = 1.0):
+        self.size = size
+        self.tick_seconds = tick_seconds
+        self._buckets = [set() for _ in range(size)]
+        self._current = int(time.monotonic() // tick_seconds)
+
+    def schedule(self, key, delay_seconds: float) -> int:
+        ticks = min(max(1, math.ceil(delay_seconds / self.tick_seconds)), self.size - 1)
+        tick = self._current + ticks
+        self._buckets[tick % self.size].add(key)
+        return tick
+
+    def cancel(self, key, tick: int):
+        self._buckets[tick % self.size].discard(key)
+
+    def advance(self, now: float = None) -> list:
+        """Devuelve las claves vencidas hasta `now` (monotónico)."""
+        now_tick = int((time.monotonic() if now is None else now) // self.tick_seconds)
+        expired = []
+        steps = min(now_tick - self._current, self.size)
+        for offset in range(steps):
+            bucket = self._buckets[(self._current + offset) % self.size]
+            expired.extend(bucket)
+            bucket.clear()
+        self._current = max(self._current, now_tick)
+        return expired
+
+
+class MemoryHoldBackend:
+    """
+    Apartados en memoria del proceso, para un solo nodo.
+
+    Crear y liberar son O(1) (diccionarios más la rueda de temporizadores);
+    no hay escrituras a la base de datos ni barridos periódicos.
+    """
+    # La versión del calendario la avanza SlotHoldStore tras cada cambio
+    bumps_versions = False
+
+    def __init__(self, ttl_seconds: int = SLOT_HOLD_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._wheel = TimerWheel(ttl_seconds + 2)
+        self._holds = {}  # token -> (Hold, tick)
+        self._by_slot = {}  # (calendar_id, start_time) -> token
+        self._by_calendar = defaultdict(dict)  # calendar_id -> {token: Hold}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.released = 0
+        self.expired = 0
+        self.conflicts = 0
+
+    def _drop(self, token: str):
+        hold, tick = self._holds.pop(token)
+        self._wheel.cancel(token, tick)
+        del self._by_slot[(hold.calendar_id, hold.start_time)]
+        calendar_holds = self._by_calendar[hold.calendar_id]
+        del calendar_holds[token]
+        if not calendar_holds:
+            del self._by_calendar[hold.calendar_id]
+        return hold
+
+    def _expire_locked(self) -> set:
+        calendar_ids = set()
+        for token in self._wheel.advance():
+            if token in self._holds:
+                calendar_ids.add(self._drop(token).calendar_id)
+                self.expired += 1
+        return calendar_ids
+
+    def expire(self, calendar_ids=None) -> set:
+        # La rueda ya sabe exactamente qué venció: `calendar_ids` no hace falta
+        with self._lock:
+            return self._expire_locked()
+
+    def create(self, calendar_id: int, start_time: datetime, end_time: datetime):
+        with self._lock:
+            self._expire_locked()
+            if (calendar_id, start_time) in self._by_slot:
+                self.conflicts += 1
+                return None
+            token = secrets.token_urlsafe(16)
+            hold = Hold(token, calendar_id, start_time, end_time, datetime.utcnow() + timedelta(seconds=self.ttl_seconds))
+            tick = self._wheel.schedule(token, self.ttl_seconds)
+            self._holds[token] = (hold, tick)
+            self._by_slot[(calendar_id, start_time)] = token
+            self._by_calendar[calendar_id][token] = hold
+            self.created += 1
+            return hold
+
+    def release(self, token: str):
+        with self._lock:
+            if token not in self._holds:
+                return None
+            self.released += 1
+            return self._drop(token)
+
+    def active(self, calendar_ids, range_start: datetime, range_end: datetime) -> dict:
+        now = datetime.utcnow()
+        result = {}
+        with self._lock:
+            for calendar_id in calendar_ids:
+                holds = [
+                    hold for hold in self._by_calendar.get(calendar_id, {}).values()
+                    if hold.expires_at > now and hold.start_time < range_end and hold.end_time > range_start
+                ]
+                if holds:
+                    result[calendar_id] = holds
+        return result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": len(self._holds),
+                "created": self.created,
+                "released": self.released,
+                "expired": self.expired,
+                "conflicts": self.conflicts,
+            }
+
+
+class SqlHoldBackend:
+    """
+    Apartados en la tabla slot_holds, compartidos entre workers (SQLite/Postgres).
+
+    La restricción única (calendar_id, start_time) resuelve la carrera entre
+    workers. Los apartados vencidos dejan de contar de inmediato porque toda
+    consulta filtra por expires_at; las filas se borran al volver a apartar el
+    mismo horario, al consultar la disponibilidad de su calendario o en una
+    purga general como máximo cada SQL_PURGE_INTERVAL_SECONDS.
+
+    Con las versiones de calendario en la base (SqlCalendarVersions), crear,
+    liberar y vencer un apartado avanzan la versión en la misma transacción,
+    así que ningún worker sirve un cuerpo cacheado o un 304 obsoleto.
+    """
+
+    def __init__(self, engine, ttl_seconds: int = SLOT_HOLD_TTL_SECONDS, versions=None):
+        self.engine = engine
+        self.ttl_seconds = ttl_seconds
+        self.versions = versions if isinstance(versions, SqlCalendarVersions) else None
+        # Con versiones en memoria las avanza SlotHoldStore (solo las ve este worker)
+        self.bumps_versions = self.versions is not None
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self.created = 0
+        self.released = 0
+        self.expired = 0
+        self.conflicts = 0
+
+    def _bump(self, conn, *calendar_ids):
+        if self.versions is not None and calendar_ids:
+            self.versions.bump(*calendar_ids, conn=conn)
+
+    def _purge(self, now: datetime, calendar_ids=None) -> set:
+        expired = select(holds_table.c.calendar_id).where(holds_table.c.expires_at <= now)
+        if calendar_ids is not None:
+            expired = expired.where(holds_table.c.calendar_id.in_(calendar_ids))
+        # Se consulta antes de abrir la transacción: casi siempre no hay nada que borrar
+        with self.engine.connect() as conn:
+            if conn.execute(expired.limit(1)).first() is None:
+                return set()
+        with self.engine.begin() as conn:
+            found = set(conn.execute(expired.distinct()).scalars())
+            if found:
+                result = conn.execute(delete(holds_table).where(
+                    holds_table.c.calendar_id.in_(found), holds_table.c.expires_at <= now
+                ))
+                self.expired += result.rowcount
+                self._bump(conn, *found)
+        return found
+
+    def expire(self, calendar_ids=None) -> set:
+        """
+        Borra apartados vencidos y devuelve sus calendarios.
+
+        Con `calendar_ids` revisa solo esos calendarios, en cada llamada (lo
+        usan las consultas de disponibilidad para que un apartado vencido
+        reaparezca enseguida); sin ellos hace la purga general, limitada a una
+        por SQL_PURGE_INTERVAL_SECONDS.
+        """
+        now = datetime.utcnow()
+        if calendar_ids is not None:
+            return self._purge(now, list(calendar_ids))
+        with self._lock:
+            if time.monotonic() - self._last_purge < SQL_PURGE_INTERVAL_SECONDS:
+                return set()
+            self._last_purge = time.monotonic()
+        return self._purge(now)
+
+    def create(self, calendar_id: int, start_time: datetime, end_time: datetime):
+        now = datetime.utcnow()
+        hold = Hold(secrets.token_urlsafe(16), calendar_id, start_time, end_time, now + timedelta(seconds=self.ttl_seconds))
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(delete(holds_table).where(
+                    holds_table.c.calendar_id == calendar_id,
+                    holds_table.c.start_time == start_time,
+                    holds_table.c.expires_at <= now
+                ))
+                conn.execute(insert(holds_table).values(**hold._asdict()))
+                self._bump(conn, calendar_id)
+        except IntegrityError:
+            self.conflicts += 1
+            return None
+        self.created += 1
+        return hold
+
+    def release(self, token: str):
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(*[holds_table.c[field] for field in Hold._fields]).where(holds_table.c.token == token)
+            ).first()
+            if row is None:
+                return None
+            conn.execute(delete(holds_table).where(holds_table.c.token == token))
+            self._bump(conn, row.calendar_id)
+        self.released += 1
+        return Hold(*row)
+
+    def active(self, calendar_ids, range_start: datetime, range_end: datetime) -> dict:
+        calendar_ids = list(calendar_ids)
+        if not calendar_ids:
+            return {}
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(*[holds_table.c[field] for field in Hold._fields]).where(
+                    holds_table.c.calendar_id.in_(calendar_ids),
+                    holds_table.c.expires_at > datetime.utcnow(),
+                    holds_table.c.start_time < range_end,
+                    holds_table.c.end_time > range_start
+                )
+            ).all()
+        result = defaultdict(list)
+        for row in rows:
+            result[row.calendar_id].append(Hold(*row))
+        return dict(result)
+
+    def stats(self) -> dict:
+        return {
+            "created": self.created,
+            "released": self.released,
+            "expired": self.expired,
+            "conflicts": self.conflicts,
+        }
+
+
+class SlotHoldStore:
+    """
+    Apartados temporales de slots durante la reserva, sobre un backend intercambiable.
+
+    Crear, liberar o vencer un apartado invalida la disponibilidad cacheada
+    del calendario, así que los slots apartados desaparecen de las consultas
+    públicas y vuelven a aparecer al liberarse o vencer.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def _invalidate(self, *calendar_ids):
+        # El backend SQL ya avanzó la versión dentro de su transacción
+        if calendar_ids and not self.backend.bumps_versions:
+            invalidate_calendar(*calendar_ids)
+
+    def expire(self, calendar_ids=None):
+        """Vence los apartados caducados (de `calendar_ids`, o de todos)."""
+        self._invalidate(*self.backend.expire(calendar_ids))
+
+    def hold(self, calendar_id: int, start_time: datetime, end_time: datetime):
+        """Aparta el horario; devuelve el Hold o None si ya está apartado."""
+        self.expire()
+        hold = self.backend.create(calendar_id, start_time, end_time)
+        if hold is not None:
+            self._invalidate(calendar_id)
+        return hold
+
+    def release(self, token: str):
+        hold = self.backend.release(token)
+        if hold is not None:
+            self._invalidate(hold.calendar_id)
+        return hold
+
+    def active(self, calendar_ids, range_start: datetime, range_end: datetime) -> dict:
+        """calendar_id -> apartados vigentes que se traslapan con el rango."""
+        return self.backend.active(calendar_ids, range_start, range_end)
+
+    def held_by_others(self, calendar_id: int, start_time: datetime, end_time: datetime, token: str = None) -> int:
+        """Apartados vigentes de otros pacientes que se traslapan con el horario."""
+        holds = self.active([calendar_id], start_time, end_time).get(calendar_id, [])
+        return sum(1 for hold in holds if hold.token != token)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
+
+
+def _build_backend():
+    if SLOT_HOLD_BACKEND == "sql":
+        return SqlHoldBackend(engine, versions=calendar_versions)
+    return MemoryHoldBackend()
+
+
+slot_holds = SlotHoldStore(_build_backend())
+register_metrics("slot_holds", slot_holds.stats)
@@ -2,11 +2,13 @@ from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from ..models.models import User
-from .password_utils import verify_password
-from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from .password_utils import verify_password, password_hasher
+from ..config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, TOKEN_EMBED_USER_ID
 from ..database import get_db
+from .principal_cache import principal_cache
 
 security = HTTPBearer()
 
@@ -16,6 +18,45 @@ def authenticate_user(db: Session, email: str, password: str):
         return None
     return user
 
+async def authenticate_user_async(db: Session, email: str, password: str):
+    """
+    Como authenticate_user, pero bcrypt corre en el pool dedicado.
+
+    Si el hash se creó con otro costo de bcrypt, se reemplaza por uno con el
+    costo actual en el mismo login. La conexión vuelve al pool antes de
+    esperar a bcrypt, así que una ráfaga de logins no agota el pool de la
+    base de datos.
+    """
+    def load():
+        user = db.query(User).filter(User.email == email).first()
+        if user is not None:
+            db.expunge(user)
+        db.rollback()
+        return user
+
+    user = await run_in_threadpool(load)
+    if not user or not user.hashed_password:
+        return None
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        def save():
+            merged = db.merge(user)
+            merged.hashed_password = new_hash
+            db.commit()
+            db.refresh(merged)
+            return merged
+        user = await run_in_threadpool(save)
+    return user
+
+def token_claims(user: User) -> dict:
+    """Claims de identidad del token: el email como sub y, si está activado, el id."""
+    claims = {"sub": user.email}
+    if TOKEN_EMBED_USER_ID:
+        claims["uid"] = user.id
+    return claims
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     
@@ -32,7 +73,8 @@ def verify_token(token: str):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
-        if email is None:
+        # Un token de refresco no sirve como access token
+        if email is None or payload.get("refresh") or payload.get("typ") == "refresh":
             return None
         return payload
     except JWTError:
@@ -52,7 +94,18 @@ def get_current_user(
         )
     
     email = payload.get("sub")
-    user = db.query(User).filter(User.email == email).first()
+    user = principal_cache.get(db, email)
+    if user is None:
+        uid = payload.get("uid")
+        if uid is not None:
+            # Búsqueda por llave primaria; el email debe seguir coincidiendo
+            user = db.get(User, uid)
+            if user is not None and user.email != email:
+                user = None
+        else:
+            user = db.query(User).filter(User.email == email).first()
+        if user is not None:
+            principal_cache.put(email, user)
     
     if user is None:
         raise HTTPException(
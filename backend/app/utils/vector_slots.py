@@ -0,0 +1,153 @@
+import numpy as np
+from datetime import date
+from .slot_engine import WEEKDAY_CODES, day_code
+
+_EMPTY = {
+    "calendar_id": np.empty(0, dtype=np.int64),
+    "start_time": np.empty(0, dtype="datetime64[m]"),
+    "end_time": np.empty(0, dtype="datetime64[m]"),
+}
+
+
+def _minutes(value) -> int:
+    return value.hour * 60 + value.minute
+
+
+def generate_slot_arrays(calendars, blocks, start_date: date, days: int) -> dict:
+    """
+    Genera con NumPy los slots de muchos calendarios para todo un horizonte.
+
+    Primero expande cada bloque en plantillas de minutos del día (una por slot)
+    y luego las combina con los días del horizonte mediante aritmética
+    datetime64, un producto por día de la semana.
+
+    Args:
+        calendars: Calendarios con meeting_duration y slot_interval
+        blocks: Bloques de disponibilidad de esos calendarios
+        start_date: Primer día del horizonte
+        days: Número de días del horizonte
+
+    Returns:
+        dict: Arreglos calendar_id, start_time y end_time (datetime64[m]),
+        ordenados por calendario e inicio
+    """
+    by_id = {
+        calendar.id: calendar for calendar in calendars
+        if calendar.meeting_duration and calendar.slot_interval
+    }
+    rows = [
+        (
+            block.calendar_id,
+            WEEKDAY_CODES.index(day_code(block)),
+            _minutes(block.start_time),
+            _minutes(block.end_time),
+            by_id[block.calendar_id].meeting_duration,
+            by_id[block.calendar_id].slot_interval,
+        )
+        for block in blocks
+        if block.calendar_id in by_id
+    ]
+    if not rows or days <= 0:
+        return dict(_EMPTY)
+
+    calendar_id, weekday, block_start, block_end, duration, step = np.array(rows, dtype=np.int64).T
+
+    # Plantillas: minuto de inicio de cada slot dentro de su bloque
+    counts = np.where(block_end - block_start >= duration, (block_end - block_start - duration) // step + 1, 0)
+    block_idx = np.repeat(np.arange(len(rows)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tmpl_start = block_start[block_idx] + position * step[block_idx]
+    tmpl_calendar = calendar_id[block_idx]
+    tmpl_weekday = weekday[block_idx]
+    tmpl_duration = duration[block_idx]
+
+    day_array = np.arange(np.datetime64(start_date, "D"), np.datetime64(start_date, "D") + days)
+    # 1970-01-01 fue jueves: (días + 3) % 7 da 0 = lunes
+    day_weekday = (day_array.astype(np.int64) + 3) % 7
+
+    calendar_parts, start_parts, end_parts = [], [], []
+    for wd in range(7):
+        tmpl_mask = tmpl_weekday == wd
+        day_mask = day_weekday == wd
+        if not tmpl_mask.any() or not day_mask.any():
+            continue
+        day_minutes = day_array[day_mask].astype("datetime64[m]")[:, None]
+        starts = day_minutes + tmpl_start[tmpl_mask].astype("timedelta64[m]")[None, :]
+        shape = starts.shape
+        start_parts.append(starts.ravel())
+        end_parts.append((starts + tmpl_duration[tmpl_mask].astype("timedelta64[m]")[None, :]).ravel())
+        calendar_parts.append(np.broadcast_to(tmpl_calendar[tmpl_mask], shape).ravel())
+
+    if not start_parts:
+        return dict(_EMPTY)
+
+    calendar_ids = np.concatenate(calendar_parts)
+    start_times = np.concatenate(start_parts)
+    end_times = np.concatenate(end_parts)
+    # Clave única (calendario, minuto) en un int64: argsort es mucho más rápido que lexsort
+    order = np.argsort((calendar_ids << 32) | start_times.astype(np.int64))
+    return {
+        "calendar_id": calendar_ids[order],
+        "start_time": start_times[order],
+        "end_time": end_times[order],
+    }
+
+
+def _calendar_ranges(calendar_ids):
+    """Rangos [lo, hi) de cada calendario en arreglos ordenados por calendario."""
+    boundaries = np.flatnonzero(np.diff(calendar_ids)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(calendar_ids)]))
+    for lo, hi in zip(starts.tolist(), ends.tolist()):
+        yield int(calendar_ids[lo]), lo, hi
+
+
+def split_by_calendar(arrays: dict) -> dict:
+    """
+    Separa los arreglos por calendario, en minutos desde epoch.
+
+    No convierte a datetime: convertir millones de datetime64 a objetos
+    Python costaba más que el loop original. Los slices son vistas.
+
+    Returns:
+        dict: calendar_id -> (inicios, fines) como arreglos int64
+    """
+    calendar_ids = arrays["calendar_id"]
+    if not len(calendar_ids):
+        return {}
+    starts = arrays["start_time"].astype(np.int64)
+    ends = arrays["end_time"].astype(np.int64)
+    return {
+        calendar_id: (starts[lo:hi], ends[lo:hi])
+        for calendar_id, lo, hi in _calendar_ranges(calendar_ids)
+    }
+
+
+def minute_pairs(starts, ends, since: date = None) -> set:
+    """
+    Conjunto de (inicio, fin) en minutos desde epoch, listo para el diff de slot_generator.
+
+    Con `since` solo incluye los slots desde ese día (el filtro es vectorizado).
+    """
+    if since is not None:
+        keep = starts >= (np.datetime64(since, "D") - np.datetime64(0, "D")).astype(np.int64) * 1440
+        starts, ends = starts[keep], ends[keep]
+    return set(zip(starts.tolist(), ends.tolist()))
+
+
+def compact_response(arrays: dict) -> dict:
+    """
+    Representación compacta para la API: minutos desde epoch por calendario.
+
+    Returns:
+        dict: calendar_id -> {"start": [...], "end": [...]}
+    """
+    calendar_ids = arrays["calendar_id"]
+    if not len(calendar_ids):
+        return {}
+    starts = arrays["start_time"].astype(np.int64)
+    ends = arrays["end_time"].astype(np.int64)
+    return {
+        calendar_id: {"start": starts[lo:hi].tolist(), "end": ends[lo:hi].tolist()}
+        for calendar_id, lo, hi in _calendar_ranges(calendar_ids)
+    }
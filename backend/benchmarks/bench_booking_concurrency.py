@@ -0,0 +1,72 @@
+"""
+Benchmark: throughput de reservas concurrentes a horarios distintos.
+
+Lanza WORKERS hilos, cada uno con su propia sesión, contra una base SQLite
+en archivo temporal. Que una sola reserva gane un mismo horario lo cubre
+tests/test_booking_concurrency.py.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_booking_concurrency
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert, func, select
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.models import User, Calendar, Appointment
+from app.utils.booking import book_appointment
+
+WORKERS = 32
+DISTINCT_SLOTS = 1000
+DAY = datetime(2030, 1, 7)
+
+
+def build_db(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "first_name": "Pac", "last_name": "1", "email": "p@example.com", "hashed_password": ""}])
+        conn.execute(insert(Calendar.__table__), [
+            {"id": 1, "name": "Throughput", "owner_id": 1, "meeting_duration": 30, "slot_interval": 30},
+        ])
+    return engine, sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+
+def attempt(Session, calendar_id, start):
+    db = Session()
+    try:
+        calendar = db.get(Calendar, calendar_id)
+        book_appointment(db, calendar, 1, start, start + timedelta(minutes=30))
+        return 201
+    except HTTPException as exc:
+        return exc.status_code
+    finally:
+        db.close()
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    engine, Session = build_db(os.path.join(directory, "booking.db"))
+
+    starts = [DAY + timedelta(days=i // 16, hours=8, minutes=30 * (i % 16)) for i in range(DISTINCT_SLOTS)]
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS) as pool:
+        results = list(pool.map(lambda start: attempt(Session, 1, start), starts))
+    seconds = time.perf_counter() - t0
+    assert results.count(201) == DISTINCT_SLOTS
+    print(f"{'horarios distintos':<24} {DISTINCT_SLOTS} reservas en {seconds:.2f} s  ({DISTINCT_SLOTS / seconds:.0f} reservas/s, {WORKERS} hilos)")
+
+    with engine.connect() as conn:
+        per_slot = conn.execute(
+            select(func.count()).select_from(Appointment.__table__).group_by(Appointment.calendar_id, Appointment.start_time)
+        ).scalars().all()
+    assert max(per_slot) == 1
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: búsqueda del primer slot libre entre 5,000 doctores de una especialidad.
+
+Compara el k-way merge perezoso contra calcular el horizonte completo de
+cada calendario y ordenar. Usa una base SQLite en memoria.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_earliest
+"""
+import random
+import time
+from datetime import datetime, timedelta, time as dtime
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models.models import User, Calendar, AvailabilityBlock, Appointment, DoctorProfile, Specialty
+from app.utils.earliest_search import find_earliest_slots
+from app.utils.slot_engine import get_bookable_slots_bulk
+
+DOCTORS = 5000
+K = 10
+HORIZON_DAYS = 30
+AFTER = datetime(2030, 1, 7, 8, 0)
+
+
+def build_db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    with engine.begin() as conn:
+        conn.execute(insert(Specialty.__table__), [{"id": 1, "name": "Cardiología"}])
+        conn.execute(insert(User.__table__), [
+            {"id": i, "first_name": "Doc", "last_name": str(i), "email": f"doc{i}@example.com", "hashed_password": ""}
+            for i in range(1, DOCTORS + 1)
+        ])
+        conn.execute(insert(DoctorProfile.__table__), [
+            {"id": i, "user_id": i, "professional_license": str(i), "phone": "0", "specialty_id": 1}
+            for i in range(1, DOCTORS + 1)
+        ])
+        conn.execute(insert(Calendar.__table__), [
+            {"id": i, "name": f"Doc {i}", "owner_id": i, "meeting_duration": 30, "slot_interval": 30}
+            for i in range(1, DOCTORS + 1)
+        ])
+        blocks = []
+        for i in range(1, DOCTORS + 1):
+            for day in rng.sample(["mon", "tue", "wed", "thu", "fri", "sat"], 3):
+                hour = rng.choice([8, 9, 10, 14, 15])
+                blocks.append({"calendar_id": i, "day_of_week": day, "start_time": dtime(hour, 0), "end_time": dtime(hour + 4, 0)})
+        conn.execute(insert(AvailabilityBlock.__table__), blocks)
+        appointments = []
+        for i in range(1, DOCTORS + 1):
+            for _ in range(10):
+                start = AFTER.replace(hour=8) + timedelta(days=rng.randrange(14), minutes=30 * rng.randrange(20))
+                appointments.append({"calendar_id": i, "user_id": i, "start_time": start, "end_time": start + timedelta(minutes=30)})
+        conn.execute(insert(Appointment.__table__), appointments)
+    return sessionmaker(bind=engine)()
+
+
+def main():
+    db = build_db()
+    calendars = db.query(Calendar).join(DoctorProfile, DoctorProfile.user_id == Calendar.owner_id).filter(
+        DoctorProfile.specialty_id == 1
+    ).all()
+    print(f"{len(calendars)} calendarios de la especialidad, k={K}\n")
+
+    t0 = time.perf_counter()
+    merged = find_earliest_slots(db, calendars, AFTER, K)
+    merge_seconds = time.perf_counter() - t0
+    print(f"{'k-way merge perezoso':<36} {merge_seconds * 1000:10.1f} ms")
+
+    t0 = time.perf_counter()
+    full = get_bookable_slots_bulk(db, calendars, AFTER, AFTER + timedelta(days=HORIZON_DAYS))
+    everything = sorted((start, calendar_id, end) for calendar_id, slots in full.items() for start, end in slots)
+    full_seconds = time.perf_counter() - t0
+    print(f"{'horizonte completo + sort':<36} {full_seconds * 1000:10.1f} ms  ({len(everything)} slots)")
+
+    assert [s[0] for s in merged] == [s[0] for s in everything[:K]]
+    print(f"\nPrimer slot: {merged[0][0]} (calendario {merged[0][1]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Benchmark: envío de la cola de correos contra un servidor SMTP local.
+
+Levanta un SMTP mínimo en proceso que simula el costo de conexión de un
+servidor real (TCP + STARTTLS + AUTH, CONNECT_LATENCY_SECONDS por conexión)
+y compara una conexión por mensaje (el send_email de antes) con el envío
+de la cola por una sola sesión. También comprueba los reintentos: un
+destinatario rechazado con 550 queda como fallido y uno con 451 se
+reintenta y sale en el segundo ciclo.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_email_outbox
+"""
+import os
+import socketserver
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["SMTP_FROM_EMAIL"] = "no-reply@example.com"
+os.environ["SMTP_STARTTLS"] = "false"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'outbox.db')}"
+
+from sqlalchemy import func, select, update
+from app.database import Base, SessionLocal, engine
+from app.models.models import EmailOutbox
+from app.utils.email_utils import SmtpSession, build_message
+from app.utils.email_templates import verification_email_content
+from app.utils.email_outbox import OutboxSender, enqueue_email
+
+MESSAGES = 2000
+PER_CONNECTION_MESSAGES = 200
+CONNECT_LATENCY_SECONDS = 0.03
+
+
+class StandInSMTP(socketserver.StreamRequestHandler):
+    """SMTP suficiente para smtplib: EHLO, MAIL, RCPT, DATA, RSET, NOOP, QUIT."""
+    received = 0
+    deferred = set()
+    lock = threading.Lock()
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        time.sleep(CONNECT_LATENCY_SECONDS)
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-stand-in\r\n250 8BITMIME")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address.startswith("rechazado"):
+                    self.reply("550 5.1.1 buzón inexistente")
+                elif address.startswith("ocupado") and address not in StandInSMTP.deferred:
+                    StandInSMTP.deferred.add(address)
+                    self.reply("451 4.3.0 intente más tarde")
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 fin con <CRLF>.<CRLF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                with StandInSMTP.lock:
+                    StandInSMTP.received += 1
+                self.reply("250 OK en cola")
+            elif verb == "QUIT":
+                self.reply("221 adiós")
+                return
+            else:
+                self.reply("250 OK")
+
+
+def main():
+    Base.metadata.create_all(bind=engine)
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), StandInSMTP)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    subject, html, text = verification_email_content("123456", "Ana")
+
+    # Antes: conectar (y autenticarse) por cada mensaje
+    t0 = time.perf_counter()
+    for i in range(PER_CONNECTION_MESSAGES):
+        session = SmtpSession(host=host, port=port, starttls=False)
+        session.send(build_message(f"p{i}@example.com", subject, html, text))
+        session.close()
+    per_connection = PER_CONNECTION_MESSAGES / (time.perf_counter() - t0)
+    print(f"{'conexión por mensaje':<24} {per_connection:8.1f} mensajes/s ({PER_CONNECTION_MESSAGES} mensajes)")
+
+    db = SessionLocal()
+    for i in range(MESSAGES):
+        enqueue_email(db, f"u{i}@example.com", subject, html, text)
+    enqueue_email(db, "rechazado@example.com", subject, html, text)
+    enqueue_email(db, "ocupado@example.com", subject, html, text)
+    db.commit()
+    db.close()
+
+    StandInSMTP.received = 0
+    sender = OutboxSender(session=SmtpSession(host=host, port=port, starttls=False))
+    t0 = time.perf_counter()
+    first = sender.drain()
+    seconds = time.perf_counter() - t0
+    print(
+        f"{'cola, sesión reutilizada':<24} {first['sent'] / seconds:8.1f} mensajes/s "
+        f"({first['sent']} mensajes en {seconds:.2f} s, {sender.session.connections} conexión(es) SMTP)"
+    )
+
+    # El 451 quedó reprogramado con backoff; se adelanta para el segundo ciclo
+    db = SessionLocal()
+    db.execute(update(EmailOutbox).where(EmailOutbox.status == "pending").values(next_attempt_at=EmailOutbox.created_at))
+    db.commit()
+    second = sender.drain()
+    counts = dict(db.execute(select(EmailOutbox.status, func.count()).group_by(EmailOutbox.status)).all())
+    db.close()
+    sender.session.close()
+    server.shutdown()
+
+    print(f"\nprimer ciclo {first} | segundo ciclo {second}")
+    print(f"estado de la cola {counts} | recibidos por el servidor {StandInSMTP.received}")
+    assert counts == {"sent": MESSAGES + 1, "failed": 1}
+    assert StandInSMTP.received == MESSAGES + 1
+
+
+if __name__ == "__main__":
+    main()
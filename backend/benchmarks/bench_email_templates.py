@@ -0,0 +1,78 @@
+"""
+Benchmark: renderizar y armar 100,000 correos de verificación.
+
+Compara armar cada correo desde cero (sustituir los campos sobre todo el
+HTML y construir el árbol MIME con el paquete email) contra las plantillas
+precompiladas de email_templates con las partes MIME ya codificadas de
+build_raw_message. Verifica además que el resultado se lea igual.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_email_templates
+"""
+import os
+import time
+from email import message_from_bytes, policy
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("SMTP_FROM_EMAIL", "no-reply@example.com")
+
+from app.utils.email_utils import build_message, build_raw_message
+from app.utils.email_templates import CONSTANTS, LAYOUT, SOURCES, _FIELD, render_email
+
+MESSAGES = 100_000
+LOCALES = ("es", "en")
+
+
+def recipients():
+    for i in range(MESSAGES):
+        yield f"u{i}@example.com", f"Usuaria <{i}>", f"{i % 1_000_000:06d}", LOCALES[i % 2]
+
+
+def from_scratch(to_email, user_name, code, locale):
+    """Como antes: todo el texto se vuelve a recorrer y el MIME se construye en cada envío."""
+    source = SOURCES[("verification", locale)]
+    values = {**CONSTANTS, "user_name": user_name, "verification_code": code, "lang": locale, "title": source["title"]}
+    fill = lambda text: _FIELD.sub(lambda match: values[match.group(1)], text)
+    page = _FIELD.sub(lambda match: source["html"] if match.group(1) == "content" else values[match.group(1)], LAYOUT)
+    return build_message(to_email, fill(source["subject"]), fill(page), fill(source["text"])).as_bytes()
+
+
+def precompiled(to_email, user_name, code, locale):
+    subject, html_content, text_content = render_email("verification", locale, user_name=user_name, verification_code=code)
+    return build_raw_message(to_email, subject, html_content, text_content)
+
+
+def bodies(raw: bytes):
+    message = message_from_bytes(raw, policy=policy.default)
+    return str(message["Subject"]), [part.get_content().strip() for part in message.iter_parts()]
+
+
+def main():
+    # Mismo asunto y mismos cuerpos (salvo el escape del nombre en el HTML)
+    sample = ("a@example.com", "Ana", "123456", "es")
+    old_subject, old_parts = bodies(from_scratch(*sample))
+    new_subject, new_parts = bodies(precompiled(*sample))
+    assert old_subject == new_subject and [" ".join(p.split()) for p in old_parts] == [" ".join(p.split()) for p in new_parts]
+    assert "Usuaria &lt;7&gt;" in bodies(precompiled("b@example.com", "Usuaria <7>", "000007", "en"))[1][1]
+
+    results = {}
+    for label, build in (("desde cero", from_scratch), ("precompilado", precompiled)):
+        t0 = time.perf_counter()
+        size = 0
+        for recipient in recipients():
+            size += len(build(*recipient))
+        seconds = time.perf_counter() - t0
+        results[label] = seconds
+        print(f"{label:<14} {MESSAGES} correos en {seconds:6.2f} s  ({MESSAGES / seconds:9.0f} correos/s, {size / MESSAGES / 1024:.1f} KiB c/u)")
+
+    t0 = time.perf_counter()
+    for _, user_name, code, locale in recipients():
+        render_email("verification", locale, user_name=user_name, verification_code=code)
+    print(f"{'solo render':<14} {MESSAGES} correos en {time.perf_counter() - t0:6.2f} s")
+    print(f"\nmejora: {results['desde cero'] / results['precompilado']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark: loop original de /availability/free-slots vs motor de intervalos.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_free_slots
+"""
+import random
+import time
+from datetime import datetime, timedelta, time as dtime
+from types import SimpleNamespace
+from app.utils.slot_engine import compute_free_intervals
+
+DAYS = 365
+MEETING_MINUTES = 30
+
+
+def build_data():
+    calendar = SimpleNamespace(
+        id=1, meeting_duration=MEETING_MINUTES, slot_interval=15,
+        buffer_before=5, buffer_after=5, max_per_slot=1
+    )
+    blocks = [
+        SimpleNamespace(day_of_week=day, start_time=dtime(8, 0), end_time=dtime(20, 0))
+        for day in ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+    ]
+    start = datetime(2030, 1, 1)
+    # Slots materializados equivalentes (15 min entre inicios, 30 min de duración)
+    slots = []
+    for day in range(DAYS):
+        current = start + timedelta(days=day, hours=8)
+        day_end = start + timedelta(days=day, hours=20)
+        while current + timedelta(minutes=MEETING_MINUTES) <= day_end:
+            slots.append(SimpleNamespace(start_time=current, end_time=current + timedelta(minutes=MEETING_MINUTES)))
+            current += timedelta(minutes=15)
+    rng = random.Random(42)
+    appointments = []
+    for day in range(DAYS):
+        for _ in range(8):
+            begin = start + timedelta(days=day, hours=8, minutes=15 * rng.randrange(46))
+            appointments.append(SimpleNamespace(start_time=begin, end_time=begin + timedelta(minutes=30)))
+    return calendar, blocks, slots, appointments, start, start + timedelta(days=DAYS)
+
+
+def legacy_loop(slots, meeting):
+    # Copia del loop original: no considera citas ni buffers
+    return [(s.start_time, s.end_time) for s in slots if s.end_time - s.start_time >= meeting]
+
+
+def legacy_loop_with_appointments(slots, appointments, meeting):
+    # Lo mínimo para que el loop original sea correcto: O(n * m)
+    free = []
+    for s in slots:
+        if s.end_time - s.start_time < meeting:
+            continue
+        if any(a.start_time < s.end_time and a.end_time > s.start_time for a in appointments):
+            continue
+        free.append((s.start_time, s.end_time))
+    return free
+
+
+def timed(label, fn, repeat=3):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<40} {best * 1000:10.2f} ms  ({len(result)} resultados)")
+    return best
+
+
+def main():
+    calendar, blocks, slots, appointments, range_start, range_end = build_data()
+    meeting = timedelta(minutes=MEETING_MINUTES)
+    print(f"{len(slots)} slots, {len(appointments)} citas, {DAYS} días\n")
+    timed("loop original (sin citas)", lambda: legacy_loop(slots, meeting))
+    timed("loop original + citas O(n*m)", lambda: legacy_loop_with_appointments(slots, appointments, meeting), repeat=1)
+    timed("motor de intervalos", lambda: compute_free_intervals(
+        calendar, blocks, appointments, range_start, range_end, MEETING_MINUTES
+    ))
+
+
+if __name__ == "__main__":
+    main()
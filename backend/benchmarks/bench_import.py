@@ -0,0 +1,63 @@
+"""
+Benchmark: importación de 100,000 citas desde un CSV.
+
+Genera el archivo en disco, lo importa con import_appointments sobre una
+base SQLite temporal y reporta tiempo y memoria máxima de Python
+(tracemalloc), que no debe crecer con el tamaño del archivo.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_import
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert, func, select
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.models import User, Calendar, Appointment
+from app.utils.appointment_import import import_appointments, iter_csv_rows
+
+ROWS = 100_000
+CALENDARS = 200
+BAD_EVERY = 1000  # una fila con calendario inexistente cada N
+START = datetime(2030, 1, 7, 8, 0)
+
+
+def write_csv(path):
+    with open(path, "w") as f:
+        f.write("calendar_id,user_id,start_time,end_time,description\n")
+        for i in range(ROWS):
+            calendar_id = CALENDARS + 1 if i % BAD_EVERY == 0 else i % CALENDARS + 1
+            start = START + timedelta(days=i // (CALENDARS * 16), minutes=30 * (i // CALENDARS % 16))
+            f.write(f"{calendar_id},1,{start.isoformat()},{(start + timedelta(minutes=30)).isoformat()},Consulta {i}\n")
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    csv_path = os.path.join(directory, "citas.csv")
+    write_csv(csv_path)
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'import.db')}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "first_name": "Pac", "last_name": "1", "email": "p@example.com", "hashed_password": ""}])
+        conn.execute(insert(Calendar.__table__), [{"id": i, "name": f"Doc {i}", "owner_id": 1} for i in range(1, CALENDARS + 1)])
+    db = sessionmaker(bind=engine)()
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    with open(csv_path, "rb") as f:
+        report = import_appointments(db, iter_csv_rows(f))
+    seconds = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stored = db.execute(select(func.count()).select_from(Appointment)).scalar()
+    print(f"{ROWS} filas ({os.path.getsize(csv_path) / 1e6:.1f} MB) en {seconds:.2f} s  ({ROWS / seconds:,.0f} filas/s)")
+    print(f"importadas {report['imported']}, fallidas {report['failed']}, memoria máxima {peak / 1e6:.1f} MB")
+    assert stored == report["imported"] == ROWS - ROWS // BAD_EVERY
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: latencia del catálogo de especialidades durante una ráfaga de logins.
+
+Compara el login con bcrypt en línea (endpoint `def`, ocupa el threadpool
+compartido) contra /auth/login/json, que verifica en el pool dedicado.
+Mientras dura cada ráfaga se consulta /doctor-profile/specialties y se
+reportan sus percentiles. Todo corre en proceso con httpx + ASGITransport
+sobre una base SQLite temporal.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_login_storm
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+os.environ["SLOT_SCHEDULER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"  # todas las peticiones salen de la misma IP
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'storm.db')}"
+
+import httpx
+from fastapi import Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.main import app
+from app.database import SessionLocal, get_db
+from app.models.models import User, Specialty
+from app.routers.auth import LoginRequest
+from app.utils.password_utils import hash_password, password_hasher
+from app.utils.token_utils import authenticate_user
+
+LOGINS = 200
+CLIENTS = 40  # logins simultáneos (uno por hilo del threadpool de anyio)
+USERS = 20
+CATALOG_INTERVAL_SECONDS = 0.02
+
+
+@app.post("/bench/login-inline")
+def login_inline(login_data: LoginRequest, db: Session = Depends(get_db)):
+    """El login anterior: bcrypt en el threadpool compartido."""
+    if not authenticate_user(db, login_data.email, login_data.password):
+        raise HTTPException(status_code=401)
+    return {"ok": True}
+
+
+def seed():
+    db = SessionLocal()
+    hashed = hash_password("secreto123")
+    db.add_all([User(first_name="U", last_name=str(i), email=f"u{i}@example.com", hashed_password=hashed) for i in range(USERS)])
+    db.add_all([Specialty(name=f"Especialidad {i}") for i in range(50)])
+    db.commit()
+    db.close()
+
+
+async def storm(client, path):
+    latencies = []
+    done = asyncio.Event()
+
+    async def catalog():
+        while not done.is_set():
+            t0 = time.perf_counter()
+            response = await client.get("/doctor-profile/specialties", params={"limit": 20})
+            assert response.status_code == 200
+            latencies.append((time.perf_counter() - t0) * 1000)
+            await asyncio.sleep(CATALOG_INTERVAL_SECONDS)
+
+    clients = asyncio.Semaphore(CLIENTS)
+
+    async def login(i):
+        async with clients:
+            response = await client.post(path, json={"email": f"u{i % USERS}@example.com", "password": "secreto123"})
+        assert response.status_code == 200, response.text
+
+    probe = asyncio.create_task(catalog())
+    t0 = time.perf_counter()
+    await asyncio.gather(*(login(i) for i in range(LOGINS)))
+    seconds = time.perf_counter() - t0
+    done.set()
+    await probe
+    return seconds, latencies
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main():
+    seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        baseline = []
+        for _ in range(50):
+            t0 = time.perf_counter()
+            await client.get("/doctor-profile/specialties", params={"limit": 20})
+            baseline.append((time.perf_counter() - t0) * 1000)
+        print(f"{'catálogo sin carga':<28} p50 {statistics.median(baseline):7.1f} ms  p95 {percentile(baseline, 0.95):7.1f} ms\n")
+
+        for label, path in (("bcrypt en línea", "/bench/login-inline"), ("pool dedicado", "/auth/login/json")):
+            seconds, latencies = await storm(client, path)
+            print(
+                f"{label:<28} {LOGINS} logins en {seconds:5.2f} s | catálogo "
+                f"p50 {statistics.median(latencies):7.1f} ms  p95 {percentile(latencies, 0.95):7.1f} ms  "
+                f"max {max(latencies):7.1f} ms  ({len(latencies)} consultas)"
+            )
+    print(f"\n{password_hasher.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
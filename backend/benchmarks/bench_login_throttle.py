@@ -0,0 +1,93 @@
+"""
+Benchmark: ráfaga de credential stuffing contra /auth/login/json.
+
+Una misma IP prueba contraseñas equivocadas sobre muchas cuentas. Sin
+límite cada intento cuesta un bcrypt; con los token buckets de
+rate_limit los intentos de más se rechazan con 429 antes de tocar la base
+o el hasher. Reporta duración, respuestas y verificaciones bcrypt con el
+límite apagado, en memoria y con el backend SQLite compartido, además del
+costo por consulta de cada backend.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_login_throttle
+"""
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("BCRYPT_ROUNDS", "10")
+os.environ["SLOT_SCHEDULER_ENABLED"] = "false"
+os.environ["EMAIL_OUTBOX_ENABLED"] = "false"
+directory = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'throttle.db')}"
+
+import httpx
+from app.main import app
+from app.database import SessionLocal
+from app.models.models import User
+from app.utils.password_utils import hash_password, password_hasher
+from app.utils.rate_limit import login_limiter, MemoryRateLimitBackend, SqliteRateLimitBackend
+
+ATTEMPTS = 300
+ACCOUNTS = 100
+CONCURRENCY = 20
+CHECKS = 20_000
+
+
+def seed():
+    db = SessionLocal()
+    hashed = hash_password("secreto123")
+    db.add_all([User(first_name="U", last_name=str(i), email=f"u{i}@example.com", hashed_password=hashed) for i in range(ACCOUNTS)])
+    db.commit()
+    db.close()
+
+
+async def burst(client):
+    limit = asyncio.Semaphore(CONCURRENCY)
+
+    async def attempt(i):
+        async with limit:
+            response = await client.post("/auth/login/json", json={"email": f"u{i % ACCOUNTS}@example.com", "password": f"mala{i}"})
+        return response.status_code
+
+    before = password_hasher.stats()["completed"]
+    t0 = time.perf_counter()
+    codes = Counter(await asyncio.gather(*(attempt(i) for i in range(ATTEMPTS))))
+    return time.perf_counter() - t0, dict(codes), password_hasher.stats()["completed"] - before
+
+
+def check_cost(backend):
+    t0 = time.perf_counter()
+    now = time.time()
+    for i in range(CHECKS):
+        backend.take(f"login:ip:10.0.{i % 250}.{i % 7}", 20, 1 / 3, now)
+    return (time.perf_counter() - t0) / CHECKS * 1e6
+
+
+async def main():
+    seed()
+    transport = httpx.ASGITransport(app=app)
+    scenarios = (
+        ("sin límite", False, MemoryRateLimitBackend()),
+        ("buckets en memoria", True, MemoryRateLimitBackend()),
+        ("buckets en SQLite", True, SqliteRateLimitBackend(os.path.join(directory, "rate_limits.db"))),
+    )
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for label, enabled, backend in scenarios:
+            login_limiter.enabled = enabled
+            login_limiter.backend = backend
+            seconds, codes, hashes = await burst(client)
+            print(f"{label:<20} {ATTEMPTS} intentos en {seconds:6.2f} s | respuestas {codes} | bcrypt {hashes}")
+
+    print()
+    for label, backend in (("memoria", MemoryRateLimitBackend()), ("SQLite", SqliteRateLimitBackend(os.path.join(directory, "cost.db")))):
+        print(f"costo por consulta ({label}): {check_cost(backend):6.1f} µs")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,89 @@
+"""
+Benchmark: renovar la sesión con /auth/refresh contra volver a hacer login.
+
+Antes, al vencer el access token el cliente volvía a /auth/login/json
+(bcrypt con el costo de producción). Mide la latencia de ambos caminos en
+proceso (httpx + ASGITransport, SQLite temporal), encadenando las
+rotaciones como haría un cliente real.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_refresh
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ["SLOT_SCHEDULER_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"  # todas las peticiones salen de la misma IP
+os.environ["EMAIL_OUTBOX_ENABLED"] = "false"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'refresh.db')}"
+
+import httpx
+from app.main import app
+from app.config import BCRYPT_ROUNDS
+from app.database import SessionLocal
+from app.models.models import User
+from app.utils.password_utils import hash_password
+from app.utils.refresh_tokens import refresh_stats
+
+LOGINS = 30
+REFRESHES = 1000
+CREDENTIALS = {"email": "u@example.com", "password": "secreto123"}
+
+
+def seed():
+    db = SessionLocal()
+    db.add(User(first_name="U", last_name="B", email=CREDENTIALS["email"], hashed_password=hash_password(CREDENTIALS["password"]), is_verified=True))
+    db.commit()
+    db.close()
+
+
+def report(label, latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{label:<22} n={len(latencies):<5} p50 {statistics.median(latencies):8.2f} ms  p95 {p95:8.2f} ms  ({1000 / statistics.mean(latencies):7.1f} por segundo)")
+    return statistics.median(latencies)
+
+
+async def main():
+    seed()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        login_latencies = []
+        for _ in range(LOGINS):
+            t0 = time.perf_counter()
+            response = await client.post("/auth/login/json", json=CREDENTIALS)
+            login_latencies.append((time.perf_counter() - t0) * 1000)
+            assert response.status_code == 200, response.text
+        refresh_token = rotated = response.json()["refresh_token"]
+
+        refresh_latencies = []
+        for _ in range(REFRESHES):
+            t0 = time.perf_counter()
+            response = await client.post("/auth/refresh", json={"refresh_token": refresh_token})
+            refresh_latencies.append((time.perf_counter() - t0) * 1000)
+            assert response.status_code == 200, response.text
+            refresh_token = response.json()["refresh_token"]
+
+        # El primer reuso de un token rotado revoca su familia; los siguientes se rechazan en memoria
+        replay_latencies = []
+        for _ in range(REFRESHES):
+            t0 = time.perf_counter()
+            response = await client.post("/auth/refresh", json={"refresh_token": rotated})
+            replay_latencies.append((time.perf_counter() - t0) * 1000)
+            assert response.status_code == 401
+
+    print(f"bcrypt rounds={BCRYPT_ROUNDS}\n")
+    login = report("login/json", login_latencies)
+    refresh = report("refresh (rotación)", refresh_latencies)
+    report("refresh revocado", replay_latencies)
+    print(f"\nrefresh es {login / refresh:.0f}x más barato que el login | {refresh_stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
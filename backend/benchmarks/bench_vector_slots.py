@@ -0,0 +1,117 @@
+"""
+Benchmark: slots deseados por calendario, tal como los arma el mantenimiento nocturno.
+
+Mide el camino completo hasta el conjunto que recibe el diff de
+slot_generator (sin la base de datos, que cuesta igual en todos los casos),
+por lotes de BATCH_SIZE calendarios (el SLOT_SCHEDULER_BATCH_SIZE por
+defecto) como maintain_batch:
+
+- loop: iter_rule_slots por calendario (lo que hace generate_slots_for_calendar
+  sin `desired`)
+- NumPy con datetime: la versión anterior, que generaba siempre el
+  horizonte completo y lo convertía con astype(object) a datetime de Python
+- NumPy con minutos: generate_slot_arrays desde el primer día que falta +
+  split_by_calendar + minute_pairs, sin salir de enteros
+
+Se mide el horizonte completo (calendario nuevo) y el caso normal de cada
+noche, en que solo falta el último día.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_vector_slots
+"""
+import time
+from datetime import date, time as dtime, timedelta
+from types import SimpleNamespace
+from app.utils.slot_engine import iter_rule_slots
+from app.utils.slot_generator import SLOT_HORIZON_DAYS, to_minutes
+from app.utils.vector_slots import generate_slot_arrays, split_by_calendar, minute_pairs, _calendar_ranges
+
+CALENDARS = 1000
+BATCH_SIZE = 100
+ROUNDS = 5
+TODAY = date(2030, 1, 1)
+
+
+def build_data():
+    calendars = [
+        SimpleNamespace(id=i, meeting_duration=30, slot_interval=30)
+        for i in range(1, CALENDARS + 1)
+    ]
+    blocks = []
+    for calendar in calendars:
+        for day in ("mon", "tue", "wed", "thu", "fri"):
+            blocks.append(SimpleNamespace(calendar_id=calendar.id, day_of_week=day, start_time=dtime(9, 0), end_time=dtime(13, 0)))
+            blocks.append(SimpleNamespace(calendar_id=calendar.id, day_of_week=day, start_time=dtime(15, 0), end_time=dtime(19, 0)))
+        blocks.append(SimpleNamespace(calendar_id=calendar.id, day_of_week="sat", start_time=dtime(10, 0), end_time=dtime(14, 0)))
+    blocks_by_calendar = {}
+    for block in blocks:
+        blocks_by_calendar.setdefault(block.calendar_id, []).append(block)
+    return calendars, blocks_by_calendar
+
+
+def batches(calendars, blocks_by_calendar):
+    for i in range(0, len(calendars), BATCH_SIZE):
+        batch = calendars[i:i + BATCH_SIZE]
+        yield batch, [block for calendar in batch for block in blocks_by_calendar[calendar.id]]
+
+
+def loop_path(calendars, blocks_by_calendar, since):
+    horizon_end = TODAY + timedelta(days=SLOT_HORIZON_DAYS - 1)
+    return [
+        {(to_minutes(start), to_minutes(end)) for start, end in iter_rule_slots(calendar, blocks_by_calendar[calendar.id], since, horizon_end)}
+        for calendar in calendars
+    ]
+
+
+def numpy_datetime_path(calendars, blocks_by_calendar, since):
+    # Antes: siempre el horizonte completo, y el filtro por día sobre los datetime
+    result = []
+    for batch, blocks in batches(calendars, blocks_by_calendar):
+        arrays = generate_slot_arrays(batch, blocks, TODAY, SLOT_HORIZON_DAYS)
+        starts = arrays["start_time"].astype("datetime64[us]").astype(object)
+        ends = arrays["end_time"].astype("datetime64[us]").astype(object)
+        for _, lo, hi in _calendar_ranges(arrays["calendar_id"]):
+            result.append({slot for slot in zip(starts[lo:hi], ends[lo:hi]) if slot[0].date() >= since})
+    return result
+
+
+def numpy_minutes_path(calendars, blocks_by_calendar, since):
+    # Como maintain_batch: desde el primer día que falta en el lote
+    days = SLOT_HORIZON_DAYS - (since - TODAY).days
+    result = []
+    for batch, blocks in batches(calendars, blocks_by_calendar):
+        for starts, ends in split_by_calendar(generate_slot_arrays(batch, blocks, since, days)).values():
+            result.append(minute_pairs(starts, ends, since=since))
+    return result
+
+
+def best_ms(fn, *args):
+    best = float("inf")
+    for _ in range(ROUNDS):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, result
+
+
+def main():
+    calendars, blocks_by_calendar = build_data()
+    cases = (
+        ("horizonte completo", TODAY),
+        ("noche normal (1 día)", TODAY + timedelta(days=SLOT_HORIZON_DAYS - 1)),
+    )
+    print(f"{CALENDARS} calendarios, horizonte de {SLOT_HORIZON_DAYS} días, lotes de {BATCH_SIZE} (mejor de {ROUNDS})\n")
+    for label, since in cases:
+        loop_ms, expected = best_ms(loop_path, calendars, blocks_by_calendar, since)
+        datetime_ms, as_datetimes = best_ms(numpy_datetime_path, calendars, blocks_by_calendar, since)
+        minutes_ms, as_minutes = best_ms(numpy_minutes_path, calendars, blocks_by_calendar, since)
+        assert as_minutes == expected
+        assert [len(slots) for slots in as_datetimes] == [len(slots) for slots in expected]
+        print(f"{label} ({sum(map(len, expected))} slots)")
+        print(f"  {'loop Python':<24} {loop_ms:9.1f} ms")
+        print(f"  {'NumPy -> datetime':<24} {datetime_ms:9.1f} ms  (x{loop_ms / datetime_ms:.2f})")
+        print(f"  {'NumPy -> minutos':<24} {minutes_ms:9.1f} ms  (x{loop_ms / minutes_ms:.2f})\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Muestra el plan de ejecución de las consultas más frecuentes.
+
+Sirve para comprobar que los índices de app/migrations.py se usan.
+Uso (desde backend/):
+    python explain_queries.py
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import select, func, text
+from app.database import engine
+from app.models.models import AvailabilitySlot, AvailabilityBlock, Appointment
+
+START = datetime(2030, 1, 1)
+END = START + timedelta(days=7)
+
+HOT_QUERIES = {
+    "slots libres de un calendario en rango": select(AvailabilitySlot).where(
+        AvailabilitySlot.calendar_id == 1,
+        AvailabilitySlot.start_time >= START,
+        AvailabilitySlot.end_time <= END,
+        AvailabilitySlot.is_booked == False
+    ).order_by(AvailabilitySlot.start_time),
+    "slots de un calendario (listado)": select(AvailabilitySlot).where(
+        AvailabilitySlot.calendar_id == 1
+    ).order_by(AvailabilitySlot.start_time, AvailabilitySlot.id),
+    "último slot materializado por calendario": select(
+        AvailabilitySlot.calendar_id, func.max(AvailabilitySlot.start_time)
+    ).where(AvailabilitySlot.calendar_id.in_([1, 2, 3])).group_by(AvailabilitySlot.calendar_id),
+    "bloques de un calendario": select(AvailabilityBlock).where(AvailabilityBlock.calendar_id == 1),
+    "citas de un calendario que traslapan un rango": select(Appointment).where(
+        Appointment.calendar_id == 1,
+        Appointment.start_time < END,
+        Appointment.end_time > START
+    ),
+    "citas de un usuario por fecha": select(Appointment).where(
+        Appointment.user_id == 1,
+        Appointment.start_time >= START
+    ).order_by(Appointment.start_time),
+    "estado del feed .ics (max updated_at)": select(
+        func.max(Appointment.updated_at), func.count()
+    ).where(Appointment.calendar_id == 1),
+}
+
+
+def explain(conn, statement):
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    if engine.dialect.name == "sqlite":
+        rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+        return [row[-1] for row in rows]
+    rows = conn.execute(text(f"EXPLAIN {sql}")).all()
+    return [row[0] for row in rows]
+
+
+if __name__ == "__main__":
+    with engine.connect() as conn:
+        for name, statement in HOT_QUERIES.items():
+            print(f"== {name}")
+            for line in explain(conn, statement):
+                print(f"   {line}")
+            print()
@@ -0,0 +1,41 @@
+"""
+Configuración común de las pruebas.
+
+La configuración de la app se lee al importar los módulos, así que las
+variables de entorno se fijan aquí, antes de importar `app`. Cada corrida
+usa una base SQLite temporal; nunca toca calendario.db.
+"""
+import os
+import tempfile
+
+_directory = tempfile.mkdtemp(prefix="vitalis-tests-")
+os.environ["SECRET_KEY"] = "pruebas"
+os.environ["ALGORITHM"] = "HS256"
+os.environ["ACCESS_TOKEN_EXPIRE_MINUTES"] = "30"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directory, 'pruebas.db')}"
+os.environ["SLOT_SCHEDULER_ENABLED"] = "false"
+os.environ["EMAIL_OUTBOX_ENABLED"] = "false"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
+os.environ["SMTP_FROM_EMAIL"] = "no-reply@example.com"
+os.environ["SMTP_STARTTLS"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,82 @@
+"""
+Servidor SMTP mínimo en proceso para las pruebas de la cola de correos.
+
+Entiende lo que usa smtplib (EHLO, AUTH PLAIN, MAIL, RCPT, DATA, RSET,
+NOOP, QUIT) y decide la respuesta a RCPT por el prefijo del destinatario:
+"rechazado" -> 550, "ocupado" -> 451, "corte" -> cierra la conexión.
+"""
+import base64
+import socketserver
+import threading
+
+
+class StandInSMTP(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250-stand-in\r\n250-AUTH PLAIN\r\n250 8BITMIME")
+            elif verb == "AUTH":
+                _, _, password = base64.b64decode(command.split()[2]).decode().split("\0")
+                self.reply("235 2.7.0 OK" if password == server.password else "535 5.7.8 credenciales inválidas")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip("<> ")
+                if address.startswith("corte"):
+                    with server.lock:
+                        cut = server.cuts_left > 0
+                        server.cuts_left -= 1
+                    if cut:
+                        return
+                    self.reply("250 OK")
+                elif address.startswith("rechazado"):
+                    self.reply("550 5.1.1 buzón inexistente")
+                elif address.startswith("ocupado"):
+                    self.reply("451 4.3.0 intente más tarde")
+                else:
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 fin con <CRLF>.<CRLF>")
+                lines = []
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b""):
+                        break
+                    lines.append(data)
+                with server.lock:
+                    server.messages.append(b"".join(lines))
+                self.reply("250 OK en cola")
+            elif verb == "QUIT":
+                self.reply("221 adiós")
+                return
+            else:
+                self.reply("250 OK")
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, password: str = "secreto", cuts: int = 0):
+        super().__init__(("127.0.0.1", 0), StandInSMTP)
+        self.password = password
+        self.cuts_left = cuts
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,76 @@
+"""
+Reservas concurrentes sobre el mismo horario: exactamente una gana.
+
+Cientos de hilos, cada uno con su propia sesión, contra una base SQLite
+en archivo propio, tanto con el slot materializado en availability_slots
+como con el slot calculado al vuelo.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert, func, select
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models.models import User, Calendar, AvailabilitySlot, Appointment
+from app.utils.booking import book_appointment
+
+WORKERS = 32
+CONTENDERS = 300
+START = datetime(2030, 1, 7, 9)
+MATERIALIZED, COMPUTED = 1, 2
+
+
+@pytest.fixture
+def Session(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'booking.db'}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [{"id": 1, "first_name": "Pac", "last_name": "1", "email": "p@example.com", "hashed_password": ""}])
+        conn.execute(insert(Calendar.__table__), [
+            {"id": MATERIALIZED, "name": "Materializado", "owner_id": 1, "meeting_duration": 30, "slot_interval": 30},
+            {"id": COMPUTED, "name": "Calculado", "owner_id": 1, "meeting_duration": 30, "slot_interval": 30},
+        ])
+        conn.execute(insert(AvailabilitySlot.__table__), [
+            {"calendar_id": MATERIALIZED, "start_time": START, "end_time": START + timedelta(minutes=30), "is_booked": False}
+        ])
+    yield sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    engine.dispose()
+
+
+def _attempt(Session, calendar_id):
+    db = Session()
+    try:
+        book_appointment(db, db.get(Calendar, calendar_id), 1, START, START + timedelta(minutes=30))
+        return 201
+    except HTTPException as exc:
+        return exc.status_code
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("calendar_id", [MATERIALIZED, COMPUTED], ids=["materializado", "calculado"])
+def test_exactly_one_booking_wins_the_slot(Session, calendar_id):
+    barrier = threading.Barrier(WORKERS)
+
+    def contender(_):
+        try:
+            barrier.wait(timeout=1)
+        except threading.BrokenBarrierError:
+            pass
+        return _attempt(Session, calendar_id)
+
+    with ThreadPoolExecutor(WORKERS) as pool:
+        results = list(pool.map(contender, range(CONTENDERS)))
+
+    assert results.count(201) == 1
+    assert results.count(409) == CONTENDERS - 1
+    db = Session()
+    try:
+        booked = db.execute(
+            select(func.count()).select_from(Appointment.__table__).where(Appointment.calendar_id == calendar_id)
+        ).scalar()
+    finally:
+        db.close()
+    assert booked == 1
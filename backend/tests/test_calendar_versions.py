@@ -0,0 +1,64 @@
+"""
+Versiones de calendario compartidas entre workers (AVAILABILITY_VERSIONS_BACKEND=sql).
+
+Dos instancias de SqlCalendarVersions sobre la misma base hacen de dos
+workers: lo que avanza una lo ve la otra.
+"""
+from datetime import datetime, timedelta
+import pytest
+from app.database import engine
+from app.models.models import Calendar, User
+from app.routers import public_calendar
+from app.utils.availability_cache import AvailabilityCache, SqlCalendarVersions
+
+
+@pytest.fixture
+def calendar(db):
+    owner = User(first_name="Dra", last_name="Versiones", email=f"versiones-{datetime.utcnow().timestamp()}@example.com", hashed_password="")
+    db.add(owner)
+    db.flush()
+    calendar = Calendar(name="Versiones", owner_id=owner.id, meeting_duration=30, slot_interval=30)
+    db.add(calendar)
+    db.commit()
+    return calendar
+
+
+def test_versions_are_shared_and_missing_calendars_have_none(db, calendar):
+    worker_a, worker_b = SqlCalendarVersions(engine), SqlCalendarVersions(engine)
+    assert worker_a.get(calendar.id) == worker_b.get(calendar.id) == 0
+
+    worker_a.bump(calendar.id)
+    assert worker_b.get(calendar.id) == 1
+
+    with engine.begin() as conn:
+        worker_b.bump(calendar.id, conn=conn)
+    assert worker_a.get(calendar.id) == 2
+
+    db.delete(calendar)
+    db.commit()
+    assert worker_a.get(calendar.id) is None
+
+
+def test_public_slots_use_the_shared_version(client, db, calendar, monkeypatch):
+    worker_a, worker_b = SqlCalendarVersions(engine), SqlCalendarVersions(engine)
+    monkeypatch.setattr(public_calendar, "calendar_versions", worker_a)
+    monkeypatch.setattr(public_calendar, "availability_cache", AvailabilityCache(worker_a))
+    url = f"/calendars/{calendar.id}/available-slots"
+    day = datetime(2030, 1, 7)
+    params = {"start_date": day.isoformat(), "end_date": (day + timedelta(days=1)).isoformat()}
+
+    first = client.get(url, params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get(url, params=params, headers={"If-None-Match": etag}).status_code == 304
+
+    # Otro worker cambia el calendario: este deja de responder 304
+    worker_b.bump(calendar.id)
+    changed = client.get(url, params=params, headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+
+    # Calendario borrado (en cualquier worker): 404 aunque el cliente traiga el ETag
+    db.delete(calendar)
+    db.commit()
+    gone = client.get(url, params=params, headers={"If-None-Match": changed.headers["etag"]})
+    assert gone.status_code == 404
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+import pytest
+from app.models.models import EmailOutbox
+from app.utils.email_utils import SmtpSession
+from app.utils.email_outbox import OutboxSender, claim_batch, enqueue_email
+from .smtp_stand_in import StandInServer
+
+
+@pytest.fixture
+def outbox(db):
+    db.query(EmailOutbox).delete()
+    db.commit()
+    return db
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.stop()
+
+
+def _sender(server, password="secreto", batch_size=100):
+    host, port = server.server_address
+    session = SmtpSession(host=host, port=port, username="cola", password=password, starttls=False)
+    return OutboxSender(batch_size=batch_size, session=session)
+
+
+def _enqueue(db, *addresses):
+    for address in addresses:
+        enqueue_email(db, address, "Asunto", "<p>Hola</p>", "Hola")
+    db.commit()
+
+
+def _rows(db):
+    db.expire_all()
+    return {row.to_email: row for row in db.query(EmailOutbox).all()}
+
+
+def test_batch_goes_out_over_one_connection(outbox, server):
+    _enqueue(outbox, *(f"u{i}@example.com" for i in range(20)))
+    sender = _sender(server)
+    assert sender.drain()["sent"] == 20
+    assert server.connections == 1 and len(server.messages) == 20
+    assert all(row.status == "sent" and row.lease_token is None for row in _rows(outbox).values())
+
+
+def test_permanent_rejection_is_failed_and_temporary_is_retried(outbox, server):
+    _enqueue(outbox, "a@example.com", "rechazado@example.com", "ocupado@example.com", "b@example.com")
+    stats = _sender(server).drain()
+    assert stats == {"sent": 2, "retried": 1, "failed": 1}
+
+    rows = _rows(outbox)
+    assert rows["rechazado@example.com"].status == "failed"
+    busy = rows["ocupado@example.com"]
+    assert busy.status == "pending" and busy.attempts == 1 and "451" in busy.last_error
+    assert busy.next_attempt_at > datetime.utcnow()
+
+
+def test_single_disconnect_reconnects_transparently(outbox):
+    server = StandInServer(cuts=1)
+    try:
+        _enqueue(outbox, "a@example.com", "corte@example.com", "b@example.com")
+        assert _sender(server).drain()["sent"] == 3
+        assert server.connections == 2
+    finally:
+        server.stop()
+
+
+def test_server_dropping_mid_batch_retries_the_rest(outbox):
+    server = StandInServer(cuts=10)
+    try:
+        _enqueue(outbox, "a@example.com", "corte@example.com", "b@example.com")
+        stats = _sender(server).drain()
+        assert stats == {"sent": 1, "retried": 2, "failed": 0}
+        rows = _rows(outbox)
+        assert rows["a@example.com"].status == "sent"
+        assert {rows["corte@example.com"].status, rows["b@example.com"].status} == {"pending"}
+    finally:
+        server.stop()
+
+
+def test_authentication_failure_retries_whole_batch(outbox, server):
+    _enqueue(outbox, "a@example.com", "b@example.com", "c@example.com")
+    stats = _sender(server, password="rotada").drain()
+    assert stats == {"sent": 0, "retried": 3, "failed": 0}
+    # Un solo intento de login: el resto del lote no vuelve a conectarse
+    assert server.connections == 1
+    assert all(row.status == "pending" and "535" in row.last_error for row in _rows(outbox).values())
+
+
+def test_claim_left_by_a_crashed_sender_returns_after_the_lease(outbox, server):
+    _enqueue(outbox, "a@example.com", "b@example.com")
+    claimed = claim_batch(10)  # el proceso muere sin registrar el resultado
+    assert len(claimed) == 2
+    assert claim_batch(10) == []
+
+    # Vence el lease
+    outbox.query(EmailOutbox).update({EmailOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    outbox.commit()
+    reclaimed = claim_batch(10)
+    assert {row.id for row in reclaimed} == {row.id for row in claimed}
+    assert {row.attempts for row in reclaimed} == {2}
+
+    outbox.query(EmailOutbox).update({EmailOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1)})
+    outbox.commit()
+    assert _sender(server).drain()["sent"] == 2
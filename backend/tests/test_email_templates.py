@@ -0,0 +1,41 @@
+import email
+import pytest
+from app.utils.email_utils import build_raw_message
+from app.utils.email_templates import DEFAULT_EMAIL_LOCALE, negotiate_locale, verification_email_content
+
+
+def test_long_subject_folds_with_crlf():
+    subject = "Confirmación de tu cita médica en la clínica — " * 4
+    raw = build_raw_message("ana@example.com", subject, "<p>Hola</p>", "Hola")
+    headers = raw.split(b"\r\n\r\n", 1)[0]
+    assert b"\n" not in headers.replace(b"\r\n", b"")
+    assert headers.count(b"\r\n ") >= 1  # plegado en varias líneas
+
+    parsed = email.message_from_bytes(raw)
+    decoded = "".join(
+        part.decode(charset) if isinstance(part, bytes) else part
+        for part, charset in email.header.decode_header(parsed["Subject"])
+    )
+    assert decoded == subject
+
+
+def test_raw_message_parses_as_multipart_alternative():
+    subject, html, text = verification_email_content("123456", "Ana")
+    parsed = email.message_from_bytes(build_raw_message("ana@example.com", subject, html, text))
+    assert parsed.get_content_type() == "multipart/alternative"
+    plain, rich = parsed.get_payload()
+    assert "123456" in plain.get_payload(decode=True).decode()
+    assert "123456" in rich.get_payload(decode=True).decode()
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, DEFAULT_EMAIL_LOCALE),
+    ("en-US,en;q=0.9", "en"),
+    ("fr-FR, es;q=0.8, en;q=0.9", "en"),
+    ("es;q=0, en;q=0.1", "en"),
+    ("en;q=0.5, es;q=0.5", "en"),
+    ("en;q=0, fr", DEFAULT_EMAIL_LOCALE),
+    ("en;q=abc, es;q=0.2", "es"),
+])
+def test_negotiate_locale_honours_q_values(header, expected):
+    assert negotiate_locale(header) == expected
@@ -0,0 +1,168 @@
+"""
+Verificación local de ID tokens de Google con una llave RSA generada aquí
+y un JWKS en archivo (o servido por una sesión HTTP falsa), sin red.
+"""
+import json
+import os
+import time
+import pytest
+import rsa
+from fastapi import HTTPException
+from jose import jwk, jwt
+from app.utils import google_tokens
+from app.utils.google_tokens import JWKSCache, verify_google_id_token
+
+CLIENT_ID = "cliente-web.apps.googleusercontent.com"
+
+
+def _keypair(kid):
+    public, private = rsa.newkeys(2048)
+    public_jwk = {**jwk.construct(public.save_pkcs1().decode(), "RS256").to_dict(), "kid": kid, "use": "sig"}
+    return public_jwk, private.save_pkcs1().decode()
+
+
+@pytest.fixture(scope="module")
+def keys():
+    return {kid: _keypair(kid) for kid in ("llave-1", "llave-2")}
+
+
+def _write_jwks(path, public_keys, mtime):
+    path.write_text(json.dumps({"keys": public_keys}))
+    # mtime explícito: dos escrituras seguidas pueden caer en el mismo tick del reloj
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def jwks_file(tmp_path, keys, monkeypatch):
+    path = tmp_path / "jwks.json"
+    _write_jwks(path, [keys["llave-1"][0]], 1_000_000)
+    cache = JWKSCache(path=str(path))
+    monkeypatch.setattr(google_tokens, "google_jwks", cache)
+    return path, cache
+
+
+def _token(keys, kid="llave-1", **overrides):
+    now = int(time.time())
+    claims = {
+        "iss": "https://accounts.google.com",
+        "aud": CLIENT_ID,
+        "sub": "10769150350006150715113082367",
+        "email": "ana@example.com",
+        "email_verified": True,
+        "given_name": "Ana",
+        "family_name": "Pérez",
+        "iat": now,
+        "exp": now + 3600,
+        **overrides,
+    }
+    return jwt.encode(claims, keys[kid][1], algorithm="RS256", headers={"kid": kid})
+
+
+def _rejected(token):
+    with pytest.raises(HTTPException) as exc:
+        verify_google_id_token(token, [CLIENT_ID])
+    return exc.value.status_code
+
+
+def test_valid_token_returns_claims(jwks_file, keys):
+    claims = verify_google_id_token(_token(keys), ["otro-cliente", CLIENT_ID])
+    assert claims["email"] == "ana@example.com"
+    assert jwks_file[1].fetches == 1
+
+
+def test_wrong_audience_is_rejected(jwks_file, keys):
+    assert _rejected(_token(keys, aud="cliente-ajeno.apps.googleusercontent.com")) == 400
+
+
+def test_wrong_issuer_is_rejected(jwks_file, keys):
+    assert _rejected(_token(keys, iss="https://accounts.example.com")) == 400
+
+
+def test_expired_token_is_rejected(jwks_file, keys):
+    now = int(time.time())
+    assert _rejected(_token(keys, iat=now - 7200, exp=now - 3600)) == 400
+
+
+def test_signature_from_another_key_is_rejected(jwks_file, keys):
+    token = jwt.encode({"aud": CLIENT_ID}, keys["llave-2"][1], algorithm="RS256", headers={"kid": "llave-1"})
+    assert _rejected(token) == 400
+
+
+def test_no_client_id_configured_is_unavailable(jwks_file, keys):
+    with pytest.raises(HTTPException) as exc:
+        verify_google_id_token(_token(keys), [])
+    assert exc.value.status_code == 503
+
+
+def test_unknown_kid_reloads_the_keys(jwks_file, keys):
+    path, cache = jwks_file
+    assert _rejected(_token(keys, kid="llave-2")) == 400
+    assert cache.stats()["unknown_kids"] == 1
+
+    # Google rota las llaves: el kid nuevo se publica y la siguiente verificación lo encuentra
+    _write_jwks(path, [keys["llave-1"][0], keys["llave-2"][0]], 2_000_000)
+    assert verify_google_id_token(_token(keys, kid="llave-2"), [CLIENT_ID])["aud"] == CLIENT_ID
+    assert cache.fetches == 2
+
+
+class _Response:
+    def __init__(self, keys, cache_control):
+        self._keys = keys
+        self.headers = {"cache-control": cache_control} if cache_control else {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"keys": self._keys}
+
+
+class _Session:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, timeout):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def _network_cache(*responses):
+    cache = JWKSCache(url="https://jwks.invalid/certs", path=None)
+    cache._session = _Session(responses)
+    return cache
+
+
+@pytest.mark.parametrize("cache_control, max_age", [
+    ("public, max-age=21917, must-revalidate, no-transform", 21917),
+    ("max-age=60", 60),
+    (None, google_tokens.GOOGLE_JWKS_DEFAULT_MAX_AGE),
+])
+def test_max_age_from_cache_control(keys, cache_control, max_age):
+    cache = _network_cache(_Response([keys["llave-1"][0]], cache_control))
+    before = time.monotonic()
+    assert cache.refresh()
+    assert before + max_age <= cache._expires_at <= time.monotonic() + max_age
+
+
+def test_unknown_kid_refetch_is_rate_limited(keys):
+    cache = _network_cache(
+        _Response([keys["llave-1"][0]], "max-age=3600"),
+        _Response([keys["llave-1"][0], keys["llave-2"][0]], "max-age=3600"),
+    )
+    assert cache.get("llave-1") is not None
+    # Kid desconocido enseguida: no se vuelve a descargar antes de JWKS_MIN_REFETCH_SECONDS
+    assert cache.get("llave-2") is None and cache._session.calls == 1
+
+    cache._last_fetch -= google_tokens.JWKS_MIN_REFETCH_SECONDS
+    assert cache.get("llave-2") is not None and cache._session.calls == 2
+
+
+def test_google_login_requires_verified_email(client, jwks_file, keys, monkeypatch):
+    monkeypatch.setattr(google_tokens, "GOOGLE_CLIENT_IDS", [CLIENT_ID])
+    response = client.post("/auth/google", json={"id_token": _token(keys, email="sinverificar@example.com", email_verified=False)})
+    assert response.status_code == 400
+
+    response = client.post("/auth/google", json={"id_token": _token(keys, email="google@example.com")})
+    assert response.status_code == 200, response.text
+    assert response.json()["access_token"]
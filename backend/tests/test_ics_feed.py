@@ -0,0 +1,34 @@
+"""
+Escapado de textos en el feed iCalendar.
+
+Las descripciones importadas por CSV/ICS pueden traer saltos CRLF o CR
+sueltos; en el feed solo puede haber CRLF como fin de línea de contenido.
+"""
+from datetime import datetime
+from app.models.models import Appointment, Calendar, User
+from app.utils.ics_feed import _escape, iter_feed
+
+
+def test_escape_normalizes_carriage_returns():
+    assert _escape("a\r\nb\rc\nd") == "a\\nb\\nc\\nd"
+    assert _escape("sala 2; piso 3, ala\\B") == "sala 2\\; piso 3\\, ala\\\\B"
+
+
+def test_feed_has_no_bare_carriage_returns(db):
+    owner = User(first_name="Dra", last_name="Feed", email=f"feed-{datetime.utcnow().timestamp()}@example.com", hashed_password="")
+    db.add(owner)
+    db.flush()
+    calendar = Calendar(name="Feed\r\nCR", owner_id=owner.id, meeting_duration=30, slot_interval=30)
+    db.add(calendar)
+    db.flush()
+    db.add(Appointment(
+        calendar_id=calendar.id, user_id=owner.id, start_time=datetime(2030, 1, 7, 9, 0),
+        end_time=datetime(2030, 1, 7, 9, 30), description="Control\r\nayuno\rtraer estudios",
+    ))
+    db.commit()
+
+    feed = "".join(iter_feed(calendar.id, calendar.name))
+
+    assert "\r" not in feed.replace("\r\n", "")
+    assert "X-WR-CALNAME:Feed\\nCR\r\n" in feed
+    assert "SUMMARY:Control\\nayuno\\ntraer estudios\r\n" in feed
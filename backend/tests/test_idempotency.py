@@ -0,0 +1,54 @@
+from datetime import datetime
+from pydantic import BaseModel
+from starlette.requests import Request
+from app.utils import rate_limit
+from app.utils.idempotency import request_owner, run_idempotent
+from app.utils.token_utils import create_access_token
+
+
+class _Out(BaseModel):
+    calls: int
+
+
+def _request(headers=(), peer="10.0.0.2"):
+    return Request({"type": "http", "headers": [(k.encode(), v.encode()) for k, v in headers], "client": (peer, 5000)})
+
+
+def test_owner_is_the_token_user_or_the_client_address():
+    token = create_access_token(data={"sub": "ana@example.com"})
+    assert request_owner(_request([("authorization", f"Bearer {token}")])) == "user:ana@example.com"
+    assert request_owner(_request([("authorization", "Bearer basura")])) == "ip:10.0.0.2"
+    assert request_owner(_request()) == "ip:10.0.0.2"
+
+
+def test_same_key_from_different_owners_runs_separately():
+    calls = []
+
+    def handler():
+        calls.append(1)
+        return {"calls": len(calls)}
+
+    key = f"clave-{datetime.utcnow().timestamp()}"
+    first = run_idempotent(key, "POST /prueba", "user:ana@example.com", {"x": 1}, _Out, handler)
+    replay = run_idempotent(key, "POST /prueba", "user:ana@example.com", {"x": 1}, _Out, handler)
+    other = run_idempotent(key, "POST /prueba", "user:beto@example.com", {"x": 2}, _Out, handler)
+
+    assert first == {"calls": 1}
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert other == {"calls": 2}
+
+
+def test_anonymous_register_is_keyed_by_client_address(client, monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_FORWARDED", True)
+    key = f"registro-{datetime.utcnow().timestamp()}"
+    body = {"first_name": "Ana", "last_name": "Idem", "email": f"{key}@example.com", "password": "secreto123"}
+
+    first = client.post("/auth/register", json=body, headers={"Idempotency-Key": key, "X-Forwarded-For": "203.0.113.7"})
+    assert first.status_code == 200, first.text
+    replay = client.post("/auth/register", json=body, headers={"Idempotency-Key": key, "X-Forwarded-For": "203.0.113.7"})
+    assert replay.headers.get("idempotent-replayed") == "true"
+
+    # Otro cliente con la misma clave no recibe la respuesta guardada del primero
+    other = client.post("/auth/register", json=body, headers={"Idempotency-Key": key, "X-Forwarded-For": "198.51.100.9"})
+    assert "idempotent-replayed" not in other.headers
+    assert other.status_code == 400
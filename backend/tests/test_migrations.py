@@ -0,0 +1,87 @@
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, select, text
+from app.database import Base
+from app.models.models import AvailabilitySlot
+from app.migrations import MIGRATIONS, run_migrations, schema_version
+
+slots = AvailabilitySlot.__table__
+
+# Esquema anterior a las migraciones: sin índices compuestos, appointments.updated_at ni calendars.availability_version
+_LEGACY_SCHEMA = [
+    "CREATE TABLE calendars (id INTEGER PRIMARY KEY, name VARCHAR, owner_id INTEGER)",
+    "INSERT INTO calendars (name, owner_id) VALUES ('Consultorio', 1)",
+    "CREATE TABLE availability_slots (id INTEGER PRIMARY KEY, calendar_id INTEGER, start_time DATETIME, end_time DATETIME, is_booked BOOLEAN)",
+    "CREATE TABLE availability_blocks (id INTEGER PRIMARY KEY, calendar_id INTEGER, day_of_week INTEGER, start_time TIME, end_time TIME)",
+    "CREATE TABLE appointments (id INTEGER PRIMARY KEY, calendar_id INTEGER, user_id INTEGER, start_time DATETIME, end_time DATETIME)",
+    "INSERT INTO appointments (calendar_id, user_id, start_time, end_time) VALUES (1, 1, '2030-01-07 09:00:00', '2030-01-07 09:30:00')",
+]
+
+
+def _free_slot_plan(engine) -> str:
+    # La búsqueda de slots libres tal como la emite booking.py
+    statement = select(slots.c.id).where(
+        slots.c.calendar_id == 1, slots.c.start_time >= datetime(2030, 1, 7), slots.c.is_booked == False
+    )
+    compiled = statement.compile(engine)
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params[key] for key in compiled.positiontup)).all()
+    return " ".join(row[-1] for row in rows)
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in _LEGACY_SCHEMA:
+            conn.execute(text(statement))
+    return engine
+
+
+def _indexes(engine, table):
+    return {index["name"]: index["column_names"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_migrations_upgrade_a_legacy_database(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+
+    assert _indexes(engine, "availability_slots") == {
+        "ix_availability_slots_calendar_start": ["calendar_id", "start_time"],
+        "ix_availability_slots_free": ["calendar_id", "start_time"],
+    }
+    assert _indexes(engine, "availability_blocks") == {"ix_availability_blocks_calendar": ["calendar_id", "day_of_week"]}
+    assert _indexes(engine, "appointments") == {
+        "ix_appointments_calendar_start": ["calendar_id", "start_time"],
+        "ix_appointments_user_start": ["user_id", "start_time"],
+        "ix_appointments_calendar_updated": ["calendar_id", "updated_at"],
+    }
+    assert "ix_availability_slots_free" in _free_slot_plan(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM appointments WHERE updated_at IS NULL")).scalar() == 0
+        assert conn.execute(text("SELECT availability_version FROM calendars")).scalar() == 0
+
+    # Ya aplicadas: no se repiten
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    engine.dispose()
+
+
+def test_database_migrated_with_the_old_predicate_is_repaired(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    run_migrations(engine)
+    # Estado de una base que aplicó la migración 1 con "WHERE NOT is_booked"
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_availability_slots_free"))
+        conn.execute(text("CREATE INDEX ix_availability_slots_free ON availability_slots (calendar_id, start_time) WHERE NOT is_booked"))
+        conn.execute(schema_version.delete().where(schema_version.c.version >= 4))
+    assert "ix_availability_slots_free" not in _free_slot_plan(engine)
+
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    assert "ix_availability_slots_free" in _free_slot_plan(engine)
+    engine.dispose()
+
+
+def test_migrations_on_a_fresh_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+    Base.metadata.create_all(bind=engine)
+    assert run_migrations(engine) == MIGRATIONS[-1][0]
+    assert "ix_availability_slots_free" in _free_slot_plan(engine)
+    engine.dispose()
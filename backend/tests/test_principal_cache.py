@@ -0,0 +1,63 @@
+from datetime import datetime
+import pytest
+from app.database import SessionLocal
+from app.models.models import User
+from app.utils.password_utils import hash_password
+from app.utils.principal_cache import principal_cache
+
+
+@pytest.fixture
+def user(db):
+    user = User(
+        first_name="Ana", last_name="Cache", email=f"cache-{datetime.utcnow().timestamp()}@example.com",
+        hashed_password=hash_password("secreto123"), is_verified=True, verification_code="123456"
+    )
+    db.add(user)
+    db.commit()
+    principal_cache.put(user.email, user)
+    return user
+
+
+def _cached(user):
+    return principal_cache._entries.get(user.email)
+
+
+def test_secrets_are_not_cached_but_still_load(db, user):
+    values = _cached(user)[1]
+    assert "hashed_password" not in values and "verification_code" not in values
+
+    other = SessionLocal()
+    try:
+        cached = principal_cache.get(other, user.email)
+        assert cached.first_name == "Ana"
+        # Se cargan de la base solo si se leen
+        assert cached.hashed_password == user.hashed_password
+        assert cached.verification_code == "123456"
+    finally:
+        other.close()
+
+
+def test_update_invalidates_only_after_commit(db, user):
+    user.first_name = "Ana María"
+    db.flush()
+    assert _cached(user) is not None
+
+    db.commit()
+    assert _cached(user) is None
+
+
+def test_rolled_back_update_keeps_the_entry(db, user):
+    user.first_name = "Nunca"
+    db.flush()
+    db.rollback()
+    assert _cached(user) is not None
+
+    # Un commit posterior sin cambios al usuario no lo invalida
+    db.commit()
+    assert _cached(user) is not None
+
+
+def test_delete_invalidates_on_commit(db, user):
+    db.delete(user)
+    db.commit()
+    assert _cached(user) is None
@@ -0,0 +1,42 @@
+import pytest
+from starlette.requests import Request
+from app.utils import rate_limit
+from app.utils.rate_limit import MemoryRateLimitBackend, RateLimiter, client_ip
+from fastapi import HTTPException
+
+
+def _request(forwarded=None, peer="10.0.0.2"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 5000)})
+
+
+def test_forwarded_header_ignored_unless_trusted(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_FORWARDED", False)
+    assert client_ip(_request("1.2.3.4")) == "10.0.0.2"
+
+
+@pytest.mark.parametrize("forwarded, hops, expected", [
+    ("203.0.113.7", 1, "203.0.113.7"),
+    # Lo que el cliente inventa queda a la izquierda del valor que agrega el proxy
+    ("1.1.1.1, 2.2.2.2, 203.0.113.7", 1, "203.0.113.7"),
+    ("1.1.1.1, 203.0.113.7, 10.0.0.5", 2, "203.0.113.7"),
+    ("203.0.113.7", 3, "203.0.113.7"),
+])
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch, forwarded, hops, expected):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_FORWARDED", True)
+    assert client_ip(_request(forwarded), hops) == expected
+
+
+def test_trusted_without_header_uses_peer(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_FORWARDED", True)
+    assert client_ip(_request()) == "10.0.0.2"
+
+
+def test_bucket_throttles_after_burst():
+    limiter = RateLimiter(MemoryRateLimitBackend(), enabled=True, ip_burst=3, ip_per_minute=1, email_burst=10, email_per_minute=1)
+    for _ in range(3):
+        limiter.check("login", "203.0.113.7")
+    with pytest.raises(HTTPException) as exc:
+        limiter.check("login", "203.0.113.7")
+    assert exc.value.status_code == 429 and int(exc.value.headers["Retry-After"]) > 0
+    limiter.check("login", "198.51.100.1")
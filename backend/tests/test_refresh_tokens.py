@@ -0,0 +1,84 @@
+import uuid
+from datetime import datetime, timedelta
+from jose import jwt
+from app.models.models import User, RefreshToken
+from app.utils.password_utils import hash_password
+from app.utils.refresh_tokens import revocations, purge_expired_refresh_tokens
+
+
+def _login(client, db):
+    email = f"{uuid.uuid4().hex[:8]}@example.com"
+    db.add(User(first_name="A", last_name="B", email=email, hashed_password=hash_password("secreto123"), is_verified=True))
+    db.commit()
+    response = client.post("/auth/login/json", json={"email": email, "password": "secreto123"})
+    assert response.status_code == 200
+    return response.json()["refresh_token"]
+
+
+def _refresh(client, token):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_rotation_issues_new_token_and_access(client, db):
+    token = _login(client, db)
+    response = _refresh(client, token)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["refresh_token"] != token
+    assert client.get("/doctor-profile/me", headers={"Authorization": f"Bearer {body['access_token']}"}).status_code == 404
+
+
+def test_refresh_token_is_not_an_access_token(client, db):
+    token = _login(client, db)
+    assert client.get("/doctor-profile/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+
+
+def test_replay_caught_in_memory_revokes_family(client, db):
+    token = _login(client, db)
+    successor = _refresh(client, token).json()["refresh_token"]
+
+    # El jti rotado está en memoria: el reuso debe revocar también al sucesor
+    assert _refresh(client, token).status_code == 401
+    assert _refresh(client, successor).status_code == 401
+    family = jwt.get_unverified_claims(token)["fam"]
+    rows = db.query(RefreshToken).filter(RefreshToken.family_id == family).all()
+    assert len(rows) == 2 and all(row.revoked_at is not None for row in rows)
+
+
+def test_replay_caught_by_database_revokes_family(client, db):
+    token = _login(client, db)
+    successor = _refresh(client, token).json()["refresh_token"]
+
+    # Otro worker no tiene el jti en memoria: lo detecta el UPDATE condicional
+    revocations._entries.clear()
+    assert _refresh(client, token).status_code == 401
+    revocations._entries.clear()
+    assert _refresh(client, successor).status_code == 401
+
+
+def test_logout_revokes_family(client, db):
+    token = _login(client, db)
+    assert client.post("/auth/logout", json={"refresh_token": token}).status_code == 200
+    assert _refresh(client, token).status_code == 401
+
+
+def test_purge_deletes_expired_rows_and_keeps_active_families(client, db):
+    expired = _login(client, db)
+    _refresh(client, expired)
+    active = _login(client, db)
+    successor = _refresh(client, active).json()["refresh_token"]
+
+    expired_family = jwt.get_unverified_claims(expired)["fam"]
+    active_family = jwt.get_unverified_claims(active)["fam"]
+    db.query(RefreshToken).filter(RefreshToken.family_id == expired_family).update(
+        {RefreshToken.expires_at: datetime.utcnow() - timedelta(minutes=1)}
+    )
+    db.commit()
+
+    assert purge_expired_refresh_tokens(db) >= 2
+    assert db.query(RefreshToken).filter(RefreshToken.family_id == expired_family).count() == 0
+    # La familia activa conserva también la fila rotada, que detecta el reuso
+    assert db.query(RefreshToken).filter(RefreshToken.family_id == active_family).count() == 2
+    assert _refresh(client, successor).status_code == 200
+    revocations._entries.clear()
+    assert _refresh(client, active).status_code == 401
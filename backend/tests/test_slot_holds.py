@@ -0,0 +1,77 @@
+"""
+Apartados de slots y versión del calendario.
+
+Dos SlotHoldStore con su propio SqlHoldBackend sobre la misma base hacen de
+dos workers con SLOT_HOLD_BACKEND=sql.
+"""
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import update
+from app.database import engine
+from app.models.models import Calendar, SlotHold, User
+from app.utils.availability_cache import SqlCalendarVersions, calendar_versions
+from app.utils.slot_holds import MemoryHoldBackend, SlotHoldStore, SqlHoldBackend
+
+START = datetime(2030, 1, 7, 9)
+END = START + timedelta(minutes=30)
+
+
+@pytest.fixture
+def calendar(db):
+    owner = User(first_name="Dr", last_name="Apartados", email=f"apartados-{datetime.utcnow().timestamp()}@example.com", hashed_password="")
+    db.add(owner)
+    db.flush()
+    calendar = Calendar(name="Apartados", owner_id=owner.id, meeting_duration=30, slot_interval=30)
+    db.add(calendar)
+    db.commit()
+    yield calendar
+    db.query(SlotHold).filter(SlotHold.calendar_id == calendar.id).delete()
+    db.commit()
+
+
+@pytest.fixture
+def workers():
+    versions = SqlCalendarVersions(engine)
+    return versions, SlotHoldStore(SqlHoldBackend(engine, versions=versions)), SlotHoldStore(SqlHoldBackend(engine, versions=versions))
+
+
+def test_hold_and_release_bump_the_shared_version(calendar, workers):
+    versions, worker_a, worker_b = workers
+    hold = worker_a.hold(calendar.id, START, END)
+    assert hold is not None and versions.get(calendar.id) == 1
+    assert worker_b.hold(calendar.id, START, END) is None
+    assert versions.get(calendar.id) == 1
+
+    assert worker_b.release(hold.token) == hold
+    assert versions.get(calendar.id) == 2
+    assert worker_a.active([calendar.id], START, END) == {}
+
+
+def test_expired_hold_is_purged_on_the_next_calendar_query(calendar, workers):
+    versions, worker_a, worker_b = workers
+    worker_a.hold(calendar.id, START, END)
+    # Agota el intervalo de la purga general en ambos workers
+    worker_a.expire()
+    worker_b.expire()
+    with engine.begin() as conn:
+        conn.execute(update(SlotHold.__table__).where(SlotHold.calendar_id == calendar.id).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+
+    before = versions.get(calendar.id)
+    worker_b.expire()
+    assert versions.get(calendar.id) == before
+
+    # La consulta de disponibilidad del calendario lo vence sin esperar la purga
+    worker_b.expire([calendar.id])
+    assert versions.get(calendar.id) == before + 1
+    assert worker_b.backend.stats()["expired"] == 1
+    worker_b.expire([calendar.id])
+    assert versions.get(calendar.id) == before + 1
+
+
+def test_memory_backend_bumps_the_process_version():
+    store = SlotHoldStore(MemoryHoldBackend(ttl_seconds=60))
+    before = calendar_versions.get(987654)
+    hold = store.hold(987654, START, END)
+    assert calendar_versions.get(987654) == before + 1
+    store.release(hold.token)
+    assert calendar_versions.get(987654) == before + 2
@@ -0,0 +1,78 @@
+"""
+Mantenimiento del horizonte de slots: el camino vectorizado de maintain_batch
+y el de un solo calendario deben materializar lo mismo.
+"""
+from datetime import date, datetime, time, timedelta
+import pytest
+from sqlalchemy import select
+from app.models.models import AvailabilityBlock, AvailabilitySlot, Calendar, User, WeekDay
+from app.utils.scheduler import maintain_batch
+from app.utils.slot_engine import iter_rule_slots
+from app.utils.slot_generator import SLOT_HORIZON_DAYS, generate_slots_for_calendar
+
+TODAY = date(2030, 1, 7)  # lunes
+
+
+@pytest.fixture
+def calendars(db):
+    owner = User(first_name="Dra", last_name="Horizonte", email=f"horizonte-{datetime.utcnow().timestamp()}@example.com", hashed_password="")
+    db.add(owner)
+    db.flush()
+    created = []
+    for duration, step in ((30, 30), (45, 15)):
+        calendar = Calendar(name=f"Horizonte {duration}", owner_id=owner.id, meeting_duration=duration, slot_interval=step)
+        db.add(calendar)
+        db.flush()
+        db.add_all([
+            AvailabilityBlock(calendar_id=calendar.id, day_of_week=WeekDay.monday, start_time=time(9), end_time=time(12)),
+            AvailabilityBlock(calendar_id=calendar.id, day_of_week=WeekDay.thursday, start_time=time(15), end_time=time(17, 30)),
+        ])
+        created.append(calendar)
+    db.commit()
+    return created
+
+
+def _stored(db, calendar):
+    return set(db.execute(
+        select(AvailabilitySlot.start_time, AvailabilitySlot.end_time).where(AvailabilitySlot.calendar_id == calendar.id)
+    ).all())
+
+
+def _expected(calendar, first_day, last_day):
+    return set(iter_rule_slots(calendar, calendar.availability_blocks, first_day, last_day))
+
+
+def test_batch_fills_and_extends_the_horizon(db, calendars):
+    ids = [calendar.id for calendar in calendars]
+    horizon_end = TODAY + timedelta(days=SLOT_HORIZON_DAYS - 1)
+    stats = maintain_batch(ids, TODAY)
+    assert stats["calendars"] == 2
+    for calendar in calendars:
+        assert _stored(db, calendar) == _expected(calendar, TODAY, horizon_end)
+
+    # Noche siguiente: solo se agrega el día nuevo y se podan los vencidos
+    tomorrow = TODAY + timedelta(days=1)
+    stats = maintain_batch(ids, tomorrow)
+    assert stats["pruned"] > 0
+    for calendar in calendars:
+        assert _stored(db, calendar) == _expected(calendar, tomorrow, horizon_end + timedelta(days=1))
+
+    # Ya al día: no hay nada que insertar
+    assert maintain_batch(ids, tomorrow)["inserted"] == 0
+
+
+def test_single_calendar_diff_keeps_booked_and_drops_stray_slots(db, calendars):
+    calendar = calendars[0]
+    stray = datetime(2030, 1, 8, 9, 0, 30)  # martes, con segundos: no coincide con ninguna regla
+    booked = datetime(2030, 1, 7, 9)
+    db.add_all([
+        AvailabilitySlot(calendar_id=calendar.id, start_time=stray, end_time=stray + timedelta(minutes=30), is_booked=False),
+        AvailabilitySlot(calendar_id=calendar.id, start_time=booked, end_time=booked + timedelta(minutes=30), is_booked=True),
+    ])
+    db.commit()
+
+    stats = generate_slots_for_calendar(calendar, db, start_date=TODAY, days=7)
+    expected = _expected(calendar, TODAY, TODAY + timedelta(days=6))
+    assert stats["deleted"] == 1
+    assert stats["inserted"] == len(expected) - 1
+    assert _stored(db, calendar) == expected